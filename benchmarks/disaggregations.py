@@ -0,0 +1,215 @@
+"""
+Time per table of every DISAGGREGATIONS_MAP entry, one query per question
+and batched, plus end-to-end `--reporte temas` and `temas_unico` runs, on
+synthetic databases from benchmarks.synthetic_db at one or more scales:
+
+    python -m benchmarks.disaggregations --encuestados 10000 100000
+    python -m benchmarks.disaggregations --base data/db/survey.db
+    python -m benchmarks.disaggregations --en-memoria
+
+Each database is prepared as `--preparar-base` does before timing. With
+--en-memoria the disaggregations are timed on disk and on the copy_to_memory
+copy, next to the time the copy took, and the reports run on the copy. The
+workbooks are written to a temporary directory.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.synthetic_db import (
+    DEFAULT_ANSWER_RATE,
+    generate_database,
+)
+from src.builder import (
+    build_section_report,
+    build_topics_workbook,
+    data,
+    get_disaggregation_requests,
+)
+from src.cube import QuestionCubes
+from src.database import copy_to_memory, get_connection, prepare_database
+from src.matrix import RespondentMatrix
+from src.queries.provisional import DISAGGREGATIONS_MAP
+from src.repository import (
+    BatchedReports,
+    build_disaggregation_report,
+    build_disaggregation_reports,
+    get_answer_domain,
+    get_question_sections,
+)
+
+# Questions timed for the entries no question in disaggregations.json uses.
+N_FALLBACK_QUESTIONS = 5
+
+
+def _get_engine(conn, motor: str):
+    if motor == "matriz":
+        return RespondentMatrix.from_connection(conn)
+    if motor == "sql_lotes":
+        return BatchedReports(conn, get_disaggregation_requests())
+    if motor == "cubo":
+        return QuestionCubes(conn)
+    return None
+
+
+def _time_disaggregations(conn) -> pd.DataFrame:
+    requests = get_disaggregation_requests()
+    fallback = list(data)[:N_FALLBACK_QUESTIONS]
+
+    rows = []
+    for disaggregation in DISAGGREGATIONS_MAP:
+        question_ids = requests.get((disaggregation, True), fallback)
+
+        start = time.perf_counter()
+        for question_id in question_ids:
+            build_disaggregation_report(conn, question_id, disaggregation)
+        per_query = time.perf_counter() - start
+
+        start = time.perf_counter()
+        build_disaggregation_reports(conn, question_ids, disaggregation)
+        batched = time.perf_counter() - start
+
+        rows.append(
+            {
+                "desagregación": disaggregation,
+                "tablas": len(question_ids),
+                "por pregunta (ms/tabla)": per_query / len(question_ids) * 1000,
+                "en lote (ms/tabla)": batched / len(question_ids) * 1000,
+            }
+        )
+
+    return pd.DataFrame(rows).sort_values("por pregunta (ms/tabla)", ascending=False)
+
+
+def _time_reports(conn, motor: str, streaming: bool) -> dict[str, float]:
+    sections = get_question_sections(conn)
+    timings = {}
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        engine = _get_engine(conn, motor)
+        for section in sections:
+            build_section_report(
+                conn,
+                section,
+                engine=engine,
+                streaming=streaming,
+                output_dir=Path(output_dir),
+            )
+        timings["temas"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        build_topics_workbook(
+            conn,
+            sections,
+            engine=_get_engine(conn, motor),
+            streaming=streaming,
+            output_dir=Path(output_dir),
+        )
+        timings["temas_unico"] = time.perf_counter() - start
+
+    return timings
+
+
+def _compare_in_memory(conn, timings: pd.DataFrame):
+    start = time.perf_counter()
+    memory_conn = copy_to_memory(conn)
+    load_seconds = time.perf_counter() - start
+
+    memory_timings = _time_disaggregations(memory_conn)
+    column = "por pregunta (ms/tabla)"
+    timings = timings.merge(
+        memory_timings[["desagregación", column]].rename(
+            columns={column: "en memoria (ms/tabla)"}
+        ),
+        on="desagregación",
+    )
+
+    def total_seconds(column: str) -> float:
+        return (timings[column] * timings["tablas"]).sum() / 1000
+
+    saved = total_seconds(column) - total_seconds("en memoria (ms/tabla)")
+    print(
+        f"copia a memoria: {load_seconds:.2f} s; consultas por pregunta: "
+        f"{total_seconds(column):.1f} s en disco, "
+        f"{total_seconds('en memoria (ms/tabla)'):.1f} s en memoria "
+        f"(ahorro {saved:.1f} s)"
+    )
+    return memory_conn, timings
+
+
+def run_benchmark(
+    db_path: Path, motor: str, streaming: bool, in_memory: bool = False
+) -> None:
+    start = time.perf_counter()
+    conn = get_connection(db_path=db_path)
+    prepare_database(conn)
+    get_answer_domain(conn)
+    print(
+        f"respondent_dim, índices, ANALYZE y dominio de respuestas: "
+        f"{time.perf_counter() - start:.1f} s"
+    )
+
+    timings = _time_disaggregations(conn)
+    if in_memory:
+        disk_conn = conn
+        conn, timings = _compare_in_memory(disk_conn, timings)
+        disk_conn.close()
+    print(timings.to_string(index=False, float_format="{:.2f}".format))
+
+    for report, seconds in _time_reports(conn, motor, streaming).items():
+        print(f"--reporte {report} (motor {motor}): {seconds:.1f} s")
+
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medir desagregaciones y reportes")
+    parser.add_argument(
+        "--encuestados",
+        type=int,
+        nargs="+",
+        default=[10_000],
+        help="tamaños de las bases sintéticas a generar",
+    )
+    parser.add_argument("--tasa-respuesta", type=float, default=DEFAULT_ANSWER_RATE)
+    parser.add_argument(
+        "--base",
+        type=Path,
+        help="mide esta base en lugar de generar bases sintéticas",
+    )
+    parser.add_argument(
+        "--motor", choices=["sql", "sql_lotes", "matriz", "cubo"], default="sql"
+    )
+    parser.add_argument("--escritor", choices=["openpyxl", "flujo"], default="openpyxl")
+    parser.add_argument(
+        "--en-memoria",
+        action="store_true",
+        help="compara las consultas en disco y en una copia en memoria de la base",
+    )
+    args = parser.parse_args()
+    streaming = args.escritor == "flujo"
+
+    if args.base is not None:
+        print(args.base)
+        run_benchmark(args.base, args.motor, streaming, args.en_memoria)
+        return
+
+    for n_respondents in args.encuestados:
+        with tempfile.TemporaryDirectory() as db_dir:
+            db_path = Path(db_dir) / "survey.db"
+            start = time.perf_counter()
+            counts = generate_database(db_path, n_respondents, args.tasa_respuesta)
+            print(
+                f"{n_respondents:,} encuestados, {counts['answers']:,} respuestas: "
+                f"generada en {time.perf_counter() - start:.1f} s"
+            )
+            run_benchmark(db_path, args.motor, streaming, args.en_memoria)
+
+
+if __name__ == "__main__":
+    main()
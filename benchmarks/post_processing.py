@@ -0,0 +1,123 @@
+"""
+Time per table of the pandas post-processing chain the reports used
+(add_total_row, add_weighted_average_row and get_relative_table, as for a
+numeric question disaggregated by municipio) versus build_report_tables,
+on synthetic wide municipio tables with one column per city:
+
+    python -m benchmarks.post_processing
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.excel import NON_RESPONSE_CODES, build_report_tables
+from src.metadata import ID_TO_CITY_NAME
+
+N_TABLES = 200
+N_ANSWERS = 25
+
+
+def add_total_row(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return df
+
+    total_row = df.iloc[:, 2:].sum()
+    total_row.name = "Total"
+    total_df = pd.DataFrame(total_row).T
+    total_df.insert(0, df.columns[0], "Total")
+    total_df.insert(1, df.columns[1], "Total")
+
+    return pd.concat([df, total_df], ignore_index=True)
+
+
+def add_weighted_average_row(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return df
+
+    valid_df = df[~df[df.columns[0]].isin(["Total", "Promedio"])]
+    weighted_averages = {}
+    for col in df.columns[2:]:
+        weights = pd.to_numeric(valid_df[col], errors="coerce")
+        values = pd.to_numeric(valid_df["Respuesta"], errors="coerce")
+
+        mask = ~values.isin(NON_RESPONSE_CODES) & ~weights.isin(NON_RESPONSE_CODES)
+        filtered_values = values[mask]
+        filtered_weights = weights[mask]
+
+        if filtered_weights.sum() == 0:
+            weighted_avg = 0
+        else:
+            weighted_avg = (
+                filtered_values * filtered_weights
+            ).sum() / filtered_weights.sum()
+
+        weighted_averages[col] = weighted_avg
+    weighted_avg_row = pd.DataFrame(weighted_averages, index=["Promedio"])
+    weighted_avg_row.insert(0, df.columns[0], "Promedio")
+    weighted_avg_row.insert(1, df.columns[1], "Promedio")
+
+    return pd.concat([df, weighted_avg_row], ignore_index=True)
+
+
+def get_relative_table(df: pd.DataFrame) -> pd.DataFrame:
+    # Remove Promedio row if exists
+    df = df[df[df.columns[0]] != "Promedio"]
+
+    if df.empty:
+        return df
+
+    relative_df = df.copy()
+    for col in df.columns[2:]:
+        total = df[col].iloc[-1]
+        if total == 0:
+            relative_df[col] = 0
+        else:
+            relative_df[col] = df[col] / total
+    return relative_df
+
+
+def _get_reports() -> list[pd.DataFrame]:
+    rng = np.random.default_rng(0)
+    cities = list(ID_TO_CITY_NAME.values())
+    answers = list(range(N_ANSWERS - 1)) + [9999]
+
+    reports = []
+    for _ in range(N_TABLES):
+        df = pd.DataFrame(
+            rng.gamma(2.0, 50.0, size=(N_ANSWERS, len(cities))),
+            columns=cities,
+        )
+        df.insert(0, "id_respuesta", range(1, N_ANSWERS + 1))
+        df.insert(1, "Respuesta", [str(answer) for answer in answers])
+        reports.append(df)
+    return reports
+
+
+def _run_chain(report: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    df = add_weighted_average_row(add_total_row(report))
+    return df, get_relative_table(df)
+
+
+def _run_vectorized(report: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    return build_report_tables(report, total_column=False, weighted_average=True)
+
+
+def main():
+    reports = _get_reports()
+    print(f"{N_TABLES} tablas de {N_ANSWERS} x {len(ID_TO_CITY_NAME)} municipios")
+
+    for label, post_process in [
+        ("cadena de pandas", _run_chain),
+        ("build_report_tables", _run_vectorized),
+    ]:
+        start = time.perf_counter()
+        for report in reports:
+            post_process(report)
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {elapsed / N_TABLES * 1000:.2f} ms por tabla")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Wall time for writing the largest `--reporte temas` section question by
+question (reopening the workbook in append mode, as the reports used to be
+written) versus once per workbook, as build_section_report does, with both
+the pandas/openpyxl writer and the streaming one (`--escritor flujo`).
+
+The tables are built once beforehand so only the writing is compared:
+
+    python -m benchmarks.section_report
+"""
+
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+from src.builder import (
+    _build_section_tables,
+    _write_question_sheet,
+    _write_section_report,
+)
+from src.database import get_connection
+from src.repository import get_question_sections, get_questions_by_section
+
+
+def _get_largest_section(conn) -> str:
+    return max(
+        get_question_sections(conn),
+        key=lambda section: len(get_questions_by_section(conn, section)),
+    )
+
+
+def _get_writer_config(output_path: Path) -> dict:
+    if output_path.exists():
+        mode = "a"
+        if_sheet = "overlay"
+    else:
+        mode = "w"
+        if_sheet = None
+
+    return {
+        "path": output_path,
+        "engine": "openpyxl",
+        "mode": mode,
+        "if_sheet_exists": if_sheet,
+    }
+
+
+def _write_question_report(
+    question: pd.Series,
+    section: str,
+    question_tables: tuple,
+    output_dir: Path,
+) -> None:
+    config = _get_writer_config(output_dir / f"{section}.xlsx")
+
+    with pd.ExcelWriter(**config) as writer:
+        _write_question_sheet(writer, question, question_tables)
+
+
+def _write_per_question(section: str, section_tables: list, output_dir: Path) -> None:
+    for question, question_tables, sin_factor_tables in section_tables:
+        _write_question_report(question, section, question_tables, output_dir)
+
+        if sin_factor_tables is not None:
+            _write_question_report(
+                question,
+                section + "_sin_factor",
+                sin_factor_tables,
+                output_dir,
+            )
+
+
+def main():
+    conn = get_connection()
+    section = _get_largest_section(conn)
+
+    start = time.perf_counter()
+    section_tables = list(_build_section_tables(conn, section))
+    print(
+        f"{section}: {len(section_tables)} preguntas, "
+        f"tablas en {time.perf_counter() - start:.1f} s"
+    )
+
+    for label, write in [
+        ("un archivo abierto por pregunta", _write_per_question),
+        ("un archivo abierto por tema", _write_section_report),
+        (
+            "un archivo abierto por tema, escritor en flujo",
+            partial(_write_section_report, streaming=True),
+        ),
+    ]:
+        with tempfile.TemporaryDirectory() as output_dir:
+            start = time.perf_counter()
+            write(section, section_tables, Path(output_dir))
+            print(f"{label}: {time.perf_counter() - start:.1f} s")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+"""
+Generates a survey.db with the schema of the real one (questions, options,
+answers, responses and respondent_attributes) and made-up data, so the
+benchmarks can run at any scale without the private database:
+
+    python -m benchmarks.synthetic_db /tmp/sintetica.db --encuestados 100000
+
+Respondents come in households (the first member is the initial
+respondent) that share a municipality and an expansion factor. Ages follow
+a population pyramid, and the attributes depend on them: income and
+highest education for adults, current studies and school type for
+students, work for ages 12 and up. Attribute codes are the ones the queries
+filter on: tipo_trabajo 1, 4, 6 and 5; nivel_actual_estudios 2 to 5; the
+modo_transporte groups of particion_modal; and the public and private
+servicio_salud_donde_se_atendio codes.
+
+Every question in disaggregations.json is generated, so every entry in
+DISAGGREGATIONS_MAP that the reports use has data. Each question is
+answered by a share of the respondents around --tasa-respuesta. About a
+third of the questions are numeric. They mix integer and real values with
+the 8888 and 9999 codes. The rest are multiple choice. Some of their
+answers have no option, which tests the CAST(value AS TEXT) labels.
+
+The answers table has about encuestados x 293 x tasa-respuesta rows:
+roughly 880k for 10k respondents at the default 0.3, and 88M (several GB)
+for 1M.
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.metadata import AMM_ID, DESIRED_ORDERS, ID_TO_CITY_NAME, PERIFERIA_ID
+from src.paths import PROCESSED_DATA_DIR
+
+SECTIONS = ["movilidad", "salud", "trabajo", "educacion"]
+DEFAULT_RESPONDENTS = 10_000
+DEFAULT_ANSWER_RATE = 0.3
+CHUNK_SIZE = 200_000
+
+SCHEMA = [
+    "CREATE TABLE questions (q_id TEXT, q_text TEXT, q_type TEXT, q_notes TEXT, q_section TEXT)",
+    "CREATE TABLE options (question_id TEXT, option_id INTEGER, option_label TEXT)",
+    "CREATE TABLE answers (respondent_id INTEGER, question_id TEXT, option_id INTEGER, value)",
+    "CREATE TABLE responses (respondent_id INTEGER, city_id INTEGER, factor_cvnl REAL, is_initial_respondent INTEGER)",
+    "CREATE TABLE respondent_attributes (respondent_id INTEGER, attribute TEXT, question_id TEXT, value)",
+]
+
+# Share of the households in each AMM municipality, roughly by population.
+AMM_WEIGHTS = {
+    39: 0.20,
+    26: 0.12,
+    6: 0.12,
+    46: 0.08,
+    21: 0.08,
+    31: 0.07,
+    18: 0.06,
+    48: 0.05,
+    19: 0.025,
+    9: 0.02,
+    49: 0.01,
+}
+PERIFERIA_WEIGHT = 0.01
+RESTO_NL_WEIGHT = 0.07
+OTHER_CITY_WEIGHTS = {100: 0.004, 9999: 0.002}
+
+INCOME_OPTIONS = {
+    0: "Sin ingreso",
+    **dict(enumerate(DESIRED_ORDERS["ingreso"][2:], start=1)),
+    9999: "No contesta",
+}
+ATTRIBUTE_OPTIONS = {
+    "sexo": {0: "Hombre", 1: "Mujer"},
+    "ingreso": INCOME_OPTIONS,
+    "tipo_trabajo": {
+        1: "Trabajó por un pago",
+        2: "Buscó trabajo",
+        3: "Es estudiante",
+        4: "Tenía trabajo pero no trabajó",
+        5: "Trabajó sin pago",
+        6: "Trabajó por su cuenta",
+        7: "Otra situación",
+    },
+    "nivel_actual_estudios": {
+        1: "Preescolar",
+        2: "Primaria",
+        3: "Secundaria",
+        4: "Preparatoria o bachillerato general",
+        5: "Bachillerato tecnológico",
+        6: "Licenciatura",
+        7: "Maestría",
+    },
+    "nivel_max_estudios": dict(enumerate(DESIRED_ORDERS["estudios"], start=1)),
+    "tipo_escuela": dict(enumerate(DESIRED_ORDERS["tipo_escuela"], start=1)),
+    "modo_transporte": {
+        **{mode: f"Modo de transporte {mode}" for mode in range(1, 16)},
+        8888: "No sabe",
+        9999: "No contesta",
+    },
+    "servicio_salud_donde_se_atendio": {
+        service: f"Servicio de salud {service}" for service in range(1, 14)
+    },
+    "afiliacion_servicio_salud": {
+        affiliation: f"Afiliación {affiliation}" for affiliation in range(1, 6)
+    },
+    "tipo_consulta": {1: "General", 2: "Especialidad", 3: "Urgencias"},
+    "municipio": ID_TO_CITY_NAME,
+}
+
+
+def _get_attribute_question_id(attribute: str) -> str:
+    return f"atributo_{attribute}"
+
+
+def _get_city_weights() -> dict[int, float]:
+    resto_nl = [
+        city_id
+        for city_id in ID_TO_CITY_NAME
+        if city_id < 100 and city_id not in AMM_ID + PERIFERIA_ID
+    ]
+    weights = dict(AMM_WEIGHTS)
+    weights.update({city_id: PERIFERIA_WEIGHT for city_id in PERIFERIA_ID})
+    weights.update({city_id: RESTO_NL_WEIGHT / len(resto_nl) for city_id in resto_nl})
+    weights.update(OTHER_CITY_WEIGHTS)
+    return weights
+
+
+def _choice(rng: np.random.Generator, options: list, weights: list, size: int):
+    weights = np.asarray(weights, dtype=float)
+    return rng.choice(np.asarray(options), size=size, p=weights / weights.sum())
+
+
+def _insert(conn: sqlite3.Connection, table: str, columns: list) -> int:
+    """Inserts the rows given as one list per column, in chunks."""
+    placeholders = ", ".join("?" * len(columns))
+    n_rows = len(columns[0])
+    for start in range(0, n_rows, CHUNK_SIZE):
+        chunk = [column[start : start + CHUNK_SIZE] for column in columns]
+        conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", zip(*chunk))
+    return n_rows
+
+
+def _to_list(values: np.ndarray, missing: np.ndarray | None = None) -> list:
+    values = values.astype(object)
+    if missing is not None:
+        values[missing] = None
+    return values.tolist()
+
+
+def _generate_households(rng: np.random.Generator, n_respondents: int):
+    sizes = _choice(
+        rng, [1, 2, 3, 4, 5, 6], [0.12, 0.24, 0.22, 0.22, 0.12, 0.08], n_respondents
+    )
+    sizes = sizes[: np.searchsorted(np.cumsum(sizes), n_respondents) + 1]
+    household = np.repeat(np.arange(len(sizes)), sizes)[:n_respondents]
+    is_initial = np.r_[True, household[1:] != household[:-1]]
+    return household, len(sizes), is_initial
+
+
+def _generate_ages(rng: np.random.Generator, is_initial: np.ndarray) -> np.ndarray:
+    ages = np.arange(91)
+    pyramid = np.where(ages < 30, 1.0, np.exp(-(ages - 30) / 25))
+    age = _choice(rng, ages, pyramid, len(is_initial))
+    adult = _choice(rng, ages[18:86], pyramid[18:86], len(is_initial))
+    return np.where(is_initial, adult, age)
+
+
+def _get_current_studies(rng: np.random.Generator, age: np.ndarray) -> np.ndarray:
+    """Current level of the respondents who study, 0 for the rest."""
+    high_school = rng.choice([4, 5], size=len(age), p=[0.7, 0.3])
+    higher = rng.choice([6, 7], size=len(age))
+    level = np.select(
+        [age <= 5, age <= 11, age <= 14, age <= 17, age <= 24, age <= 29],
+        [1, 2, 3, high_school, 6, higher],
+        0,
+    )
+    studies_rate = np.select(
+        [age < 3, age <= 14, age <= 17, age <= 24, age <= 29],
+        [0, 0.95, 0.8, 0.4, 0.1],
+        0,
+    )
+    return np.where(rng.random(len(age)) < studies_rate, level, 0)
+
+
+def generate_respondents(
+    conn: sqlite3.Connection, rng: np.random.Generator, n_respondents: int
+) -> int:
+    """Writes responses and respondent_attributes; returns the attribute rows."""
+    household, n_households, is_initial = _generate_households(rng, n_respondents)
+    respondent_ids = np.arange(1, n_respondents + 1)
+
+    city_weights = _get_city_weights()
+    household_city = _choice(
+        rng, list(city_weights), list(city_weights.values()), n_households
+    )
+    household_factor = np.round(rng.lognormal(np.log(120), 0.6, n_households), 3)
+    city = household_city[household]
+    city_missing = rng.random(n_respondents) < 0.002
+    factor_missing = rng.random(n_respondents) < 0.003
+
+    _insert(
+        conn,
+        "responses",
+        [
+            respondent_ids.tolist(),
+            _to_list(city, city_missing),
+            _to_list(household_factor[household], factor_missing),
+            is_initial.astype(int).tolist(),
+        ],
+    )
+
+    age = _generate_ages(rng, is_initial)
+    current_studies = _get_current_studies(rng, age)
+    studying = current_studies > 0
+    n = n_respondents
+
+    def present(rate: float, eligible=True) -> np.ndarray:
+        return (rng.random(n) < rate) & eligible
+
+    income_ids = list(INCOME_OPTIONS)
+    income_weights = [0.25] + [0.5**i for i in range(1, len(income_ids) - 1)] + [0.08]
+    attributes = {
+        "sexo": (rng.choice([0, 1], size=n, p=[0.49, 0.51]), present(1.0)),
+        "edad_anos": (age, present(0.99)),
+        "ingreso": (
+            _choice(rng, income_ids, income_weights, n),
+            present(0.9, age >= 18),
+        ),
+        "tipo_trabajo": (
+            _choice(rng, range(1, 8), [0.35, 0.05, 0.15, 0.03, 0.25, 0.12, 0.05], n),
+            present(0.9, age >= 12),
+        ),
+        "nivel_actual_estudios": (current_studies, studying),
+        "tipo_escuela": (_choice(rng, [1, 2, 3], [0.75, 0.22, 0.03], n), studying),
+        "nivel_max_estudios": (
+            _choice(
+                rng, range(1, 16), [3, 2, 15, 20, 12, 6, 2, 3, 4, 1, 2, 22, 3, 4, 1], n
+            ),
+            present(0.95, age >= 15),
+        ),
+        "modo_transporte": (
+            _choice(
+                rng,
+                list(ATTRIBUTE_OPTIONS["modo_transporte"]),
+                [12, 30, 25, 3, 3, 2, 1, 6, 4, 4, 3, 2, 2, 1, 1, 0.5, 0.5],
+                n,
+            ),
+            present(0.85, age >= 6),
+        ),
+        "afiliacion_servicio_salud": (
+            _choice(rng, range(1, 6), [0.55, 0.1, 0.05, 0.2, 0.1], n),
+            present(0.86),
+        ),
+        "tipo_consulta": (_choice(rng, [1, 2, 3], [0.7, 0.2, 0.1], n), present(0.85)),
+        "municipio": (city, ~city_missing),
+    }
+
+    n_rows = 0
+    for attribute, (values, mask) in attributes.items():
+        n_rows += _insert(
+            conn,
+            "respondent_attributes",
+            [
+                respondent_ids[mask].tolist(),
+                [attribute] * int(mask.sum()),
+                [_get_attribute_question_id(attribute)] * int(mask.sum()),
+                values[mask].tolist(),
+            ],
+        )
+
+    # The only multi-valued attribute: up to two services per respondent.
+    n_services = _choice(rng, [0, 1, 2], [0.3, 0.5, 0.2], n)
+    service_respondents = np.repeat(respondent_ids, n_services)
+    services = rng.integers(1, 14, size=len(service_respondents))
+    n_rows += _insert(
+        conn,
+        "respondent_attributes",
+        [
+            service_respondents.tolist(),
+            ["servicio_salud_donde_se_atendio"] * len(services),
+            [_get_attribute_question_id("servicio_salud_donde_se_atendio")]
+            * len(services),
+            services.tolist(),
+        ],
+    )
+
+    for attribute, options in ATTRIBUTE_OPTIONS.items():
+        question_id = _get_attribute_question_id(attribute)
+        _insert(
+            conn,
+            "options",
+            [[question_id] * len(options), list(options), list(options.values())],
+        )
+
+    return n_rows
+
+
+def _get_numeric_values(rng: np.random.Generator, size: int) -> list:
+    values = np.round(rng.gamma(2.0, rng.uniform(2, 30), size)).astype(np.int64)
+    values = np.where(rng.random(size) < 0.03, rng.choice([8888, 9999], size), values)
+    values = values.astype(object)
+    # Real values, which SQLite keeps apart from the integers in the labels.
+    real = rng.random(size) < 0.1
+    values[real] = np.round(rng.uniform(0, 10, int(real.sum())), 1).tolist()
+    return values.tolist()
+
+
+def generate_questions(
+    conn: sqlite3.Connection,
+    rng: np.random.Generator,
+    n_respondents: int,
+    answer_rate: float,
+) -> int:
+    """Writes questions, their options and answers; returns the answer rows."""
+    with open(PROCESSED_DATA_DIR / "disaggregations.json", "r") as file:
+        question_ids = list(json.load(file))
+
+    respondent_ids = np.arange(1, n_respondents + 1)
+    n_answers = 0
+    for i, question_id in enumerate(question_ids):
+        numeric = rng.random() < 1 / 3
+        notes = f"Nota de la pregunta {question_id}" if rng.random() < 0.15 else None
+        conn.execute(
+            "INSERT INTO questions VALUES (?, ?, ?, ?, ?)",
+            (
+                question_id,
+                f"Texto de la pregunta {question_id}",
+                "numerica" if numeric else "opcion",
+                notes,
+                SECTIONS[i % len(SECTIONS)],
+            ),
+        )
+
+        rate = min(1.0, answer_rate * rng.uniform(0.5, 1.5))
+        respondents = respondent_ids[rng.random(n_respondents) < rate].tolist()
+        size = len(respondents)
+
+        if numeric:
+            option_ids = [None] * size
+            values = _get_numeric_values(rng, size)
+        else:
+            options = list(range(1, int(rng.integers(2, 9)) + 1)) + [9999]
+            _insert(
+                conn,
+                "options",
+                [
+                    [question_id] * len(options),
+                    options,
+                    [f"Opción {option}" for option in options[:-1]] + ["No contesta"],
+                ],
+            )
+            weights = rng.dirichlet(np.ones(len(options)))
+            chosen = rng.choice(options, size=size, p=weights)
+            option_ids = chosen.tolist()
+            values = list(option_ids)
+            # Answers without an option are labelled with their value.
+            unlisted = np.flatnonzero(rng.random(size) < 0.02)
+            for j in unlisted.tolist():
+                option_ids[j] = None
+                values[j] = 77
+
+        n_answers += _insert(
+            conn,
+            "answers",
+            [respondents, [question_id] * size, option_ids, values],
+        )
+
+    return n_answers
+
+
+def generate_database(
+    path: Path,
+    n_respondents: int = DEFAULT_RESPONDENTS,
+    answer_rate: float = DEFAULT_ANSWER_RATE,
+    seed: int = 0,
+) -> dict[str, int]:
+    """Writes a new synthetic database to path and returns its row counts."""
+    path.unlink(missing_ok=True)
+    rng = np.random.default_rng(seed)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    try:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        attribute_rows = generate_respondents(conn, rng, n_respondents)
+        answer_rows = generate_questions(conn, rng, n_respondents, answer_rate)
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "responses": n_respondents,
+        "respondent_attributes": attribute_rows,
+        "answers": answer_rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generar una base de encuesta sintética"
+    )
+    parser.add_argument(
+        "ruta", type=Path, help="archivo .db a crear (se reemplaza si existe)"
+    )
+    parser.add_argument("--encuestados", type=int, default=DEFAULT_RESPONDENTS)
+    parser.add_argument(
+        "--tasa-respuesta",
+        type=float,
+        default=DEFAULT_ANSWER_RATE,
+        help="proporción media de encuestados que responde cada pregunta",
+    )
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate_database(
+        args.ruta, args.encuestados, args.tasa_respuesta, args.semilla
+    )
+    print(
+        f"{args.ruta}: {counts['responses']:,} encuestados, "
+        f"{counts['respondent_attributes']:,} atributos, "
+        f"{counts['answers']:,} respuestas en {time.perf_counter() - start:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Styling throughput, in cells per second, of both Excel writers on synthetic
+tables shaped like the disaggregation reports (answers plus a Total row,
+one column per group):
+
+    python -m benchmarks.table_style
+
+For the openpyxl writer the values are written with DataFrame.to_excel
+beforehand and only _apply_table_style is timed. The streaming writer
+creates and styles the cells in one pass, so both are timed together.
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.excel import (
+    ExcelContext,
+    StreamingExcelWriter,
+    _apply_table_style,
+    _stream_table,
+    build_report_tables,
+    get_row_kinds,
+)
+
+N_TABLES = 200
+N_ANSWERS = 12
+N_GROUPS = 30
+
+
+def _get_tables() -> list[pd.DataFrame]:
+    rng = np.random.default_rng(0)
+    tables = []
+    for _ in range(N_TABLES):
+        df = pd.DataFrame(
+            rng.integers(0, 1000, size=(N_ANSWERS, N_GROUPS)),
+            columns=[f"Grupo {g}" for g in range(N_GROUPS)],
+        )
+        df.insert(0, "Respuesta", range(1, N_ANSWERS + 1))
+        df.insert(1, "Etiqueta", [f"Opción {a}" for a in range(N_ANSWERS)])
+        tables.append(build_report_tables(df, total_column=False)[0])
+    return tables
+
+
+def _count_cells(tables: list[pd.DataFrame]) -> int:
+    return sum((len(df) + 1) * len(df.columns) for df in tables)
+
+
+def _time_openpyxl(tables: list[pd.DataFrame], output_dir: Path) -> float:
+    with pd.ExcelWriter(output_dir / "openpyxl.xlsx", engine="openpyxl") as writer:
+        start_rows = []
+        start_row = 0
+        for df in tables:
+            df.to_excel(writer, sheet_name="hoja", startrow=start_row, index=False)
+            start_rows.append(start_row)
+            start_row += len(df) + 3
+
+        ws = writer.sheets["hoja"]
+        start = time.perf_counter()
+        for df, start_row in zip(tables, start_rows):
+            _apply_table_style(
+                ws, start_row + 1, 1, len(df.columns), get_row_kinds(df), False
+            )
+        return time.perf_counter() - start
+
+
+def _time_streaming(tables: list[pd.DataFrame], output_dir: Path) -> float:
+    with StreamingExcelWriter(output_dir / "flujo.xlsx") as writer:
+        ctx = ExcelContext(writer, "hoja")
+        start = time.perf_counter()
+        for df in tables:
+            _stream_table(ctx, df, False)
+        return time.perf_counter() - start
+
+
+def main():
+    tables = _get_tables()
+    n_cells = _count_cells(tables)
+    print(f"{N_TABLES} tablas, {n_cells} celdas")
+
+    for label, time_styling in [
+        ("openpyxl", _time_openpyxl),
+        ("flujo", _time_streaming),
+    ]:
+        with tempfile.TemporaryDirectory() as output_dir:
+            elapsed = time_styling(tables, Path(output_dir))
+        print(f"{label}: {n_cells / elapsed:,.0f} celdas/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Wall time and peak RSS of writing the `--reporte temas_unico` workbook with
+pd.ExcelWriter (one to_excel call per text line and table, then a styling
+pass over its cells), with the sheets assembled in memory by
+BufferedExcelWriter (the default), and with the streaming writer
+(`--escritor flujo`):
+
+    python -m benchmarks.topics_workbook
+    python -m benchmarks.topics_workbook --base /tmp/survey.db
+
+The tables are built once beforehand and each writer runs in a fresh
+process that loads them, so its peak RSS is not inflated by the others. The
+peak is shown along with its growth over the process after loading the
+tables.
+"""
+
+import argparse
+import pickle
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from src.builder import (
+    TOPIC_SHEET_DESC,
+    _build_table_sets_in_order,
+    _iter_questions,
+    _write_topics_workbook,
+)
+from src.database import get_connection
+from src.repository import get_question_sections
+
+WRITERS = {
+    "pandas, to_excel y estilos por bloque": {"buffered": False},
+    "hojas armadas en memoria": {},
+    "escritor en flujo": {"streaming": True},
+}
+
+
+def _get_peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _write_workbook(tables_path: Path, output_path: Path, options: dict) -> tuple:
+    with open(tables_path, "rb") as file:
+        items = pickle.load(file)
+    loaded_rss = _get_peak_rss_mb()
+
+    start = time.perf_counter()
+    _write_topics_workbook(output_path, items, **options)
+    seconds = time.perf_counter() - start
+
+    peak_rss = _get_peak_rss_mb()
+    return seconds, peak_rss, peak_rss - loaded_rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medir la escritura de temas_unico")
+    parser.add_argument("--base", type=Path, help="base a usar en lugar de survey.db")
+    args = parser.parse_args()
+
+    conn = get_connection(db_path=args.base)
+    sections = get_question_sections(conn)
+
+    start = time.perf_counter()
+    questions = _iter_questions(conn, sections, TOPIC_SHEET_DESC)
+    items = list(_build_table_sets_in_order(conn, questions))
+    conn.close()
+    print(
+        f"{len(sections)} temas, {len(items)} preguntas: "
+        f"tablas en {time.perf_counter() - start:.1f} s"
+    )
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        tables_path = Path(output_dir) / "tablas.pkl"
+        with open(tables_path, "wb") as file:
+            pickle.dump(items, file)
+
+        for label, options in WRITERS.items():
+            output_path = Path(output_dir) / "tabulados_por_tema.xlsx"
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+                future = executor.submit(
+                    _write_workbook, tables_path, output_path, options
+                )
+                seconds, peak_rss, rss_growth = future.result()
+            print(
+                f"{label}: {seconds:.1f} s, RSS máximo {peak_rss:.0f} MB "
+                f"(+{rss_growth:.0f} MB al escribir)"
+            )
+            output_path.unlink()
+
+
+if __name__ == "__main__":
+    main()
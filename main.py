@@ -1,8 +1,236 @@
 import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from src.database import get_connection
-from src.builder import build_section_report, build_topics_workbook
-from src.repository import get_question_sections
+from src.cache import DEFAULT_MAX_BYTES, CachedReports, ReportCache
+from src.cube import DEFAULT_CUBE_MEGABYTES, QuestionCubes
+from src.database import (
+    connect_read_only,
+    copy_to_memory,
+    find_full_scans,
+    get_connection,
+    prepare_database,
+)
+from src.builder import (
+    build_section_report,
+    build_topics_workbook,
+    get_disaggregation_requests,
+    get_manifest_entry,
+    is_section_up_to_date,
+    read_manifest,
+    write_manifest,
+)
+from src.matrix import RespondentMatrix
+from src.parquet import ParquetExport
+from src.pipeline import DEFAULT_THREADS, ReportPipeline
+from src.profiling import (
+    DEFAULT_TOP,
+    enable_profiling,
+    get_profiler,
+    get_slowest,
+    record_stage,
+    write_profile_report,
+)
+from src.repository import (
+    BatchedReports,
+    get_question_sections,
+    get_questions_by_section,
+)
+
+
+def get_engine(
+    conn,
+    motor: str,
+    question_ids: list[str] | None = None,
+    cache: ReportCache | None = None,
+    cube_mb: int = DEFAULT_CUBE_MEGABYTES,
+):
+    cached = None
+    if cache is not None:
+        # Keyed by engine, known before the engine is built from the misses.
+        cached = CachedReports(conn, cache, engine_name=motor)
+    requests = None
+    if motor == "sql_lotes":
+        requests = get_disaggregation_requests(question_ids)
+        if cached is not None:
+            # Only batch the tables the cache cannot serve.
+            requests = cached.get_missing_requests(requests)
+
+    if motor == "matriz":
+        engine = RespondentMatrix.from_connection(conn)
+    elif motor == "sql_lotes":
+        engine = BatchedReports(conn, requests)
+    elif motor == "cubo":
+        engine = QuestionCubes(conn, max_bytes=cube_mb * 1024 * 1024)
+    else:
+        engine = None
+
+    if cached is None:
+        return engine
+
+    cached.engine = engine
+    return cached
+
+
+def get_engine_summary(engine) -> str | None:
+    """The cube cache counts of a --motor cubo run, behind the cache or not."""
+    if isinstance(engine, CachedReports):
+        engine = engine.engine
+    if isinstance(engine, QuestionCubes):
+        return engine.get_summary()
+    return None
+
+
+def get_cache(cache_mb: int | None) -> ReportCache | None:
+    if cache_mb is None:
+        return None
+    return ReportCache(max_bytes=cache_mb * 1024 * 1024)
+
+
+def build_section_report_in_worker(
+    section: str,
+    motor: str,
+    combined_sin_factor: bool,
+    streaming: bool,
+    cache_mb: int | None,
+    profile: bool = False,
+    cube_mb: int = DEFAULT_CUBE_MEGABYTES,
+    parquet: bool = False,
+) -> tuple[str, list[dict], tuple[int, int], str | None]:
+    profiler = enable_profiling() if profile else None
+    conn = connect_read_only()
+    cache = get_cache(cache_mb)
+    # Each section has its own partition of the dataset.
+    export = ParquetExport() if parquet else None
+    try:
+        question_ids = get_questions_by_section(conn, section)["id"].tolist()
+        engine = get_engine(conn, motor, question_ids, cache, cube_mb)
+        build_section_report(
+            conn,
+            section,
+            engine=engine,
+            combined_sin_factor=combined_sin_factor,
+            streaming=streaming,
+            parquet=export,
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+        conn.close()
+
+    records = profiler.records if profiler is not None else []
+    parquet_counts = (export.files, export.rows) if export is not None else (0, 0)
+    return section, records, parquet_counts, get_engine_summary(engine)
+
+
+def build_section_reports(
+    conn,
+    sections: list[str],
+    args: argparse.Namespace,
+    streaming: bool,
+    cache: ReportCache | None,
+    pipeline: ReportPipeline | None = None,
+    parquet: ParquetExport | None = None,
+) -> None:
+    manifest = read_manifest()
+    options = {
+        "escritor": args.escritor,
+        "parquet": args.parquet,
+        "sin_factor_combinado": args.sin_factor_combinado,
+    }
+    parquet_dir = parquet.output_dir if parquet is not None else None
+    entries = {
+        section: get_manifest_entry(conn, section, options, parquet_dir)
+        for section in sections
+    }
+
+    if args.incremental:
+        up_to_date = [
+            section
+            for section in sections
+            if is_section_up_to_date(section, entries[section], manifest)
+        ]
+        for section in up_to_date:
+            print(f"Section {section} is up to date, skipping.")
+        sections = [section for section in sections if section not in up_to_date]
+
+    if not sections:
+        return
+
+    def record_section(section: str) -> None:
+        manifest[section] = entries[section]
+        write_manifest(manifest)
+
+    if args.workers > 1:
+        # Each section (with its _sin_factor companion) writes its own files,
+        # so the workers only share the database, opened read-only.
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [
+                executor.submit(
+                    build_section_report_in_worker,
+                    section,
+                    args.motor,
+                    args.sin_factor_combinado,
+                    streaming,
+                    args.cache,
+                    args.profile,
+                    args.memoria_cubos,
+                    parquet is not None,
+                )
+                for section in sections
+            ]
+            for future in as_completed(futures):
+                section, records, parquet_counts, summary = future.result()
+                parquet_files, parquet_rows = parquet_counts
+                if args.profile:
+                    get_profiler().records.extend(records)
+                if parquet is not None:
+                    parquet.files += parquet_files
+                    parquet.rows += parquet_rows
+                record_section(section)
+                print(f"Report generated for {section} section.")
+                if summary is not None:
+                    # Each worker has its own cubes.
+                    print(f"{section}: {summary}")
+    else:
+        question_ids = [
+            question_id
+            for section in sections
+            for question_id in get_questions_by_section(conn, section)["id"]
+        ]
+        engine = get_engine(conn, args.motor, question_ids, cache, args.memoria_cubos)
+        for section in sections:
+            build_section_report(
+                conn,
+                section,
+                engine=engine,
+                combined_sin_factor=args.sin_factor_combinado,
+                streaming=streaming,
+                pipeline=pipeline,
+                parquet=parquet,
+            )
+            record_section(section)
+            print(f"Report generated for {section} section.")
+
+        summary = get_engine_summary(engine)
+        if summary is not None:
+            print(summary)
+
+
+def report_profile(conn, sections: list[str], profiler, top: int) -> None:
+    question_sections = {
+        question_id: section
+        for section in sections
+        for question_id in get_questions_by_section(conn, section)["id"]
+    }
+    df = profiler.get_records(question_sections)
+    wall_seconds = time.perf_counter() - profiler.start
+    json_path, csv_path = write_profile_report(df, wall_seconds, top)
+
+    slowest = get_slowest(df, top)
+    print(f"Tablas más lentas (de {wall_seconds:.1f} s en total):")
+    print(slowest.to_string(index=False, float_format="{:.3f}".format))
+    print(f"Profile written to {json_path} and {csv_path}.")
 
 
 def main():
@@ -13,20 +241,204 @@ def main():
         default="temas",
         help="temas: un archivo por tema; temas_unico: un solo archivo con hojas por tema",
     )
+    parser.add_argument(
+        "--motor",
+        choices=["sql", "sql_lotes", "matriz", "cubo"],
+        default="sql",
+        help=(
+            "sql: una consulta por pregunta y desagregación; "
+            "sql_lotes: una consulta por desagregación para todas sus preguntas; "
+            "matriz: lee la base una sola vez y tabula en memoria; "
+            "cubo: una consulta por pregunta agrupada por sexo, tipo de trabajo, "
+            "estudios, ingreso y municipio, de la que salen las desagregaciones "
+            "sobre esas columnas (las demás, una consulta por tabla)"
+        ),
+    )
+    parser.add_argument(
+        "--memoria-cubos",
+        type=int,
+        default=DEFAULT_CUBE_MEGABYTES,
+        metavar="MB",
+        help=(
+            "memoria máxima de los cubos por pregunta guardados con --motor cubo; "
+            "se descartan primero los usados hace más tiempo (por omisión "
+            f"{DEFAULT_CUBE_MEGABYTES})"
+        ),
+    )
+    parser.add_argument(
+        "--sin-factor-combinado",
+        action="store_true",
+        help=(
+            "calcula las tablas ponderadas y _sin_factor de las preguntas cp con una "
+            "sola consulta (solo con --motor sql, sin --cache)"
+        ),
+    )
+    parser.add_argument(
+        "--preparar-base",
+        action="store_true",
+        help="crea los índices de survey.db, ejecuta ANALYZE y revisa los planes de consulta sin generar reportes",
+    )
+    parser.add_argument(
+        "--escritor",
+        choices=["openpyxl", "flujo"],
+        default="openpyxl",
+        help=(
+            "openpyxl: arma en memoria las filas de cada hoja con sus estilos y las "
+            "coloca de una vez en el libro; "
+            "flujo: escribe las filas con sus estilos en modo de solo escritura, con memoria constante"
+        ),
+    )
+    parser.add_argument(
+        "--parquet",
+        action="store_true",
+        help=(
+            "además de los libros de Excel, escribe todas las tablas (absolutas y "
+            "relativas, ponderadas y _sin_factor) en output/tabulados_parquet, "
+            "particionadas por tema, pregunta y desagregación; requiere pyarrow"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="número de procesos para generar los temas en paralelo (solo con --reporte temas)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=int,
+        nargs="?",
+        const=DEFAULT_MAX_BYTES // (1024 * 1024),
+        metavar="MB",
+        help=(
+            "reutiliza las tablas ya calculadas guardadas en data/db/report_cache.db "
+            "y calcula solo las que cambiaron; MB es el tamaño máximo del caché "
+            f"(por omisión {DEFAULT_MAX_BYTES // (1024 * 1024)})"
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "omite los temas cuyas preguntas, desagregaciones, metadatos, base y "
+            "opciones de salida (--escritor, --parquet, --sin-factor-combinado) no "
+            "cambiaron desde la última ejecución y cuyos archivos siguen en output/ "
+            "(output/manifest.json; solo con --reporte temas)"
+        ),
+    )
+    parser.add_argument(
+        "--canalizado",
+        type=int,
+        nargs="?",
+        const=DEFAULT_THREADS,
+        metavar="HILOS",
+        help=(
+            "ejecuta las consultas en HILOS hilos (por omisión "
+            f"{DEFAULT_THREADS}) mientras otro hilo escribe los libros, y muestra el "
+            "tiempo de cada etapa y la ocupación de la cola (solo con --motor sql)"
+        ),
+    )
+    parser.add_argument(
+        "--en-memoria",
+        action="store_true",
+        help=(
+            "copia survey.db a una base en memoria al iniciar y ejecuta ahí todas "
+            "las consultas; muestra cuánto tardó la copia"
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "mide el tiempo de cada etapa (consultas, pivote, posprocesamiento, "
+            "to_excel, estilos y guardado) por desagregación y por tema, y lo "
+            "guarda en output/profile.json y output/profile.csv"
+        ),
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=DEFAULT_TOP,
+        metavar="N",
+        help=f"número de tablas más lentas a mostrar con --profile (por omisión {DEFAULT_TOP})",
+    )
     args = parser.parse_args()
 
+    if args.canalizado is not None:
+        if args.motor != "sql" or args.cache is not None:
+            parser.error("--canalizado solo funciona con --motor sql, sin --cache")
+        if args.workers > 1:
+            parser.error("--canalizado no se puede combinar con --workers")
+    if args.sin_factor_combinado and (args.motor != "sql" or args.cache is not None):
+        # Each engine and the cache serve one table at a time.
+        parser.error("--sin-factor-combinado solo funciona con --motor sql, sin --cache")
+    if args.reporte == "temas_unico" and (args.workers > 1 or args.incremental):
+        # One workbook holds every topic; it is written by one process and
+        # rewritten whole.
+        parser.error("--reporte temas_unico no se puede combinar con --workers ni --incremental")
+    if args.en_memoria and (args.workers > 1 or args.canalizado is not None):
+        # The copy belongs to one connection; workers and query threads open
+        # their own.
+        parser.error("--en-memoria no se puede combinar con --workers ni --canalizado")
+
     conn = get_connection()
 
+    if args.preparar_base:
+        prepare_database(conn)
+        full_scans = find_full_scans(conn)
+        for disaggregation, initial_only, batched, detail in full_scans:
+            print(f"{disaggregation} (initial_only={initial_only}, lotes={batched}): {detail}")
+        if full_scans:
+            print(f"{len(full_scans)} pasos del plan no usan índice.")
+        else:
+            print("Base preparada: todas las desagregaciones usan índices.")
+        conn.close()
+        return
+
+    profiler = enable_profiling() if args.profile else None
+    if args.en_memoria:
+        start = time.perf_counter()
+        disk_conn, conn = conn, copy_to_memory(conn)
+        disk_conn.close()
+        elapsed = time.perf_counter() - start
+        record_stage("memory_load", elapsed)
+        print(f"Base copiada a memoria en {elapsed:.2f} s")
+
     sections = get_question_sections(conn)
+    streaming = args.escritor == "flujo"
+    cache = get_cache(args.cache)
+    parquet = ParquetExport() if args.parquet else None
+    pipeline = None
+    if args.canalizado is not None:
+        pipeline = ReportPipeline(args.canalizado, args.sin_factor_combinado)
 
     if args.reporte == "temas_unico":
-        build_topics_workbook(conn, sections)
+        engine = get_engine(conn, args.motor, cache=cache, cube_mb=args.memoria_cubos)
+        build_topics_workbook(
+            conn,
+            sections,
+            engine=engine,
+            combined_sin_factor=args.sin_factor_combinado,
+            streaming=streaming,
+            pipeline=pipeline,
+            parquet=parquet,
+        )
         print("Reporte generado: un solo archivo con hojas por tema.")
+        summary = get_engine_summary(engine)
+        if summary is not None:
+            print(summary)
     else:
-        for section in sections:
-            build_section_report(conn, section)
-            print(f"Report generated for {section} section.")
+        build_section_reports(conn, sections, args, streaming, cache, pipeline, parquet)
+
+    if parquet is not None:
+        print(parquet.get_summary())
 
+    if pipeline is not None:
+        pipeline.close()
+        print(pipeline.get_summary())
+    if cache is not None:
+        cache.close()
+    if profiler is not None:
+        report_profile(conn, sections, profiler, args.profile_top)
     conn.close()
 
 
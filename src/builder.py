@@ -1,25 +1,36 @@
 import pandas as pd
+import hashlib
 import json
+import os
+from collections.abc import Iterable, Iterator
+from pathlib import Path
 from tqdm import tqdm
 
+from src import metadata
+from src.database import get_database_fingerprint, get_respondent_dim_build_hash
 from src.paths import OUTPUT_DIR, PROCESSED_DATA_DIR
 from src.repository import get_questions_by_section
 from src.excel import (
     ExcelContext,
     write_text_to_excel,
     write_table_to_excel,
-    get_writer_config,
-    add_total_row,
-    get_relative_table,
-    add_weighted_average_row,
-    add_total_column,
+    open_excel_writer,
+    build_report_tables,
+)
+from src.repository import (
+    build_disaggregation_report,
+    build_disaggregation_report_pair,
 )
-from src.repository import build_disaggregation_report
 from src.metadata import DISAGGREGATIONS_TO_TITLES, DERIVED_NEXT
+from src.profiling import profile_context, profile_stage
 
 with open(PROCESSED_DATA_DIR / "disaggregations.json", "r") as file:
     data: dict = json.load(file)
 
+MANIFEST_FILENAME = "manifest.json"
+SECTION_REPORT_DESC = "Building {section} section report"
+TOPIC_SHEET_DESC = "Building {section} topic sheet"
+
 
 def _parse_question_id(question_id: str) -> tuple[str, int, int]:
     """
@@ -108,48 +119,187 @@ def _sort_questions(questions_df: pd.DataFrame) -> pd.DataFrame:
     return questions_df
 
 
-def _build_question_tables(
+def _has_sin_factor_report(question_id: str) -> bool:
+    return question_id.startswith("cp")
+
+
+def get_disaggregation_requests(
+    question_ids: list[str] | None = None,
+) -> dict[tuple[str, bool], list[str]]:
+    """
+    Questions that request each (disaggregation, initial_only) pair in a full
+    run, or only among question_ids when given.
+    """
+    requests: dict[tuple[str, bool], list[str]] = {}
+
+    for question_id, disaggregations in data.items():
+        if question_ids is not None and question_id not in question_ids:
+            continue
+
+        for disaggregation in disaggregations:
+            requests.setdefault((disaggregation["type"], True), []).append(question_id)
+
+            if _has_sin_factor_report(question_id):
+                requests.setdefault((disaggregation["type"], False), []).append(
+                    question_id
+                )
+
+    return requests
+
+
+def _get_disaggregation_report(
     conn,
+    engine,
+    question_id: str,
+    disaggregation: str,
+    initial_only: bool,
+) -> pd.DataFrame:
+    if engine is None:
+        return build_disaggregation_report(conn, question_id, disaggregation, initial_only)
+
+    return engine.build_disaggregation_report(question_id, disaggregation, initial_only)
+
+
+def _build_tables(
     question: pd.Series,
-    initial_only: bool = True,
-) -> tuple[str | None, str, list[tuple[str, pd.DataFrame, pd.DataFrame]]]:
+    reports: list[tuple[str, pd.DataFrame]],
+) -> tuple[str | None, str, list[tuple[str, str, pd.DataFrame, pd.DataFrame]]]:
     question_id = question["id"]
     question_text = question["q_text"]
     question_type = question["type"]
 
+    tables: list[tuple[str, str, pd.DataFrame, pd.DataFrame]] = []
+
+    for disaggregation_type, report in reports:
+        with profile_stage(
+            "post_processing",
+            question_id=question_id,
+            disaggregation=disaggregation_type,
+        ):
+            df, relative_df = build_report_tables(
+                report,
+                total_column="municipio" not in disaggregation_type,
+                weighted_average=question_type == "numerica",
+            )
+        tables.append(
+            (
+                disaggregation_type,
+                f"{DISAGGREGATIONS_TO_TITLES[disaggregation_type]}",
+                df,
+                relative_df,
+            )
+        )
+
+    notes = question["q_notes"] if isinstance(question["q_notes"], str) else None
+    question_title = f"{question_id} - {question_text}"
+
+    return notes, question_title, tables
+
+
+def _get_question_reports(
+    conn,
+    question: pd.Series,
+    initial_only: bool = True,
+    engine=None,
+) -> list[tuple[str, pd.DataFrame]]:
+    question_id = question["id"]
     question_specific_disaggregations = data.get(question_id, [])
-    tables: list[tuple[str, pd.DataFrame, pd.DataFrame]] = []
 
-    for disaggregation in question_specific_disaggregations:
-        df = add_total_row(
-            build_disaggregation_report(
+    return [
+        (
+            disaggregation["type"],
+            _get_disaggregation_report(
                 conn,
+                engine,
                 question_id,
                 disaggregation["type"],
                 initial_only,
-            )
+            ),
         )
+        for disaggregation in question_specific_disaggregations
+    ]
 
-        if "municipio" not in disaggregation["type"]:
-            df = add_total_column(df)
 
-        if question_type == "numerica":
-            df = add_weighted_average_row(df)
+def _get_question_reports_pair(conn, question: pd.Series) -> tuple:
+    """Weighted and _sin_factor reports of a question, one query per disaggregation."""
+    question_id = question["id"]
+    question_specific_disaggregations = data.get(question_id, [])
 
-        relative_df = get_relative_table(df)
-        tables.append((f"{DISAGGREGATIONS_TO_TITLES[disaggregation['type']]}", df, relative_df))
+    weighted_reports: list[tuple[str, pd.DataFrame]] = []
+    unweighted_reports: list[tuple[str, pd.DataFrame]] = []
 
-    notes = question["q_notes"] if isinstance(question["q_notes"], str) else None
-    question_title = f"{question_id} - {question_text}"
+    for disaggregation in question_specific_disaggregations:
+        df_weighted, df_unweighted = build_disaggregation_report_pair(
+            conn,
+            question_id,
+            disaggregation["type"],
+        )
+        weighted_reports.append((disaggregation["type"], df_weighted))
+        unweighted_reports.append((disaggregation["type"], df_unweighted))
+
+    return weighted_reports, unweighted_reports
 
-    return notes, question_title, tables
+
+def _get_question_report_sets(
+    conn,
+    question: pd.Series,
+    engine=None,
+    combined_sin_factor: bool = False,
+) -> tuple:
+    """
+    Reports of the weighted tables and of the _sin_factor tables of a
+    question; the latter is None for questions without one. The combined
+    _sin_factor queries only exist for the per-question SQL path, without
+    an engine.
+    """
+    if combined_sin_factor and engine is not None:
+        raise ValueError(
+            "combined_sin_factor only runs one query per question, without an engine."
+        )
+
+    if not _has_sin_factor_report(question["id"]):
+        return _get_question_reports(conn, question, True, engine), None
+
+    if combined_sin_factor:
+        return _get_question_reports_pair(conn, question)
+
+    return (
+        _get_question_reports(conn, question, True, engine),
+        _get_question_reports(conn, question, False, engine),
+    )
+
+
+def _build_table_sets(question: pd.Series, report_sets: tuple) -> tuple:
+    reports, sin_factor_reports = report_sets
+    sin_factor_tables = (
+        _build_tables(question, sin_factor_reports)
+        if sin_factor_reports is not None
+        else None
+    )
+    return _build_tables(question, reports), sin_factor_tables
+
+
+def _build_question_table_sets(
+    conn,
+    question: pd.Series,
+    engine=None,
+    combined_sin_factor: bool = False,
+) -> tuple:
+    """
+    Tables of the weighted report and of the _sin_factor report of a
+    question; the latter is None for questions without one.
+    """
+    report_sets = _get_question_report_sets(
+        conn, question, engine, combined_sin_factor
+    )
+    return _build_table_sets(question, report_sets)
 
 
 def _append_question_to_sheet(
     ctx: ExcelContext,
     notes: str | None,
     question_title: str,
-    tables: list[tuple[str, pd.DataFrame, pd.DataFrame]],
+    tables: list[tuple[str, str, pd.DataFrame, pd.DataFrame]],
 ) -> None:
     if notes:
         write_text_to_excel(ctx, notes, is_hdr=True)
@@ -157,110 +307,323 @@ def _append_question_to_sheet(
 
     write_text_to_excel(ctx, question_title, is_hdr=True)
 
-    for title, df, relative_df in tables:
-        write_text_to_excel(ctx, title)
-        write_table_to_excel(ctx, df)
-        write_table_to_excel(ctx, relative_df, is_rel=True)
+    for disaggregation_type, title, df, relative_df in tables:
+        with profile_context(disaggregation=disaggregation_type):
+            write_text_to_excel(ctx, title)
+            write_table_to_excel(ctx, df)
+            write_table_to_excel(ctx, relative_df, is_rel=True)
 
 
-def build_question_report(
-    conn,
+def _write_question_sheet(
+    writer,
     question: pd.Series,
+    question_tables: tuple,
+) -> None:
+    ctx = ExcelContext(writer, question["id"][:31])
+    with profile_context(question_id=question["id"]):
+        _append_question_to_sheet(ctx, *question_tables)
+
+
+def _write_section_report(
     section: str,
-    initial_only: bool = True,
+    section_tables: Iterable[tuple[pd.Series, tuple, tuple | None]],
+    output_dir: Path = OUTPUT_DIR,
+    streaming: bool = False,
+    parquet=None,
 ) -> None:
-    sheet_name = question["id"][:31]
-    notes, question_title, tables = _build_question_tables(
-        conn,
-        question,
-        initial_only,
+    """
+    Writes every question of the section, and of its _sin_factor companion,
+    to workbooks that are opened once and saved when the section is done,
+    and to the ParquetExport when given.
+    """
+    writers = {}
+    if parquet is not None:
+        parquet.clear(section)
+
+    def get_writer(report_name: str):
+        if report_name not in writers:
+            writers[report_name] = open_excel_writer(
+                output_dir / f"{report_name}.xlsx",
+                streaming,
+            )
+        return writers[report_name]
+
+    try:
+        for question, question_tables, sin_factor_tables in section_tables:
+            _write_question_sheet(get_writer(section), question, question_tables)
+            if parquet is not None:
+                parquet.write_question(
+                    section, question, question_tables, sin_factor_tables
+                )
+
+            if sin_factor_tables is not None:
+                _write_question_sheet(
+                    get_writer(section + "_sin_factor"),
+                    question,
+                    sin_factor_tables,
+                )
+    finally:
+        for writer in writers.values():
+            with profile_stage("save", section=section):
+                writer.close()
+
+
+def _iter_questions(
+    conn,
+    sections: list[str],
+    desc: str,
+) -> Iterator[tuple[str, pd.Series]]:
+    """(section, question) for every question of sections, in report order."""
+    for section in sections:
+        questions_df = get_questions_by_section(conn, section)
+        questions_df = _sort_questions(questions_df)
+
+        for _, question in tqdm(
+            questions_df.iterrows(),
+            total=len(questions_df),
+            desc=desc.format(section=section),
+            unit="question",
+            colour="green",
+        ):
+            yield section, question
+
+
+def _build_table_sets_in_order(
+    conn,
+    questions: Iterable[tuple[str, pd.Series]],
+    engine=None,
+    combined_sin_factor: bool = False,
+) -> Iterator[tuple[str, pd.Series, tuple, tuple | None]]:
+    for section, question in questions:
+        question_tables, sin_factor_tables = _build_question_table_sets(
+            conn,
+            question,
+            engine,
+            combined_sin_factor,
+        )
+        yield section, question, question_tables, sin_factor_tables
+
+
+def _build_section_tables(
+    conn,
+    section: str,
+    engine=None,
+    combined_sin_factor: bool = False,
+) -> Iterator[tuple[pd.Series, tuple, tuple | None]]:
+    questions = _iter_questions(conn, [section], SECTION_REPORT_DESC)
+    table_sets = _build_table_sets_in_order(
+        conn, questions, engine, combined_sin_factor
     )
+    for _, question, question_tables, sin_factor_tables in table_sets:
+        yield question, question_tables, sin_factor_tables
 
-    output_path = OUTPUT_DIR / f"{section}.xlsx"
-    config = get_writer_config(output_path)
 
-    with pd.ExcelWriter(**config) as writer:
-        ctx = ExcelContext(writer, sheet_name)
-        _append_question_to_sheet(ctx, notes, question_title, tables)
+def build_section_report(
+    conn,
+    section,
+    engine=None,
+    combined_sin_factor: bool = False,
+    streaming: bool = False,
+    pipeline=None,
+    output_dir: Path = OUTPUT_DIR,
+    parquet=None,
+) -> None:
+    """
+    With a ReportPipeline (src/pipeline.py) the queries run in its threads
+    and the workbooks are written by its writer thread; engine is not used.
+    """
+    if pipeline is None:
+        _write_section_report(
+            section,
+            _build_section_tables(conn, section, engine, combined_sin_factor),
+            output_dir,
+            streaming,
+            parquet,
+        )
+        return
+
+    def write(items: Iterable[tuple[str, pd.Series, tuple, tuple | None]]) -> None:
+        _write_section_report(
+            section,
+            (item[1:] for item in items),
+            output_dir,
+            streaming,
+            parquet,
+        )
 
+    questions = _iter_questions(conn, [section], SECTION_REPORT_DESC)
+    pipeline.run(pipeline.build_table_sets(questions), write)
 
-def build_section_report(conn, section) -> None:
-    questions_df = get_questions_by_section(conn, section)
-    questions_df = _sort_questions(questions_df)
-
-    for _, question in tqdm(
-        questions_df.iterrows(),
-        total=len(questions_df),
-        desc=f"Building {section} section report",
-        unit="question",
-        colour="green",
-    ):
-        build_question_report(conn, question, section)
-
-        if question["id"].startswith("cp"):
-            build_question_report(
-                conn,
-                question,
-                section + "_sin_factor",
-                initial_only=False,
-            )
+
+def _write_topics_workbook(
+    output_path: Path,
+    items: Iterable[tuple[str, pd.Series, tuple, tuple | None]],
+    streaming: bool = False,
+    buffered: bool = True,
+    parquet=None,
+) -> None:
+    writer = open_excel_writer(output_path, streaming, buffered)
+    contexts: dict[str, ExcelContext] = {}
+
+    def get_context(sheet_name: str) -> ExcelContext:
+        if sheet_name not in contexts:
+            contexts[sheet_name] = ExcelContext(writer, sheet_name)
+        return contexts[sheet_name]
+
+    try:
+        for section, question, question_tables, sin_factor_tables in items:
+            with profile_context(section=section, question_id=question["id"]):
+                _append_question_to_sheet(get_context(section[:31]), *question_tables)
+
+                if sin_factor_tables is not None:
+                    sin_factor_section = f"{section}_sin_factor"
+                    _append_question_to_sheet(
+                        get_context(sin_factor_section[:31]),
+                        *sin_factor_tables,
+                    )
+
+            if parquet is not None:
+                parquet.write_question(
+                    section, question, question_tables, sin_factor_tables
+                )
+    finally:
+        with profile_stage("save"):
+            writer.close()
 
 
 def build_topics_workbook(
     conn,
     sections: list[str],
     output_filename: str = "tabulados_por_tema.xlsx",
+    engine=None,
+    combined_sin_factor: bool = False,
+    streaming: bool = False,
+    pipeline=None,
+    output_dir: Path = OUTPUT_DIR,
+    parquet=None,
 ) -> None:
-    output_path = OUTPUT_DIR / output_filename
+    """
+    With a ParquetExport, every table is also written to its dataset, which
+    is cleared first like the workbook.
+    """
+    output_path = output_dir / output_filename
     if output_path.exists():
         output_path.unlink()
+    if parquet is not None:
+        parquet.clear()
 
-    with pd.ExcelWriter(output_path, engine="openpyxl", mode="w") as writer:
-        contexts: dict[str, ExcelContext] = {}
-
-        for section in sections:
-            questions_df = get_questions_by_section(conn, section)
-            questions_df = _sort_questions(questions_df)
-            sheet_name = section[:31]
-            if sheet_name not in contexts:
-                contexts[sheet_name] = ExcelContext(writer, sheet_name)
-
-            for _, question in tqdm(
-                questions_df.iterrows(),
-                total=len(questions_df),
-                desc=f"Building {section} topic sheet",
-                unit="question",
-                colour="green",
-            ):
-                notes, question_title, tables = _build_question_tables(
-                    conn,
-                    question,
-                    initial_only=True,
-                )
-                _append_question_to_sheet(
-                    contexts[sheet_name],
-                    notes,
-                    question_title,
-                    tables,
-                )
+    questions = _iter_questions(conn, sections, TOPIC_SHEET_DESC)
 
-                if question["id"].startswith("cp"):
-                    sin_factor_section = f"{section}_sin_factor"
-                    sin_factor_sheet = sin_factor_section[:31]
-                    if sin_factor_sheet not in contexts:
-                        contexts[sin_factor_sheet] = ExcelContext(
-                            writer,
-                            sin_factor_sheet,
-                        )
-
-                    notes_sf, question_title_sf, tables_sf = _build_question_tables(
-                        conn,
-                        question,
-                        initial_only=False,
-                    )
-                    _append_question_to_sheet(
-                        contexts[sin_factor_sheet],
-                        notes_sf,
-                        question_title_sf,
-                        tables_sf,
-                    )
+    if pipeline is None:
+        _write_topics_workbook(
+            output_path,
+            _build_table_sets_in_order(conn, questions, engine, combined_sin_factor),
+            streaming,
+            parquet=parquet,
+        )
+        return
+
+    pipeline.run(
+        pipeline.build_table_sets(questions),
+        lambda items: _write_topics_workbook(
+            output_path, items, streaming, parquet=parquet
+        ),
+    )
+
+
+def get_metadata_constants() -> dict:
+    """The constants of src/metadata.py, which the reports are derived from."""
+    return {name: value for name, value in vars(metadata).items() if name.isupper()}
+
+
+def get_section_fingerprint(conn, section: str) -> str:
+    """
+    Hash of everything a section report is built from: its questions, their
+    disaggregations.json entries, the constants in src/metadata.py, the
+    database fingerprint and how respondent_dim is built.
+    """
+    questions_df = get_questions_by_section(conn, section)
+    inputs = {
+        "questions": questions_df.to_dict(orient="records"),
+        "disaggregations": {
+            question_id: data.get(question_id, [])
+            for question_id in questions_df["id"]
+        },
+        "metadata": get_metadata_constants(),
+        "database": get_database_fingerprint(conn),
+        "respondent_dim": get_respondent_dim_build_hash(),
+    }
+    encoded = json.dumps(inputs, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def get_section_files(
+    conn,
+    section: str,
+    parquet_dir: Path | None = None,
+    output_dir: Path = OUTPUT_DIR,
+) -> list[str]:
+    """
+    The workbooks a section report writes, and its partition of the Parquet
+    dataset when parquet_dir is given, relative to output_dir.
+    """
+    question_ids = get_questions_by_section(conn, section)["id"]
+    files = [output_dir / f"{section}.xlsx"]
+    if any(_has_sin_factor_report(question_id) for question_id in question_ids):
+        files.append(output_dir / f"{section}_sin_factor.xlsx")
+    if parquet_dir is not None:
+        files.append(parquet_dir / f"seccion={section}")
+    return [os.path.relpath(path, output_dir) for path in files]
+
+
+def get_manifest_entry(
+    conn,
+    section: str,
+    options: dict,
+    parquet_dir: Path | None = None,
+    output_dir: Path = OUTPUT_DIR,
+) -> dict:
+    """
+    What a section report was built from (its fingerprint), with the options
+    that change its files (writer, Parquet export, combined _sin_factor
+    queries) and the files it wrote.
+    """
+    return {
+        "fingerprint": get_section_fingerprint(conn, section),
+        "options": options,
+        "files": get_section_files(conn, section, parquet_dir, output_dir),
+    }
+
+
+def read_manifest(output_dir: Path = OUTPUT_DIR) -> dict[str, dict]:
+    manifest_path = output_dir / MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return {}
+
+    with open(manifest_path, "r") as file:
+        return json.load(file)
+
+
+def write_manifest(manifest: dict[str, dict], output_dir: Path = OUTPUT_DIR) -> None:
+    manifest_path = output_dir / MANIFEST_FILENAME
+    tmp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+
+    with open(tmp_path, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def is_section_up_to_date(
+    section: str,
+    entry: dict,
+    manifest: dict[str, dict],
+    output_dir: Path = OUTPUT_DIR,
+) -> bool:
+    """
+    Whether the section was last built from the same inputs with the same
+    options, and every file it wrote is still there. Entries of older
+    manifests (a bare fingerprint) never match, so those sections rebuild.
+    """
+    return manifest.get(section) == entry and all(
+        (output_dir / path).exists() for path in entry["files"]
+    )
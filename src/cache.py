@@ -0,0 +1,225 @@
+import hashlib
+import json
+import pickle
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+
+import pandas as pd
+
+from src.builder import get_metadata_constants
+from src.database import get_database_fingerprint, get_respondent_dim_build_hash
+from src.paths import DB_DIR
+from src.queries.provisional import get_disaggregation_query
+from src.repository import build_disaggregation_report
+
+CACHE_PATH = DB_DIR / "report_cache.db"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ReportCache:
+    """
+    Pivoted disaggregation tables stored as compressed pickles in a SQLite
+    file. Entries are addressed by a hash of everything the table depends on,
+    so a changed query or database simply misses; the least recently used
+    entries are evicted once the blobs exceed max_bytes.
+
+    Hits only note when each entry was used; the notes are written in one
+    transaction by close(), or before an eviction needs them. The size of
+    the blobs is kept as a running total, so puts only run the eviction
+    query when it exceeds max_bytes.
+
+    Reading an entry unpickles it, which can run arbitrary code: only use a
+    cache file this tool wrote, never one from an untrusted source.
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS report_cache (
+                key TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used INTEGER NOT NULL
+            )"""
+        )
+        self.last_used: dict[str, int] = {}
+        self.total_bytes = self._get_total_bytes()
+        # A smaller max_bytes than the last run's applies right away.
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        self.conn.commit()
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        row = self.conn.execute(
+            "SELECT data FROM report_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.last_used[key] = time.time_ns()
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        data = zlib.compress(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL))
+        row = self.conn.execute(
+            "SELECT size FROM report_cache WHERE key = ?", (key,)
+        ).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO report_cache VALUES (?, ?, ?, ?)",
+            (key, data, len(data), time.time_ns()),
+        )
+        self.last_used.pop(key, None)
+        self.total_bytes += len(data) - (row[0] if row else 0)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        self.conn.commit()
+
+    def _get_total_bytes(self) -> int:
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM report_cache"
+        ).fetchone()[0]
+
+    def _write_last_used(self) -> None:
+        self.conn.executemany(
+            "UPDATE report_cache SET last_used = ? WHERE key = ?",
+            [(last_used, key) for key, last_used in self.last_used.items()],
+        )
+        self.last_used.clear()
+
+    def _evict(self) -> None:
+        self._write_last_used()
+        self.conn.execute(
+            """DELETE FROM report_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT
+                        key,
+                        SUM(size) OVER (ORDER BY last_used DESC, key) AS total
+                    FROM report_cache
+                )
+                WHERE total > ?
+            )""",
+            (self.max_bytes,),
+        )
+        # Other processes may have added entries since the total was read.
+        self.total_bytes = self._get_total_bytes()
+
+    def get_cached_keys(self, keys: list[str]) -> set[str]:
+        cached = set()
+        # Stay under SQLite's bound parameter limit.
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            cached.update(
+                row[0]
+                for row in self.conn.execute(
+                    f"SELECT key FROM report_cache WHERE key IN ({placeholders})",
+                    chunk,
+                )
+            )
+        return cached
+
+    def close(self) -> None:
+        self._write_last_used()
+        self.conn.commit()
+        self.conn.close()
+
+
+class CachedReports:
+    """
+    Serves build_disaggregation_report from a ReportCache, computing misses
+    with engine (or one query per table when it is None) and storing them.
+
+    The key is (question_id, disaggregation, initial_only, hash of the
+    generated SQL and its parameters, fingerprint of the database), plus a
+    hash of the src/metadata.py constants and of how respondent_dim is
+    built, which the labels, column order and groups come from, the pandas
+    version the pickles were written with and engine_name, the engine the
+    tables were computed with, so a table is only served to runs of the
+    engine that produced its dtypes.
+    """
+
+    def __init__(self, conn, cache: ReportCache, engine=None, engine_name="sql"):
+        self.conn = conn
+        self.cache = cache
+        self.engine = engine
+        self.engine_name = engine_name
+        self.fingerprint = get_database_fingerprint(conn)
+        inputs = [get_metadata_constants(), get_respondent_dim_build_hash()]
+        encoded = json.dumps(inputs, sort_keys=True, default=str).encode()
+        self.metadata_hash = hashlib.sha256(encoded).hexdigest()
+        self.sql_hashes: dict[tuple[str, bool], str] = {}
+
+    def _get_sql_hash(self, disaggregation: str, initial_only: bool) -> str:
+        key = (disaggregation, initial_only)
+        if key not in self.sql_hashes:
+            sql, params = get_disaggregation_query(disaggregation, initial_only)
+            query = json.dumps([sql, params], sort_keys=True)
+            self.sql_hashes[key] = hashlib.sha256(query.encode()).hexdigest()
+        return self.sql_hashes[key]
+
+    def get_key(self, question_id: str, disaggregation: str, initial_only: bool) -> str:
+        parts = [
+            question_id,
+            disaggregation,
+            initial_only,
+            self._get_sql_hash(disaggregation, initial_only),
+            self.fingerprint,
+            self.metadata_hash,
+            pd.__version__,
+            self.engine_name,
+        ]
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def get_missing_requests(
+        self, requests: dict[tuple[str, bool], list[str]]
+    ) -> dict[tuple[str, bool], list[str]]:
+        """The questions of each request whose tables are not cached yet."""
+        keys = {
+            (question_id, disaggregation, initial_only): self.get_key(
+                question_id, disaggregation, initial_only
+            )
+            for (disaggregation, initial_only), question_ids in requests.items()
+            for question_id in question_ids
+        }
+        cached = self.cache.get_cached_keys(list(keys.values()))
+
+        missing = {}
+        for (disaggregation, initial_only), question_ids in requests.items():
+            question_ids = [
+                question_id
+                for question_id in question_ids
+                if keys[(question_id, disaggregation, initial_only)] not in cached
+            ]
+            if question_ids:
+                missing[(disaggregation, initial_only)] = question_ids
+
+        return missing
+
+    def build_disaggregation_report(
+        self,
+        question_id: str,
+        disaggregation: str,
+        initial_only: bool = True,
+    ) -> pd.DataFrame:
+        key = self.get_key(question_id, disaggregation, initial_only)
+        df = self.cache.get(key)
+        if df is not None:
+            return df
+
+        if self.engine is None:
+            df = build_disaggregation_report(
+                self.conn, question_id, disaggregation, initial_only
+            )
+        else:
+            df = self.engine.build_disaggregation_report(
+                question_id, disaggregation, initial_only
+            )
+
+        self.cache.put(key, df)
+        return df
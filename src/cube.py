@@ -0,0 +1,371 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.profiling import profile_stage, record_stage
+from src.queries.provisional import (
+    DISAGGREGATIONS_MAP,
+    GEOGRAPHY_STATE,
+    QUESTION_CUBE_COLUMNS,
+    Disaggregation,
+    get_cube_answers_query,
+    get_cube_respondents_query,
+)
+from src.repository import (
+    build_disaggregation_report,
+    get_answer_domain,
+    pivot_disaggregation_report,
+    sum_by_code,
+)
+
+DEFAULT_CUBE_MEGABYTES = 64
+
+
+def is_cube_slice(spec: Disaggregation) -> bool:
+    """Whether the tables of spec can be derived from a QuestionCube."""
+    return (
+        not spec.is_multivalued
+        and spec.answer is None
+        and not spec.mean
+        and not spec.weighted_excluded_groups
+        and spec.get_columns() <= set(QUESTION_CUBE_COLUMNS)
+    )
+
+
+class CubeRespondents:
+    """
+    respondent_dim reduced to profiles: each distinct combination of
+    QUESTION_CUBE_COLUMNS values gets a code, and each column a code per
+    profile into its distinct values. Loaded once and shared by the cubes
+    of every question.
+    """
+
+    def __init__(self, df_respondents: pd.DataFrame):
+        self.respondents = pd.Index(df_respondents["respondent_id"])
+        self.is_initial = df_respondents["is_initial"].to_numpy() == 1
+        factors = df_respondents["factor_cvnl"].to_numpy(dtype=float, na_value=np.nan)
+        # SUM(CASE WHEN is_initial_respondent = 1 THEN factor_cvnl END).
+        self.weights = np.where(self.is_initial, factors, np.nan)
+
+        profiles = df_respondents.groupby(
+            QUESTION_CUBE_COLUMNS, dropna=False, sort=False
+        ).ngroup()
+        self.profiles = profiles.to_numpy()
+        _, first_rows = np.unique(self.profiles, return_index=True)
+        df_profiles = df_respondents.iloc[first_rows]
+        self.n_profiles = len(df_profiles)
+
+        self.codes: dict[str, np.ndarray] = {}
+        self.uniques: dict[str, pd.Index] = {}
+        for column in QUESTION_CUBE_COLUMNS:
+            codes, uniques = pd.factorize(df_profiles[column], use_na_sentinel=False)
+            self.codes[column] = codes.astype(np.int32)
+            self.uniques[column] = pd.Index(uniques, dtype=object)
+
+    @classmethod
+    def from_connection(cls, conn) -> "CubeRespondents":
+        start = time.perf_counter()
+        df_respondents = pd.read_sql_query(get_cube_respondents_query(), conn)
+        record_stage(
+            "sql",
+            time.perf_counter() - start,
+            len(df_respondents),
+            disaggregation="cubo_encuestados",
+        )
+        return cls(df_respondents)
+
+
+class QuestionCube:
+    """
+    The answers of one question counted by every combination of
+    QUESTION_CUBE_COLUMNS, stored sparse: one cell per (answer, respondent
+    profile) that occurs, holding the code of the answer and of the profile,
+    plus the weighted sum over the initial respondents, the count and
+    whether any initial respondent is in the cell.
+
+    Any disaggregation that passes is_cube_slice is a sum of cells, so its
+    weighted and unweighted tables are derived without another query. The
+    groups are worked out once per distinct value of a column and spread to
+    the cells through its codes.
+    """
+
+    def __init__(
+        self,
+        question_id: str,
+        df_answers: pd.DataFrame,
+        respondents: CubeRespondents,
+        domain,
+    ):
+        self.question_id = question_id
+        self.respondents = respondents
+
+        # As the JOIN with respondent_dim, answers of unknown respondents drop.
+        positions = respondents.respondents.get_indexer(df_answers["respondent_id"])
+        joined = positions >= 0
+        df_answers = df_answers.loc[joined, ["option_id", "value"]]
+        positions = positions[joined]
+
+        answer_codes = df_answers.groupby(
+            ["option_id", "value"], dropna=False, sort=False
+        ).ngroup()
+        answer_codes = answer_codes.to_numpy()
+        _, first_rows = np.unique(answer_codes, return_index=True)
+        # Left as object: each table's ids are inferred from its own rows by
+        # pivot_disaggregation_report, as read_sql_query infers them from the
+        # rows each query returns.
+        self.answers = domain.label_answers(
+            df_answers.iloc[first_rows], question_id, infer_dtypes=False
+        )
+
+        n_profiles = respondents.n_profiles
+        cells, cell_codes = np.unique(
+            answer_codes * n_profiles + respondents.profiles[positions],
+            return_inverse=True,
+        )
+        self.answer_codes = cells // n_profiles
+        self.profiles = (cells % n_profiles).astype(np.int32)
+
+        present = np.arange(len(cells))
+        self.valor = sum_by_code(
+            respondents.weights[positions], cell_codes, present, len(cells)
+        )
+        self.valor_sin_factor = np.bincount(cell_codes, minlength=len(cells))
+        initial_cells = cell_codes[respondents.is_initial[positions]]
+        self.initial = np.bincount(initial_cells, minlength=len(cells)) > 0
+
+        arrays = [self.answer_codes, self.profiles, self.valor]
+        arrays += [self.valor_sin_factor, self.initial]
+        answers_nbytes = int(self.answers.memory_usage(deep=True).sum())
+        self.nbytes = sum(array.nbytes for array in arrays) + answers_nbytes
+
+    @classmethod
+    def from_connection(
+        cls, conn, question_id: str, respondents: CubeRespondents
+    ) -> "QuestionCube":
+        start = time.perf_counter()
+        df_answers = pd.read_sql_query(
+            get_cube_answers_query(), conn, params={"question_id": question_id}
+        )
+        cube = cls(question_id, df_answers, respondents, get_answer_domain(conn))
+        record_stage(
+            "sql",
+            time.perf_counter() - start,
+            len(df_answers),
+            question_id=question_id,
+            disaggregation="cubo_pregunta",
+        )
+        return cube
+
+    def __len__(self) -> int:
+        return len(self.answer_codes)
+
+    def _get_codes(self, column: str) -> np.ndarray:
+        """The code of each cell into the distinct values of column."""
+        return self.respondents.codes[column][self.profiles]
+
+    def _isin(self, column: str, values: list | None) -> np.ndarray:
+        """Distinct values of column in values (or not NULL, for None), as SQL IN."""
+        uniques = self.respondents.uniques[column]
+        if values is None:
+            return np.asarray(uniques.notna())
+        return np.asarray(uniques.isin(values))
+
+    def _get_cells(self, column: str, values: list | None) -> np.ndarray:
+        return self._isin(column, values)[self._get_codes(column)]
+
+    def _get_groups(self, spec: Disaggregation) -> tuple[np.ndarray, np.ndarray]:
+        """The grupo code of each cell and the grupo of each code."""
+        if spec.group is None:
+            codes = np.zeros(len(self), dtype=np.int32)
+            return codes, np.array(["Total"], dtype=object)
+
+        if spec.group_cases is None:
+            codes = self._get_codes(spec.group_label)
+            groups = self.respondents.uniques[spec.group_label].to_numpy()
+        else:
+            # The first case that matches wins, as in the CASE expression.
+            n_values = len(self.respondents.uniques[spec.group])
+            labels = np.full(n_values, spec.group_default, dtype=object)
+            for label, values in reversed(spec.group_cases.items()):
+                labels[self._isin(spec.group, values)] = label
+            label_codes, groups = pd.factorize(labels, use_na_sentinel=False)
+            codes = label_codes[self._get_codes(spec.group)]
+            groups = np.asarray(groups, dtype=object)
+
+        if spec.group_when is not None:
+            selected = self._get_cells(*spec.group_when)
+            codes = np.where(selected, codes, len(groups))
+            groups = np.append(groups, None)
+        return codes, groups
+
+    def _get_layers(self, spec: Disaggregation) -> list:
+        """The (cells, grupo codes, grupos) parts the table is summed over."""
+        mask = np.ones(len(self), dtype=bool)
+        for column, values in spec.filters.items():
+            mask &= self._get_cells(column, values)
+
+        if not spec.geography:
+            return [(mask, *self._get_groups(spec))]
+
+        # As _get_geography_rollup_query: the AMM municipalities, then the
+        # regions, then the state.
+        mask &= self._get_cells("city_id", None)
+        uniques = self.respondents.uniques
+        return [
+            (
+                mask & self._get_cells("municipio_amm", None),
+                self._get_codes("municipio_amm"),
+                uniques["municipio_amm"].to_numpy(),
+            ),
+            (mask, self._get_codes("region"), uniques["region"].to_numpy()),
+            (
+                mask,
+                np.zeros(len(self), dtype=np.int32),
+                np.array([GEOGRAPHY_STATE], dtype=object),
+            ),
+        ]
+
+    def get_long(self, spec: Disaggregation, initial_only: bool = True) -> pd.DataFrame:
+        """
+        The rows the spec's query returns for this question, labeled as
+        AnswerDomain.label_answers does: id_respuesta, Respuesta, grupo and
+        valor.
+        """
+        if initial_only:
+            values, selected = self.valor, self.initial
+        else:
+            values, selected = self.valor_sin_factor, np.ones(len(self), dtype=bool)
+
+        answers, groups, sums = [], [], []
+        for mask, group_codes, group_values in self._get_layers(spec):
+            mask = mask & selected
+            if not mask.any():
+                continue
+            n_groups = len(group_values)
+            codes = self.answer_codes[mask] * n_groups + group_codes[mask]
+            present = np.unique(codes)
+            answers.append(present // n_groups)
+            groups.append(group_values[present % n_groups])
+            sums.append(
+                sum_by_code(values[mask], codes, present, len(self.answers) * n_groups)
+            )
+
+        if not answers:
+            # Same columns and dtypes as a query that returned no rows.
+            return pd.DataFrame(
+                columns=["id_respuesta", "Respuesta", "grupo", "valor"], dtype=object
+            )
+
+        answers = np.concatenate(answers)
+        sums = np.concatenate(sums)
+        if values.dtype.kind in "iu":
+            sums = sums.astype(values.dtype)
+
+        df_long = self.answers.take(answers).reset_index(drop=True)
+        df_long["grupo"] = np.concatenate(groups)
+        df_long["valor"] = sums
+        return df_long
+
+
+class CubeCache:
+    """
+    QuestionCubes kept up to max_bytes in total, evicting the least recently
+    used ones first. A cube larger than max_bytes on its own is not kept.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CUBE_MEGABYTES * 1024**2):
+        self.max_bytes = max_bytes
+        self.cubes: OrderedDict[str, QuestionCube] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.too_large = 0
+
+    def get(self, question_id: str) -> QuestionCube | None:
+        cube = self.cubes.get(question_id)
+        if cube is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.cubes.move_to_end(question_id)
+        return cube
+
+    def put(self, cube: QuestionCube) -> None:
+        if cube.nbytes > self.max_bytes:
+            self.too_large += 1
+            return
+
+        while self.cubes and self.nbytes + cube.nbytes > self.max_bytes:
+            _, evicted = self.cubes.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+
+        self.cubes[cube.question_id] = cube
+        self.nbytes += cube.nbytes
+
+    def get_summary(self) -> str:
+        return (
+            f"Cubos por pregunta: {self.hits} aciertos, {self.misses} construidos, "
+            f"{self.evictions} desalojados, {self.too_large} demasiado grandes; "
+            f"{len(self.cubes)} en memoria ({self.nbytes / 1024**2:.1f} de "
+            f"{self.max_bytes / 1024**2:.0f} MB)"
+        )
+
+
+class QuestionCubes:
+    """
+    Serves build_disaggregation_report from a QuestionCube per question,
+    built on the first table of the question that is_cube_slice accepts and
+    kept in a CubeCache. The other tables go to engine (or one query per
+    table when it is None).
+    """
+
+    def __init__(
+        self,
+        conn,
+        max_bytes: int = DEFAULT_CUBE_MEGABYTES * 1024**2,
+        engine=None,
+    ):
+        self.conn = conn
+        self.engine = engine
+        self.cache = CubeCache(max_bytes)
+        self._respondents: CubeRespondents | None = None
+
+    def _get_cube(self, question_id: str) -> QuestionCube:
+        cube = self.cache.get(question_id)
+        if cube is None:
+            if self._respondents is None:
+                self._respondents = CubeRespondents.from_connection(self.conn)
+            cube = QuestionCube.from_connection(
+                self.conn, question_id, self._respondents
+            )
+            self.cache.put(cube)
+        return cube
+
+    def build_disaggregation_report(
+        self,
+        question_id: str,
+        disaggregation: str,
+        initial_only: bool = True,
+    ) -> pd.DataFrame:
+        spec = DISAGGREGATIONS_MAP.get(disaggregation)
+        if spec is None or not is_cube_slice(spec):
+            if self.engine is None:
+                return build_disaggregation_report(
+                    self.conn, question_id, disaggregation, initial_only
+                )
+            return self.engine.build_disaggregation_report(
+                question_id, disaggregation, initial_only
+            )
+
+        cube = self._get_cube(question_id)
+        keys = {"question_id": question_id, "disaggregation": disaggregation}
+        with profile_stage("pivot", **keys):
+            df_long = cube.get_long(spec, initial_only)
+            return pivot_disaggregation_report(df_long, disaggregation)
+
+    def get_summary(self) -> str:
+        return self.cache.get_summary()
@@ -1,8 +1,343 @@
+import hashlib
+import json
+import os
+import re
 import sqlite3
+import warnings
+from pathlib import Path
+
 from src.paths import DB_DIR
+from src.queries.provisional import DISAGGREGATIONS_MAP, get_disaggregation_query
+from src.queries.respondent_dim import (
+    get_build_inputs,
+    get_create_respondent_dim_query,
+    get_insert_respondent_dim_query,
+    get_multivalued_attribute_query,
+    get_update_age_group_query,
+)
+
+
+def get_connection(
+    read_only: bool = False,
+    check_same_thread: bool = True,
+    db_path: Path | None = None,
+    respondent_dim: bool = True,
+) -> sqlite3.Connection:
+    """
+    Connects to survey.db with the respondent_dim cache attached, which the
+    disaggregation queries and every engine read; without respondent_dim the
+    cache is neither built nor attached.
+    """
+    if db_path is None:
+        db_path = DB_DIR / "survey.db"
+    if read_only:
+        conn = sqlite3.connect(
+            _get_read_only_uri(db_path),
+            uri=True,
+            check_same_thread=check_same_thread,
+        )
+    else:
+        conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+    if respondent_dim:
+        attach_respondent_dim(conn, db_path, read_only)
+    return conn
 
 
-def get_connection() -> sqlite3.Connection:
-    db_path = DB_DIR / "survey.db"
-    conn = sqlite3.connect(db_path)
+# Read-only connections of concurrent workers: no journal, the file mapped
+# into memory and a larger page cache per connection.
+READ_ONLY_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA mmap_size = 1073741824",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA query_only = ON",
+]
+# Every disaggregation has up to six query variants; keep them all prepared.
+CACHED_STATEMENTS = 512
+
+
+def connect_read_only(
+    db_path: Path | None = None,
+    check_same_thread: bool = True,
+    respondent_dim: bool = True,
+) -> sqlite3.Connection:
+    """
+    Opens survey.db and its respondent_dim cache as immutable, so SQLite
+    skips locking and change detection, with READ_ONLY_PRAGMAS. Neither file
+    may change while the connection is open: open a writable connection
+    first (as main.py does) so respondent_dim is up to date.
+    """
+    if db_path is None:
+        db_path = DB_DIR / "survey.db"
+    conn = sqlite3.connect(
+        _get_read_only_uri(db_path, immutable=True),
+        uri=True,
+        check_same_thread=check_same_thread,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    if respondent_dim:
+        attach_respondent_dim(conn, db_path, read_only=True, immutable=True)
+    for pragma in READ_ONLY_PRAGMAS:
+        conn.execute(pragma)
     return conn
+
+
+def _get_read_only_uri(path: Path, immutable: bool = False) -> str:
+    uri = f"{path.resolve().as_uri()}?mode=ro"
+    return f"{uri}&immutable=1" if immutable else uri
+
+
+class InMemoryConnection(sqlite3.Connection):
+    """A copy of survey.db in memory, made by copy_to_memory."""
+
+    source_fingerprint: str | None = None
+
+
+# The whole database is already in memory; the cache and temp_store keep the
+# sorts and temporary b-trees of the GROUP BY queries there too.
+IN_MEMORY_PRAGMAS = [
+    "PRAGMA cache_size = -524288",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA query_only = ON",
+]
+# Lets the backup read the source file through mmap instead of read() calls.
+BACKUP_MMAP_SIZE = 2 * 1024**3
+
+
+def copy_to_memory(
+    source: sqlite3.Connection, check_same_thread: bool = True
+) -> InMemoryConnection:
+    """
+    Copies the database source is connected to into a :memory: database with
+    the backup API, and its attached respondent_dim cache, if any, into an
+    in-memory dim schema, so every query runs from RAM. The copy is
+    read-only and keeps the fingerprint of the file it was loaded from.
+    """
+    fingerprint = get_database_fingerprint(source)
+    source.execute(f"PRAGMA mmap_size = {BACKUP_MMAP_SIZE}")
+
+    conn = sqlite3.connect(
+        ":memory:",
+        factory=InMemoryConnection,
+        check_same_thread=check_same_thread,
+        uri=True,
+    )
+    source.backup(conn)
+    files = {name: file for _, name, file in source.execute("PRAGMA database_list")}
+    if "dim" in files:
+        conn.execute("ATTACH DATABASE ':memory:' AS dim")
+        _copy_database(conn, Path(files["dim"]), "dim")
+
+    for pragma in IN_MEMORY_PRAGMAS:
+        conn.execute(pragma)
+    conn.source_fingerprint = fingerprint
+    return conn
+
+
+_CREATE_PATTERN = re.compile(r"^(CREATE (?:UNIQUE )?(?:TABLE|INDEX)) ")
+
+
+def _copy_database(conn: sqlite3.Connection, path: Path, schema: str) -> None:
+    """
+    Copies the tables and indexes of the database file at path into schema,
+    with their declared column types, through a read-only attachment.
+    (The backup API only writes to main; Connection.deserialize, which could
+    load the file into any schema, needs Python 3.11.)
+    """
+    conn.execute("ATTACH DATABASE ? AS copy_source", (_get_read_only_uri(path),))
+    try:
+        # Tables first, so the indexes are built once on the copied rows.
+        objects = conn.execute(
+            """SELECT type, name, sql FROM copy_source.sqlite_master
+            WHERE sql IS NOT NULL
+            ORDER BY type = 'index'"""
+        ).fetchall()
+        for object_type, name, sql in objects:
+            conn.execute(_CREATE_PATTERN.sub(rf"\1 {schema}.", sql, count=1))
+            if object_type == "table":
+                conn.execute(
+                    f'INSERT INTO {schema}."{name}" SELECT * FROM copy_source."{name}"'
+                )
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE copy_source")
+
+
+def get_respondent_dim_path(db_path: Path) -> Path:
+    return db_path.with_name(f"{db_path.stem}_respondent_dim.db")
+
+
+def _get_fingerprint(db_path: Path) -> str:
+    stat = os.stat(db_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def get_database_fingerprint(conn: sqlite3.Connection) -> str:
+    """Fingerprint of the main database file conn is connected to."""
+    if isinstance(conn, InMemoryConnection):
+        return conn.source_fingerprint
+    for _, name, file in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return _get_fingerprint(Path(file))
+    raise ValueError("Connection has no main database.")
+
+
+def get_respondent_dim_build_hash() -> str:
+    """Hash of the code and constants respondent_dim is built with."""
+    encoded = json.dumps(get_build_inputs(), sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _read_build_info(dim_path: Path) -> tuple[str, str] | None:
+    """The (survey.db fingerprint, build hash) respondent_dim was built with."""
+    if not dim_path.exists():
+        return None
+
+    conn = sqlite3.connect(dim_path)
+    try:
+        row = conn.execute(
+            "SELECT fingerprint, build_hash FROM respondent_dim_info"
+        ).fetchone()
+    except sqlite3.DatabaseError:
+        # Caches from before build_hash was recorded are rebuilt too.
+        return None
+    finally:
+        conn.close()
+
+    return tuple(row) if row else None
+
+
+def _get_column_types(conn: sqlite3.Connection, table: str) -> dict[str, str]:
+    return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def build_respondent_dim(
+    conn: sqlite3.Connection, dim_path: Path, fingerprint: str, build_hash: str
+):
+    """
+    Pivots the single-valued respondent attributes into one row per
+    respondent and writes them, with the survey.db fingerprint and the build
+    hash they were built from, to dim_path.
+
+    An attribute with several values for a respondent is a data problem that
+    is reported as a warning, so the reports can still be built;
+    respondent_dim keeps the largest of the values.
+    """
+    for attribute, respondents in conn.execute(get_multivalued_attribute_query()):
+        warnings.warn(
+            f"Attribute '{attribute}' has more than one value for {respondents} "
+            "respondents; respondent_dim keeps the largest value of each.",
+            stacklevel=2,
+        )
+
+    response_types = _get_column_types(conn, "responses")
+    value_type = _get_column_types(conn, "respondent_attributes").get("value", "")
+    label_type = _get_column_types(conn, "options").get("option_label", "")
+
+    tmp_path = dim_path.with_name(f"{dim_path.name}.tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    conn.execute("ATTACH DATABASE ? AS respondent_dim_build", (str(tmp_path),))
+    try:
+        conn.execute(
+            get_create_respondent_dim_query(
+                "respondent_dim_build", response_types, value_type, label_type
+            )
+        )
+        conn.execute(get_insert_respondent_dim_query("respondent_dim_build"))
+        conn.execute(get_update_age_group_query("respondent_dim_build"))
+        conn.execute(
+            "CREATE TABLE respondent_dim_build.respondent_dim_info "
+            "(fingerprint TEXT, build_hash TEXT)"
+        )
+        conn.execute(
+            "INSERT INTO respondent_dim_build.respondent_dim_info VALUES (?, ?)",
+            (fingerprint, build_hash),
+        )
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE respondent_dim_build")
+
+    os.replace(tmp_path, dim_path)
+
+
+def attach_respondent_dim(
+    conn: sqlite3.Connection,
+    db_path: Path,
+    read_only: bool = False,
+    immutable: bool = False,
+):
+    """
+    Attaches the respondent_dim cache next to db_path, rebuilding it when
+    survey.db, or the code and src/metadata.py constants it is built with
+    (get_respondent_dim_build_hash), changed since it was built. Queries
+    reference the table unqualified, so it resolves to the attached
+    database.
+
+    Read-only connections attach the cache as is; open a writable connection
+    first (as main.py does) so it is up to date.
+    """
+    dim_path = get_respondent_dim_path(db_path)
+
+    if read_only:
+        dim_uri = _get_read_only_uri(dim_path, immutable)
+        conn.execute("ATTACH DATABASE ? AS dim", (dim_uri,))
+        return
+
+    fingerprint = _get_fingerprint(db_path)
+    build_hash = get_respondent_dim_build_hash()
+    if _read_build_info(dim_path) != (fingerprint, build_hash):
+        build_respondent_dim(conn, dim_path, fingerprint, build_hash)
+
+    conn.execute("ATTACH DATABASE ? AS dim", (str(dim_path),))
+
+
+# Covering indexes for the lookups the tabulation queries and the
+# respondent_dim build depend on.
+INDEX_STATEMENTS = [
+    """CREATE INDEX IF NOT EXISTS idx_answers_question
+        ON answers (question_id, respondent_id, option_id, value)""",
+    """CREATE INDEX IF NOT EXISTS idx_respondent_attributes_respondent
+        ON respondent_attributes (respondent_id, attribute, value, question_id)""",
+    """CREATE INDEX IF NOT EXISTS idx_options_question
+        ON options (question_id, option_id, option_label)""",
+    """CREATE INDEX IF NOT EXISTS idx_responses_respondent
+        ON responses (respondent_id, city_id, factor_cvnl, is_initial_respondent)""",
+]
+
+_TABLE_ALIAS_PATTERN = re.compile(
+    r"(?:FROM|JOIN)\s+(?:answers|responses|respondent_attributes|options|respondent_dim)\s+(\w+)"
+)
+
+
+def prepare_database(conn: sqlite3.Connection):
+    for statement in INDEX_STATEMENTS:
+        conn.execute(statement)
+    conn.execute("ANALYZE main")
+    conn.commit()
+
+
+def find_full_scans(conn: sqlite3.Connection) -> list[tuple[str, bool | None, bool, str]]:
+    """
+    Runs EXPLAIN QUERY PLAN for every query in DISAGGREGATIONS_MAP and
+    returns (disaggregation, initial_only, batched, plan step) for each step
+    that scans a survey table or needs an automatic index for it.
+    """
+    full_scans = []
+    for disaggregation in DISAGGREGATIONS_MAP:
+        for initial_only in (True, False, None):
+            for batched in (False, True):
+                query, params = get_disaggregation_query(
+                    disaggregation, initial_only, batched
+                )
+                question = {"question_ids": "[]"} if batched else {"question_id": ""}
+                params = {**params, **question}
+                aliases = set(_TABLE_ALIAS_PATTERN.findall(query))
+
+                for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params):
+                    detail = row[-1]
+                    match = re.match(r"SCAN (\w+)", detail)
+                    scanned = match is not None and match.group(1) in aliases
+                    if scanned or "AUTOMATIC" in detail:
+                        full_scans.append((disaggregation, initial_only, batched, detail))
+
+    return full_scans
@@ -1,7 +1,24 @@
+import math
+import re
+from abc import ABC, abstractmethod
+from copy import copy
+from functools import cache
+from io import BytesIO
+from weakref import WeakKeyDictionary
+from xml.sax.saxutils import escape
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.exceptions import IllegalCharacterError
 from openpyxl.styles import Font, Alignment, Border, Side, numbers
 
+from src.profiling import profile_stage
+
 
 class ExcelContext:
     def __init__(self, writer, sheet_name, start_row=0):
@@ -10,163 +27,560 @@ class ExcelContext:
         self.start_row = start_row
 
 
-def get_writer_config(output_path: Path) -> dict:
-    if output_path.exists():
-        mode = "a"
-        if_sheet = "overlay"
+class RowWriter(ABC):
+    """
+    Interface of the workbook writers that take each sheet's rows in order,
+    values with their style arrays, instead of DataFrames through
+    pd.ExcelWriter; write_text_to_excel and write_table_to_excel hand their
+    rows to append_row. Their time is profiled as profile_stage.
+    """
+
+    profile_stage: str
+
+    def __init__(self, path: Path, book: Workbook):
+        self.path = path
+        self.book = book
+        self.sheets = {}
+        self._next_row = {}
+
+    def get_sheet(self, sheet_name: str):
+        if sheet_name not in self.sheets:
+            self.sheets[sheet_name] = self.book.create_sheet(sheet_name)
+            self._next_row[sheet_name] = 1
+        return self.sheets[sheet_name]
+
+    def _check_row(self, sheet_name: str, row: int) -> None:
+        if row < self._next_row[sheet_name]:
+            raise ValueError(
+                f"Row {row} of sheet '{sheet_name}' was already written; "
+                "rows must be written in order."
+            )
+
+    @abstractmethod
+    def append_row(self, sheet_name: str, row: int, values: list, styles: list) -> None:
+        """Writes a row of values with their style arrays at the 1-based row."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Saves the workbook to path."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class StreamingExcelWriter(RowWriter):
+    """
+    Write-only openpyxl workbook. Rows are emitted in order with their styles
+    already attached instead of being styled cell by cell afterwards, so
+    memory stays flat however large the workbook gets.
+    """
+
+    profile_stage = "streaming_write"
+
+    def __init__(self, path: Path):
+        super().__init__(path, Workbook(write_only=True))
+
+    def append_row(self, sheet_name: str, row: int, values: list, styles: list) -> None:
+        ws = self.get_sheet(sheet_name)
+        self._check_row(sheet_name, row)
+
+        while self._next_row[sheet_name] < row:
+            ws.append([])
+            self._next_row[sheet_name] += 1
+
+        cells = []
+        for value, style in zip(values, styles):
+            cell = WriteOnlyCell(ws, value=value)
+            cell._style = copy(style)
+            cells.append(cell)
+        ws.append(cells)
+        self._next_row[sheet_name] += 1
+
+    def close(self) -> None:
+        self.book.save(self.path)
+
+
+# How openpyxl saves a worksheet without cells; openpyxl is pinned to the
+# minor version these were checked against (see can_assemble_sheets).
+EMPTY_DIMENSION = '<dimension ref="A1:A1" />'
+EMPTY_SHEET_DATA = "<sheetData></sheetData>"
+# Longer strings are cut by openpyxl, as Excel allows no more in a cell.
+SHEET_STRING_MAX_LENGTH = 32767
+# The control characters openpyxl refuses in strings, and the error values
+# it writes as such instead of as text.
+ILLEGAL_CHARACTERS_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+ERROR_CODES = ("#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A")
+
+
+def _get_cell_xml(coordinate: str, value, style_id: int | None) -> str:
+    """
+    The <c> element openpyxl writes for a cell holding value, for the values
+    _to_cell_value returns.
+    """
+    style = "" if style_id is None else f' s="{style_id}"'
+
+    if isinstance(value, str):
+        value = value[:SHEET_STRING_MAX_LENGTH]
+        if ILLEGAL_CHARACTERS_RE.search(value):
+            raise IllegalCharacterError(f"{value} cannot be used in worksheets.")
+        if len(value) > 1 and value.startswith("="):
+            return f'<c r="{coordinate}"{style}><f>{escape(value[1:])}</f><v /></c>'
+        if value in ERROR_CODES:
+            return f'<c r="{coordinate}"{style} t="e"><v>{escape(value)}</v></c>'
+        if not value:
+            return f'<c r="{coordinate}"{style} t="inlineStr" />'
+        stripped = value.strip()
+        space = ' xml:space="preserve"' if stripped and stripped != value else ""
+        return (
+            f'<c r="{coordinate}"{style} t="inlineStr">'
+            f"<is><t{space}>{escape(value)}</t></is></c>"
+        )
+
+    if isinstance(value, bool):
+        data_type = "b"
+    elif isinstance(value, (int, float)):
+        data_type = "n"
     else:
-        mode = "w"
-        if_sheet = None
+        raise ValueError(f"Cannot convert {value!r} to Excel")
+    # _to_cell_value already turned NaN and infinities into strings.
+    return f'<c r="{coordinate}"{style} t="{data_type}"><v>{value:.16g}</v></c>'
+
+
+class BufferedExcelWriter(RowWriter):
+    """
+    Regular (not write-only) workbook whose sheets are assembled in memory
+    and placed in the file at once. Text lines and tables are turned into
+    the <row> elements openpyxl would write for them, styles included, as
+    they are appended; close saves the workbook with empty sheets, which
+    still carries the styles, and puts the rows of each sheet into its XML.
+
+    That skips the Cell objects, one to_excel call per block and the second
+    pass over the cells to style them, and openpyxl's element-by-element
+    serialization, the slowest step without lxml.
+
+    It depends on openpyxl internals: the elements it writes for an empty
+    sheet (EMPTY_DIMENSION, EMPTY_SHEET_DATA), which are replaced in the
+    saved XML, and the _style arrays of its cells. Only open it through
+    open_excel_writer, which checks the former with can_assemble_sheets.
+    """
+
+    profile_stage = "sheet_assembly"
+
+    def __init__(self, path: Path):
+        book = Workbook()
+        book.remove(book.active)
+        super().__init__(path, book)
+        self._rows: dict[str, list[str]] = {}
+        self._first_row: dict[str, int] = {}
+        self._max_column: dict[str, int] = {}
+        self._style_ids: dict[tuple, int | None] = {}
+
+    def _get_style_id(self, ws, style) -> int | None:
+        key = tuple(style)
+        if key not in self._style_ids:
+            cell = WriteOnlyCell(ws)
+            cell._style = copy(style)
+            # style_id adds the style to the workbook's list, as saving does.
+            self._style_ids[key] = cell.style_id if any(style) else None
+        return self._style_ids[key]
+
+    def append_row(self, sheet_name: str, row: int, values: list, styles: list) -> None:
+        """Serializes a row of values with their style arrays at the 1-based row."""
+        ws = self.get_sheet(sheet_name)
+        self._check_row(sheet_name, row)
+
+        cells = "".join(
+            _get_cell_xml(
+                f"{get_column_letter(column)}{row}",
+                value,
+                self._get_style_id(ws, style),
+            )
+            for column, (value, style) in enumerate(zip(values, styles), start=1)
+        )
+        self._rows.setdefault(sheet_name, []).append(f'<row r="{row}">{cells}</row>')
+        self._first_row.setdefault(sheet_name, row)
+        self._max_column[sheet_name] = max(
+            self._max_column.get(sheet_name, 1), len(values)
+        )
+        self._next_row[sheet_name] = row + 1
+
+    def _get_sheet_xml(self, sheet_name: str, xml: str) -> str:
+        rows = self._rows.get(sheet_name)
+        if not rows:
+            return xml
+        if EMPTY_DIMENSION not in xml or EMPTY_SHEET_DATA not in xml:
+            raise ValueError(f"Unexpected XML for the empty sheet '{sheet_name}'.")
+
+        dimension = (
+            f"A{self._first_row[sheet_name]}:"
+            f"{get_column_letter(self._max_column[sheet_name])}"
+            f"{self._next_row[sheet_name] - 1}"
+        )
+        return xml.replace(
+            EMPTY_DIMENSION, f'<dimension ref="{dimension}" />', 1
+        ).replace(EMPTY_SHEET_DATA, f"<sheetData>{''.join(rows)}</sheetData>", 1)
+
+    def close(self) -> None:
+        with profile_stage("sheet_write"):
+            package = BytesIO()
+            self.book.save(package)
+
+            sheet_names = {ws.path[1:]: name for name, ws in self.sheets.items()}
+            with ZipFile(package) as source, ZipFile(
+                self.path, "w", ZIP_DEFLATED, allowZip64=True
+            ) as target:
+                for info in source.infolist():
+                    data = source.read(info.filename)
+                    if info.filename in sheet_names:
+                        xml = self._get_sheet_xml(
+                            sheet_names[info.filename], data.decode("utf-8")
+                        )
+                        data = xml.encode("utf-8")
+                    target.writestr(info, data)
+
+
+@cache
+def can_assemble_sheets() -> bool:
+    """
+    Whether this openpyxl saves an empty sheet the way BufferedExcelWriter
+    expects, checked once on a throwaway workbook.
+    """
+    book = Workbook()
+    package = BytesIO()
+    book.save(package)
+    with ZipFile(package) as source:
+        xml = source.read(book.active.path[1:]).decode("utf-8")
+    return EMPTY_DIMENSION in xml and EMPTY_SHEET_DATA in xml
+
+
+def open_excel_writer(path: Path, streaming: bool = False, buffered: bool = True):
+    """
+    The streaming writer, or a regular workbook: assembled by
+    BufferedExcelWriter, or written block by block through pd.ExcelWriter.
+
+    BufferedExcelWriter fills in the XML openpyxl saves for empty sheets,
+    which openpyxl does not document and may change; when it is not the XML
+    it expects, pd.ExcelWriter, which only uses openpyxl's public API, writes
+    the same regular workbook instead.
+    """
+    if streaming:
+        return StreamingExcelWriter(path)
+    if buffered and can_assemble_sheets():
+        return BufferedExcelWriter(path)
+    return pd.ExcelWriter(path, engine="openpyxl", mode="w")
+
+
+THIN = Side(style="thin", color="000000")
+
+DATA_ROW = "data"
+TOTAL_ROW = "total"
+PROMEDIO_ROW = "promedio"
+
+ROW_KINDS = {"Total": TOTAL_ROW, "Promedio": PROMEDIO_ROW}
+
+
+class TableStyles:
+    """
+    Registry of the few font/border/alignment/number format combinations the
+    reports use. Each combination is added to the workbook's style lists the
+    first time it is needed; cells then get a copy of its style array instead
+    of new style objects that openpyxl has to hash and look up again.
+    """
+
+    def __init__(self):
+        self._styles = {}
+
+    def _get(self, ws, key: tuple, **attributes):
+        if key not in self._styles:
+            cell = WriteOnlyCell(ws)
+            for name, value in attributes.items():
+                setattr(cell, name, value)
+            self._styles[key] = cell._style
+        return self._styles[key]
+
+    def text(self, ws, is_hdr: bool):
+        return self._get(
+            ws,
+            ("text", is_hdr),
+            font=Font(bold=True, color="7E33C3" if is_hdr else None),
+        )
 
-    return {
-        "path": output_path,
-        "engine": "openpyxl",
-        "mode": mode,
-        "if_sheet_exists": if_sheet,
-    }
+    def header(self, ws, is_first: bool, is_last: bool):
+        return self._get(
+            ws,
+            ("header", is_first, is_last),
+            alignment=Alignment(horizontal="left"),
+            border=Border(
+                left=THIN if is_first else None,
+                right=THIN if is_last else None,
+                top=THIN,
+                bottom=THIN,
+            ),
+        )
 
+    def data(
+        self, ws, is_first: bool, is_last: bool, is_last_row: bool, number_format: str
+    ):
+        return self._get(
+            ws,
+            ("data", is_first, is_last, is_last_row, number_format),
+            border=Border(
+                left=THIN if is_first else None,
+                right=THIN if is_last else None,
+                bottom=THIN if is_last_row else None,
+            ),
+            number_format=number_format,
+        )
 
-def _apply_text_style(ws, row: int, col: int, is_hdr: bool) -> None:
-    cell = ws.cell(row=row, column=col)
-    bold = True
-    color = "7E33C3" if is_hdr else None
 
-    cell.font = Font(bold=bold, color=color)
+_TABLE_STYLES = WeakKeyDictionary()
 
 
-def _apply_table_style(
-    ws, start_row: int, start_col: int, n_rows: int, n_cols: int, is_rel: bool
-) -> None:
-    thin = Side(style="thin", color="000000")
-
-    # Header row
-    for c in range(start_col, start_col + n_cols):
-        is_first = c == start_col
-        is_last = c == start_col + n_cols - 1
-        cell = ws.cell(row=start_row, column=c)
-        cell.alignment = Alignment(horizontal="left")
-        cell.border = Border(
-            left=thin if is_first else None,
-            right=thin if is_last else None,
-            top=thin,
-            bottom=thin,
-        )
+def get_table_styles(ws) -> TableStyles:
+    book = ws.parent
+    if book not in _TABLE_STYLES:
+        _TABLE_STYLES[book] = TableStyles()
+    return _TABLE_STYLES[book]
 
-    # Data cells
-    for r in range(start_row + 1, start_row + n_rows):
-        is_last_row = r == start_row + n_rows - 1
-        # Check if this row is a "Promedio" row
-        first_cell_value = ws.cell(row=r, column=start_col).value
-        is_promedio_row = first_cell_value == "Promedio"
-        
-        for c in range(start_col, start_col + n_cols):
-            cell = ws.cell(row=r, column=c)
-            is_first = c == start_col
-            is_last = c == start_col + n_cols - 1
-            cell.border = Border(
-                left=thin if is_first else None,
-                right=thin if is_last else None,
-                bottom=thin if is_last_row else None,
-            )
-            if c >= start_col + 2:
-                if is_rel:
-                    cell.number_format = "0.0%"
-                elif is_promedio_row:
-                    cell.number_format = "0.0"
-                else:
-                    cell.number_format = numbers.FORMAT_NUMBER
 
+def get_row_kinds(df: pd.DataFrame) -> list[str]:
+    if len(df.columns) == 0:
+        return [DATA_ROW] * len(df)
+    return [ROW_KINDS.get(value, DATA_ROW) for value in df.iloc[:, 0].tolist()]
 
-def write_text_to_excel(ctx: ExcelContext, text: str, is_hdr: bool = False) -> None:
-    pd.DataFrame([[text]]).to_excel(
-        ctx.writer,
-        sheet_name=ctx.sheet_name,
-        startrow=ctx.start_row,
-        index=False,
-        header=False,
-    )
-    ws = ctx.writer.sheets[ctx.sheet_name]
-    _apply_text_style(ws, ctx.start_row + 1, 1, is_hdr)
-    ctx.start_row += 2
 
+def _get_number_format(row_kind: str, is_rel: bool) -> str:
+    if is_rel:
+        return "0.0%"
+    if row_kind == PROMEDIO_ROW:
+        return "0.0"
+    return numbers.FORMAT_NUMBER
 
-def write_table_to_excel(
-    ctx: ExcelContext, df: pd.DataFrame, is_rel: bool = False
-) -> None:
-    df.to_excel(
-        ctx.writer,
-        sheet_name=ctx.sheet_name,
-        startrow=ctx.start_row,
-        index=False,
-    )
-    ws = ctx.writer.sheets[ctx.sheet_name]
-    _apply_table_style(ws, ctx.start_row + 1, 1, len(df) + 1, len(df.columns), is_rel)
-    ctx.start_row += len(df) + 3
+
+def _get_header_styles(ws, n_cols: int) -> list:
+    styles = get_table_styles(ws)
+    return [styles.header(ws, c == 0, c == n_cols - 1) for c in range(n_cols)]
 
 
-def add_total_row(df: pd.DataFrame) -> pd.DataFrame:
-    if df.empty:
-        return df
+def _get_row_styles(
+    ws, n_cols: int, row_kind: str, is_last_row: bool, is_rel: bool
+) -> list:
+    styles = get_table_styles(ws)
+    number_format = _get_number_format(row_kind, is_rel)
+    return [
+        styles.data(
+            ws,
+            c == 0,
+            c == n_cols - 1,
+            is_last_row,
+            number_format if c >= 2 else numbers.FORMAT_GENERAL,
+        )
+        for c in range(n_cols)
+    ]
 
-    total_row = df.iloc[:, 2:].sum()
-    total_row.name = "Total"
-    total_df = pd.DataFrame(total_row).T
-    total_df.insert(0, df.columns[0], "Total")
-    total_df.insert(1, df.columns[1], "Total")
 
-    return pd.concat([df, total_df], ignore_index=True)
+def _iter_table_styles(ws, n_cols: int, row_kinds: list[str], is_rel: bool):
+    """Yields the style arrays of the header row and then of each data row."""
+    yield _get_header_styles(ws, n_cols)
 
+    row_styles = {}
+    for r, row_kind in enumerate(row_kinds):
+        key = (row_kind, r == len(row_kinds) - 1)
+        if key not in row_styles:
+            row_styles[key] = _get_row_styles(ws, n_cols, *key, is_rel)
+        yield row_styles[key]
 
-def add_weighted_average_row(df: pd.DataFrame) -> pd.DataFrame:
-    if df.empty:
-        return df
 
-    valid_df = df[~df[df.columns[0]].isin(["Total", "Promedio"])]
-    weighted_averages = {}
-    for col in df.columns[2:]:
-        weights = pd.to_numeric(valid_df[col], errors="coerce")
-        values = pd.to_numeric(valid_df["Respuesta"], errors="coerce")
+def _apply_text_style(ws, row: int, col: int, is_hdr: bool) -> None:
+    style = get_table_styles(ws).text(ws, is_hdr)
+    ws.cell(row=row, column=col)._style = copy(style)
 
-        mask = ~values.isin([7777, 8888, 9999]) & ~weights.isin([7777, 8888, 9999])
-        filtered_values = values[mask]
-        filtered_weights = weights[mask]
 
-        if filtered_weights.sum() == 0:
-            weighted_avg = 0
-        else:
-            weighted_avg = (
-                filtered_values * filtered_weights
-            ).sum() / filtered_weights.sum()
+def _apply_table_style(
+    ws,
+    start_row: int,
+    start_col: int,
+    n_cols: int,
+    row_kinds: list[str],
+    is_rel: bool,
+) -> None:
+    for r, styles in enumerate(_iter_table_styles(ws, n_cols, row_kinds, is_rel)):
+        for c, style in enumerate(styles):
+            ws.cell(row=start_row + r, column=start_col + c)._style = copy(style)
+
+
+def _to_cell_value(value):
+    # Same conversions DataFrame.to_excel applies with its defaults.
+    if value is None or value is pd.NA:
+        return ""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ""
+        if math.isinf(value):
+            return "inf" if value > 0 else "-inf"
+    return value
+
+
+def _stream_text(ctx: ExcelContext, text: str, is_hdr: bool) -> None:
+    writer = ctx.writer
+    ws = writer.get_sheet(ctx.sheet_name)
+    style = get_table_styles(ws).text(ws, is_hdr)
+    writer.append_row(
+        ctx.sheet_name, ctx.start_row + 1, [_to_cell_value(text)], [style]
+    )
+    ctx.start_row += 2
 
-        weighted_averages[col] = weighted_avg
-    weighted_avg_row = pd.DataFrame(weighted_averages, index=["Promedio"])
-    weighted_avg_row.insert(0, df.columns[0], "Promedio")
-    weighted_avg_row.insert(1, df.columns[1], "Promedio")
 
-    return pd.concat([df, weighted_avg_row], ignore_index=True)
+def _stream_table(ctx: ExcelContext, df: pd.DataFrame, is_rel: bool) -> None:
+    writer = ctx.writer
+    n_cols = len(df.columns)
 
+    if n_cols:
+        ws = writer.get_sheet(ctx.sheet_name)
+        rows = [df.columns.tolist()]
+        rows.extend(df.itertuples(index=False, name=None))
+        table_styles = _iter_table_styles(ws, n_cols, get_row_kinds(df), is_rel)
 
-def get_relative_table(df: pd.DataFrame) -> pd.DataFrame:
-    # Remove Promedio row if exists
-    df = df[df[df.columns[0]] != "Promedio"]
+        for r, (values, styles) in enumerate(zip(rows, table_styles)):
+            writer.append_row(
+                ctx.sheet_name,
+                ctx.start_row + 1 + r,
+                [_to_cell_value(value) for value in values],
+                styles,
+            )
 
-    if df.empty:
-        return df
+    ctx.start_row += len(df) + 3
 
-    relative_df = df.copy()
-    for col in df.columns[2:]:
-        total = df[col].iloc[-1]
-        if total == 0:
-            relative_df[col] = 0
-        else:
-            relative_df[col] = df[col] / total
-    return relative_df
+
+def write_text_to_excel(ctx: ExcelContext, text: str, is_hdr: bool = False) -> None:
+    if isinstance(ctx.writer, RowWriter):
+        with profile_stage(ctx.writer.profile_stage):
+            _stream_text(ctx, text, is_hdr)
+        return
+
+    with profile_stage("to_excel"):
+        pd.DataFrame([[text]]).to_excel(
+            ctx.writer,
+            sheet_name=ctx.sheet_name,
+            startrow=ctx.start_row,
+            index=False,
+            header=False,
+        )
+    with profile_stage("styling"):
+        ws = ctx.writer.sheets[ctx.sheet_name]
+        _apply_text_style(ws, ctx.start_row + 1, 1, is_hdr)
+    ctx.start_row += 2
 
 
-def add_total_column(df: pd.DataFrame) -> pd.DataFrame:
-    if df.empty:
-        return df
+def write_table_to_excel(
+    ctx: ExcelContext, df: pd.DataFrame, is_rel: bool = False
+) -> None:
+    if isinstance(ctx.writer, RowWriter):
+        with profile_stage(ctx.writer.profile_stage):
+            _stream_table(ctx, df, is_rel)
+        return
+
+    with profile_stage("to_excel"):
+        df.to_excel(
+            ctx.writer,
+            sheet_name=ctx.sheet_name,
+            startrow=ctx.start_row,
+            index=False,
+        )
+    with profile_stage("styling"):
+        ws = ctx.writer.sheets[ctx.sheet_name]
+        _apply_table_style(
+            ws, ctx.start_row + 1, 1, len(df.columns), get_row_kinds(df), is_rel
+        )
+    ctx.start_row += len(df) + 3
+
+
+# Answer codes (and counts) left out of the weighted average.
+NON_RESPONSE_CODES = [7777, 8888, 9999]
+
+
+def build_report_tables(
+    report: pd.DataFrame,
+    total_column: bool = True,
+    weighted_average: bool = False,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Absolute and relative tables of a pivoted report: a Total row, a Total
+    column when requested, a weighted Promedio row when requested, and each
+    column divided by its total. They are computed on the count matrix with
+    NumPy and turned into DataFrames once at the end; benchmarks/
+    post_processing.py keeps the pandas chain they replaced.
+    """
+    if report.empty:
+        return report, report
+
+    id_column, label_column = report.columns[:2]
+    group_columns = list(report.columns[2:])
+    counts = report.iloc[:, 2:].to_numpy()
+    n_rows = len(report)
+
+    # Answer rows plus the Total row, and the Total column when requested.
+    # Column-major like the DataFrame blocks, so the sums add up in the
+    # same order as pandas' and give the same floats.
+    absolute = np.empty(
+        (n_rows + 1, len(group_columns) + total_column),
+        dtype=counts.dtype,
+        order="F",
+    )
+    absolute[:n_rows, : len(group_columns)] = counts
+    absolute[n_rows, : len(group_columns)] = counts.sum(axis=0)
+    if total_column:
+        absolute[:, -1] = absolute[:, :-1].sum(axis=1)
+        group_columns.append("Total")
+
+    totals = absolute[n_rows]
+    ids = report[id_column].tolist() + ["Total"]
+    labels = report[label_column].tolist() + ["Total"]
+
+    relative = {id_column: ids, label_column: labels}
+    for j, column in enumerate(group_columns):
+        if totals[j] == 0:
+            relative[column] = np.zeros(n_rows + 1, dtype=np.int64)
+        else:
+            relative[column] = absolute[:, j] / totals[j]
+
+    columns = {id_column: ids, label_column: labels}
+    if weighted_average:
+        values = pd.to_numeric(report["Respuesta"], errors="coerce")
+        values = values.to_numpy(dtype=float, na_value=np.nan)
+        answered = ~np.isin(values, NON_RESPONSE_CODES)
+
+        # Only answered rows, column-major again so each column is summed
+        # like the Series add_weighted_average_row sums.
+        weights = absolute[:n_rows][answered]
+        weights = np.asfortranarray(
+            np.where(np.isin(weights, NON_RESPONSE_CODES), 0, weights)
+        )
+        products = values[answered][:, None] * weights
+        products = np.asfortranarray(np.where(np.isnan(products), 0, products))
+        numerators = products.sum(axis=0)
+        denominators = weights.sum(axis=0)
+
+        columns = {
+            id_column: ids + ["Promedio"],
+            label_column: labels + ["Promedio"],
+        }
+        for j, column in enumerate(group_columns):
+            # A column without valid weights averages to the integer 0 and
+            # keeps its dtype; otherwise it becomes float.
+            if denominators[j] == 0:
+                columns[column] = np.append(absolute[:, j], 0)
+            else:
+                columns[column] = np.append(
+                    absolute[:, j], numerators[j] / denominators[j]
+                )
+    else:
+        for j, column in enumerate(group_columns):
+            columns[column] = absolute[:, j]
 
-    df = df.copy()
-    df["Total"] = df.iloc[:, 2:].sum(axis=1)
-    return df
+    return pd.DataFrame(columns), pd.DataFrame(relative)
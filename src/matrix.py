@@ -0,0 +1,324 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.profiling import profile_stage, record_stage
+from src.queries.provisional import (
+    ANSWER_COLUMNS,
+    DISAGGREGATIONS_MAP,
+    GEOGRAPHY_STATE,
+    Disaggregation,
+)
+from src.repository import (
+    get_answer_domain,
+    pivot_disaggregation_report,
+    sum_by_code,
+    to_column,
+)
+
+
+def _get_respondents_query() -> str:
+    return """
+        SELECT
+            respondent_id,
+            is_initial_respondent = 1 AS is_initial,
+            factor_cvnl
+        FROM respondent_dim
+        ORDER BY respondent_id
+    """
+
+
+def _get_answers_query() -> str:
+    return f"""
+        SELECT
+            a.question_id,
+            a.respondent_id,
+            {ANSWER_COLUMNS["option_id"]} AS option_id,
+            {ANSWER_COLUMNS["value"]} AS value,
+            CAST(a.value AS NUMERIC) AS valor_numerico,
+            typeof(CAST(a.value AS NUMERIC)) = 'integer' AS es_entero
+        FROM answers a
+        ORDER BY a.question_id
+    """
+
+
+def _read_objects(conn, sql: str, params: dict | None = None) -> pd.DataFrame:
+    """
+    The rows of a query as object columns holding the values SQLite
+    returned, so that the columns built from a subset of them infer the
+    dtype read_sql_query would give that subset.
+    """
+    cursor = conn.execute(sql, params or {})
+    columns = [description[0] for description in cursor.description]
+    return pd.DataFrame(cursor.fetchall(), columns=columns, dtype=object)
+
+
+def _factorize(df: pd.DataFrame, columns: list[str]) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    The code of each row's values in columns and the distinct values, with
+    NULLs as one more value, as GROUP BY treats them.
+    """
+    if df.empty:
+        return np.array([], dtype=np.int64), df[columns]
+    codes = df.groupby(columns, dropna=False, sort=False).ngroup().to_numpy()
+    _, first_rows = np.unique(codes, return_index=True)
+    return codes, df[columns].iloc[first_rows].reset_index(drop=True)
+
+
+class _DisaggregationRows:
+    """
+    The rows of a disaggregation's get_respondent_query, sorted by
+    respondent, with their group and answer values factorized once.
+    """
+
+    def __init__(self, df: pd.DataFrame, respondent_index: np.ndarray):
+        order = np.argsort(respondent_index, kind="stable")
+        self.respondents = respondent_index[order]
+        self.df = df.iloc[order].reset_index(drop=True)
+        self._codes: dict[tuple[str, ...], tuple[np.ndarray, pd.DataFrame]] = {}
+
+    def get_codes(self, columns: list[str]) -> tuple[np.ndarray, pd.DataFrame]:
+        key = tuple(columns)
+        if key not in self._codes:
+            self._codes[key] = _factorize(self.df, columns)
+        return self._codes[key]
+
+    def join(self, respondents: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Positions of the (answer, row) pairs of an inner join of the answers
+        of respondents with these rows, in answer order.
+        """
+        starts = np.searchsorted(self.respondents, respondents, side="left")
+        counts = np.searchsorted(self.respondents, respondents, side="right") - starts
+
+        answers = np.repeat(np.arange(len(respondents)), counts)
+        offsets = np.arange(len(answers)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return answers, np.repeat(starts, counts) + offsets
+
+
+class RespondentMatrix:
+    """
+    Columnar copy of the answers and of respondent_dim.
+
+    The answers are scanned once when the matrix is loaded, and the
+    respondents of each disaggregation are read once, on its first table,
+    with the filters and groups of its DISAGGREGATIONS_MAP spec compiled to
+    SQL (Disaggregation.get_respondent_query), so they follow the same rules
+    as the queries. Every table is then the join of a question's answers
+    with those respondents, summed with NumPy into the rows its query
+    returns, and labeled and pivoted as build_disaggregation_report does.
+    """
+
+    def __init__(self, conn, respondents: pd.DataFrame, answers: pd.DataFrame):
+        self.conn = conn
+        self.respondent_ids = pd.Index(respondents["respondent_id"])
+        self.is_initial = respondents["is_initial"].to_numpy() == 1
+        self.factor = pd.to_numeric(respondents["factor_cvnl"]).to_numpy(dtype=float)
+
+        # As the JOIN with respondent_dim, answers of unknown respondents drop.
+        answer_respondents = self.respondent_ids.get_indexer(answers["respondent_id"])
+        answers = answers.loc[answer_respondents >= 0].reset_index(drop=True)
+        self.answer_respondents = answer_respondents[answer_respondents >= 0]
+        self.answer_numeric = pd.to_numeric(
+            answers["valor_numerico"], errors="coerce"
+        ).to_numpy(dtype=float)
+        self.answer_is_integer = answers["es_entero"].fillna(0).to_numpy(dtype=bool)
+        self.answer_codes, self.answers = _factorize(answers, ["option_id", "value"])
+
+        question_ids = answers["question_id"].to_numpy(dtype=object)
+        starts = np.flatnonzero(
+            np.r_[True, question_ids[1:] != question_ids[:-1]]
+        ) if len(question_ids) else np.array([], dtype=int)
+        ends = np.r_[starts[1:], len(question_ids)]
+        self.questions = {
+            question_ids[start]: slice(start, end) for start, end in zip(starts, ends)
+        }
+
+        self._rows: dict[str, _DisaggregationRows] = {}
+
+    @classmethod
+    def from_connection(cls, conn) -> "RespondentMatrix":
+        respondents = pd.read_sql_query(_get_respondents_query(), conn)
+        answers = pd.read_sql_query(_get_answers_query(), conn)
+        return cls(conn, respondents, answers)
+
+    def _get_rows(self, disaggregation: str, spec: Disaggregation) -> _DisaggregationRows:
+        if disaggregation not in self._rows:
+            start = time.perf_counter()
+            sql, params = spec.get_respondent_query()
+            df = _read_objects(self.conn, sql, params)
+            record_stage(
+                "sql",
+                time.perf_counter() - start,
+                len(df),
+                disaggregation=disaggregation,
+            )
+            self._rows[disaggregation] = _DisaggregationRows(
+                df, self.respondent_ids.get_indexer(df["respondent_id"])
+            )
+        return self._rows[disaggregation]
+
+    def build_disaggregation_report(
+        self,
+        question_id: str,
+        disaggregation: str,
+        initial_only: bool = True,
+    ) -> pd.DataFrame:
+        spec = DISAGGREGATIONS_MAP.get(disaggregation)
+        if spec is None:
+            raise ValueError(f"Disaggregation '{disaggregation}' is not supported.")
+
+        rows = self._get_rows(disaggregation, spec)
+        with profile_stage(
+            "matrix", question_id=question_id, disaggregation=disaggregation
+        ):
+            df_long = self._get_long(question_id, spec, rows, initial_only)
+            df_long = get_answer_domain(self.conn).label_answers(df_long, question_id)
+            return pivot_disaggregation_report(df_long, disaggregation)
+
+    def _get_layers(
+        self, spec: Disaggregation, rows: _DisaggregationRows, initial_only: bool
+    ) -> list[tuple[np.ndarray | None, np.ndarray, pd.DataFrame]]:
+        """
+        (rows kept or None for all, grupo code of each row, grupo columns of
+        each code) of each part of the query's result.
+        """
+        if spec.geography:
+            # As _get_geography_rollup_query: the AMM municipalities, then the
+            # regions, then the state.
+            municipio_codes, municipios = rows.get_codes(["municipio"])
+            region_codes, regions = rows.get_codes(["region"])
+            return [
+                (
+                    rows.df["municipio"].notna().to_numpy(),
+                    municipio_codes,
+                    municipios.rename(columns={"municipio": "grupo"}),
+                ),
+                (None, region_codes, regions.rename(columns={"region": "grupo"})),
+                (
+                    None,
+                    np.zeros(len(rows.df), dtype=np.int64),
+                    pd.DataFrame({"grupo": [GEOGRAPHY_STATE]}, dtype=object),
+                ),
+            ]
+
+        if "grupo_question_id" in rows.df.columns:
+            columns = ["grupo_question_id", "grupo_option_id"]
+        elif not initial_only and "grupo_sin_factor" in rows.df.columns:
+            columns = ["grupo_sin_factor"]
+        else:
+            columns = ["grupo"]
+        codes, groups = rows.get_codes(columns)
+        return [(None, codes, groups.rename(columns={"grupo_sin_factor": "grupo"}))]
+
+    def _get_long(
+        self,
+        question_id: str,
+        spec: Disaggregation,
+        rows: _DisaggregationRows,
+        initial_only: bool,
+    ) -> pd.DataFrame:
+        """The rows the spec's query returns for the question."""
+        question = self.questions.get(question_id, slice(0, 0))
+        answer_positions, row_positions = rows.join(self.answer_respondents[question])
+        respondents = rows.respondents[row_positions]
+
+        if initial_only:
+            keep = self.is_initial[respondents]
+            answer_positions, row_positions = answer_positions[keep], row_positions[keep]
+            weights = self.factor[respondents[keep]]
+        else:
+            weights = np.ones(len(row_positions), dtype=np.int64)
+
+        if spec.answer is not None:
+            answer_codes, answers = rows.get_codes(["id_respuesta", "Respuesta"])
+            answer_codes = answer_codes[row_positions]
+        else:
+            answer_codes = self.answer_codes[question][answer_positions]
+            answers = self.answers
+        numeric = self.answer_numeric[question][answer_positions]
+        is_integer = self.answer_is_integer[question][answer_positions]
+
+        parts = []
+        for mask, group_codes, groups in self._get_layers(spec, rows, initial_only):
+            group_codes = group_codes[row_positions]
+            layer = slice(None) if mask is None else mask[row_positions]
+            cells = answer_codes[layer] * len(groups) + group_codes[layer]
+            if not len(cells):
+                continue
+
+            present, cell_codes = np.unique(cells, return_inverse=True)
+            if spec.mean:
+                values, integer = self._get_means(
+                    numeric[layer], is_integer[layer], weights[layer], cell_codes,
+                    len(present), initial_only,
+                )
+            else:
+                values, integer = self._get_sums(
+                    weights[layer], cell_codes, len(present), initial_only
+                )
+
+            df_part = pd.concat(
+                [
+                    answers.take(present // len(groups)).reset_index(drop=True),
+                    groups.take(present % len(groups)).reset_index(drop=True),
+                ],
+                axis=1,
+            )
+            df_part["valor"] = values
+            parts.append((df_part, integer))
+
+        if not parts:
+            # Same columns and dtypes as a query that returned no rows.
+            groups = self._get_layers(spec, rows, initial_only)[0][2]
+            columns = list(answers.columns) + list(groups.columns) + ["valor"]
+            return pd.DataFrame(columns=columns, dtype=object)
+
+        df_long = pd.concat([df_part for df_part, _ in parts], ignore_index=True)
+        # read_sql_query infers each column from the values it returns.
+        for column in df_long.columns[:-1]:
+            df_long[column] = to_column(df_long[column].tolist())
+        if all(integer for _, integer in parts):
+            df_long["valor"] = df_long["valor"].astype(np.int64)
+        return df_long
+
+    @staticmethod
+    def _get_sums(
+        weights: np.ndarray, codes: np.ndarray, n_cells: int, initial_only: bool
+    ) -> tuple[np.ndarray, bool]:
+        """SUM(factor_cvnl) or SUM(1) per cell, and whether every sum is an integer."""
+        if not initial_only:
+            return np.bincount(codes, minlength=n_cells), True
+        return sum_by_code(weights, codes, np.arange(n_cells), n_cells), False
+
+    @staticmethod
+    def _get_means(
+        numeric: np.ndarray,
+        is_integer: np.ndarray,
+        weights: np.ndarray,
+        codes: np.ndarray,
+        n_cells: int,
+        initial_only: bool,
+    ) -> tuple[np.ndarray, bool]:
+        """
+        SUM(value * weight) / SUM(weight) per cell as SQLite computes it:
+        NULL when no value or no weight is summed, and integer division
+        when both sums are integers, which only happens counting with
+        weight 1. Also whether every mean is an integer.
+        """
+        present = np.arange(n_cells)
+        numerators = sum_by_code(numeric * weights, codes, present, n_cells)
+        denominators = sum_by_code(weights, codes, present, n_cells)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.where(denominators != 0, numerators / denominators, np.nan)
+
+        if initial_only:
+            return means, False
+
+        has_real = np.bincount(
+            codes, weights=~is_integer & ~np.isnan(numeric), minlength=n_cells
+        )
+        integer = (has_real == 0) & ~np.isnan(means)
+        means = np.where(integer, np.trunc(means), means)
+        return means, bool(integer.all())
@@ -0,0 +1,153 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.paths import OUTPUT_DIR
+from src.profiling import profile_stage
+
+PARQUET_DIR = OUTPUT_DIR / "tabulados_parquet"
+PARQUET_FILENAME = "tablas.parquet"
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError(
+            "The Parquet export needs pyarrow: "
+            "pip install 'survey-reporting-tool[parquet]'"
+        ) from error
+    return pyarrow
+
+
+def get_table_schema():
+    """
+    Columns of every Parquet file: one row per cell of a table. valor never
+    holds nulls (missing values are NaN), so it reads into NumPy without
+    copying.
+    """
+    pa = _import_pyarrow()
+    return pa.schema(
+        [
+            ("ponderado", pa.bool_()),
+            ("relativa", pa.bool_()),
+            ("fila", pa.int32()),
+            ("id_respuesta", pa.string()),
+            ("respuesta", pa.string()),
+            ("columna", pa.string()),
+            ("valor", pa.float64()),
+        ]
+    )
+
+
+def _format_answer_id(value) -> str | None:
+    """
+    Whole-number ids as integers, whatever the dtype of their column: a
+    float column (ids next to a NaN) or object column (next to 'Total')
+    would otherwise write 1 as '1.0'. Missing ids are written as null.
+    """
+    if pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _get_table_columns(df: pd.DataFrame, weighted: bool, relative: bool) -> dict:
+    """A table in long format: its id and answer columns repeated per cell."""
+    values = df.iloc[:, 2:].to_numpy(dtype=np.float64)
+    n_rows, n_cols = values.shape
+    size = n_rows * n_cols
+
+    # An object array, so missing ids stay None rather than becoming NaN.
+    answer_ids = np.array(
+        [_format_answer_id(value) for value in df.iloc[:, 0]], dtype=object
+    )
+
+    return {
+        "ponderado": np.full(size, weighted),
+        "relativa": np.full(size, relative),
+        "fila": np.repeat(np.arange(n_rows, dtype=np.int32), n_cols),
+        "id_respuesta": np.repeat(answer_ids, n_cols),
+        "respuesta": np.repeat(df.iloc[:, 1].astype(str).to_numpy(), n_cols),
+        "columna": np.tile(df.columns[2:].astype(str).to_numpy(), n_rows),
+        "valor": values.ravel(),
+    }
+
+
+class ParquetExport:
+    """
+    Every table of the reports, absolute and relative, weighted and
+    _sin_factor, in a Parquet dataset partitioned Hive-style by section,
+    question and disaggregation:
+
+        tabulados_parquet/seccion=salud/pregunta=cp1/desagregacion=sexo/tablas.parquet
+
+    Each question is written as soon as its tables are built, one file per
+    disaggregation, so only one question is held in memory. Read it with
+    pyarrow.dataset.dataset(path, partitioning="hive") or pd.read_parquet.
+    """
+
+    def __init__(self, output_dir: Path = PARQUET_DIR):
+        self.pa = _import_pyarrow()
+        self.schema = get_table_schema()
+        self.output_dir = output_dir
+        self.files = 0
+        self.rows = 0
+
+    def clear(self, section: str | None = None) -> None:
+        """Removes the files of section, or the whole dataset."""
+        path = self.output_dir
+        if section is not None:
+            path = path / f"seccion={section}"
+        if path.exists():
+            shutil.rmtree(path)
+
+    def _write_file(self, path: Path, tables: list[dict]) -> None:
+        columns = {
+            name: np.concatenate([table[name] for table in tables])
+            for name in self.schema.names
+        }
+        table = self.pa.Table.from_pydict(columns, schema=self.schema)
+        path.mkdir(parents=True, exist_ok=True)
+        self.pa.parquet.write_table(table, path / PARQUET_FILENAME)
+        self.files += 1
+        self.rows += table.num_rows
+
+    def write_question(
+        self,
+        section: str,
+        question: pd.Series,
+        question_tables: tuple,
+        sin_factor_tables: tuple | None,
+    ) -> None:
+        table_sets = [(True, question_tables)]
+        if sin_factor_tables is not None:
+            table_sets.append((False, sin_factor_tables))
+
+        disaggregations: dict[str, list[dict]] = {}
+        for weighted, (_, _, tables) in table_sets:
+            for disaggregation, _, df, relative_df in tables:
+                disaggregations.setdefault(disaggregation, []).extend(
+                    [
+                        _get_table_columns(df, weighted, False),
+                        _get_table_columns(relative_df, weighted, True),
+                    ]
+                )
+
+        question_id = question["id"]
+        question_dir = (
+            self.output_dir / f"seccion={section}" / f"pregunta={question_id}"
+        )
+        with profile_stage("parquet_write", question_id=question_id):
+            for disaggregation, tables in disaggregations.items():
+                path = question_dir / f"desagregacion={disaggregation}"
+                self._write_file(path, tables)
+
+    def get_summary(self) -> str:
+        return (
+            f"Parquet: {self.files} archivos, {self.rows:,} filas en {self.output_dir}"
+        )
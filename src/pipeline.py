@@ -0,0 +1,192 @@
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from src.builder import _build_table_sets, _get_question_report_sets
+from src.pool import ConnectionPool
+
+DEFAULT_THREADS = 4
+DEFAULT_QUEUE_SIZE = 8
+
+_DONE = object()
+
+
+class PipelineStats:
+    """
+    Seconds spent in each stage of a ReportPipeline, over all its runs, and
+    the depth of the writer queue each time a question was queued.
+    query_seconds adds up the time of every query thread, so it can exceed
+    wall_seconds.
+    """
+
+    def __init__(self):
+        self.wall_seconds = 0.0
+        self.query_seconds = 0.0
+        self.table_seconds = 0.0
+        self.write_seconds = 0.0
+        # The writer waiting for tables, and the tables waiting for the writer.
+        self.writer_wait_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self.queue_depths: list[int] = []
+        self._lock = threading.Lock()
+
+    def add_query_seconds(self, seconds: float) -> None:
+        with self._lock:
+            self.query_seconds += seconds
+
+    def get_summary(self, threads: int) -> str:
+        depths = self.queue_depths or [0]
+        return "\n".join(
+            [
+                f"Canalización: {self.wall_seconds:.1f} s en total",
+                f"  consultas: {self.query_seconds:.1f} s (suma de {threads} hilos)",
+                f"  tablas: {self.table_seconds:.1f} s",
+                f"  escritura: {self.write_seconds:.1f} s",
+                f"  escritor esperando tablas: {self.writer_wait_seconds:.1f} s",
+                f"  tablas esperando al escritor: {self.queue_wait_seconds:.1f} s",
+                f"  cola: máximo {max(depths)}, promedio {sum(depths) / len(depths):.1f}",
+            ]
+        )
+
+
+class ReportPipeline:
+    """
+    Overlaps the stages of a report instead of alternating them question by
+    question: a pool of threads runs the disaggregation queries of the
+    upcoming questions, each on a connection borrowed from a ConnectionPool
+    (sqlite3 releases the GIL while SQLite works); the calling thread turns
+    the reports into tables in question order; and a single writer thread
+    appends them to the workbooks from a bounded queue.
+
+    The queries go through build_disaggregation_report, one per table, since
+    the other engines are not safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        threads: int = DEFAULT_THREADS,
+        combined_sin_factor: bool = False,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        db_path: Path | None = None,
+    ):
+        self.threads = threads
+        self.combined_sin_factor = combined_sin_factor
+        self.queue_size = queue_size
+        self.stats = PipelineStats()
+        self.pool = ConnectionPool(threads, db_path)
+        self._queue: queue.Queue | None = None
+
+    def _get_report_sets(self, question: pd.Series) -> tuple:
+        start = time.perf_counter()
+        with self.pool.connection() as conn:
+            report_sets = _get_question_report_sets(
+                conn, question, combined_sin_factor=self.combined_sin_factor
+            )
+        self.stats.add_query_seconds(time.perf_counter() - start)
+        return report_sets
+
+    def build_table_sets(
+        self,
+        questions: Iterable[tuple[str, pd.Series]],
+    ) -> Iterator[tuple[str, pd.Series, tuple, tuple | None]]:
+        """
+        Same items as builder._build_table_sets_in_order, with the queries of
+        the next questions already running while one is being built.
+        """
+        executor = ThreadPoolExecutor(self.threads, thread_name_prefix="report-query")
+        pending = deque()
+
+        def build_next() -> tuple[str, pd.Series, tuple, tuple | None]:
+            section, question, future = pending.popleft()
+            report_sets = future.result()
+
+            start = time.perf_counter()
+            question_tables, sin_factor_tables = _build_table_sets(question, report_sets)
+            self.stats.table_seconds += time.perf_counter() - start
+            return section, question, question_tables, sin_factor_tables
+
+        try:
+            for section, question in questions:
+                future = executor.submit(self._get_report_sets, question)
+                pending.append((section, question, future))
+                # Keep every thread busy while the oldest question is built.
+                if len(pending) > 2 * self.threads:
+                    yield build_next()
+
+            while pending:
+                yield build_next()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def _iter_queue(self) -> Iterator:
+        while True:
+            start = time.perf_counter()
+            item = self._queue.get()
+            self.stats.writer_wait_seconds += time.perf_counter() - start
+            if item is _DONE:
+                return
+            yield item
+
+    def _put(self, item, writer: threading.Thread) -> bool:
+        start = time.perf_counter()
+        try:
+            while writer.is_alive():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.stats.queue_wait_seconds += time.perf_counter() - start
+
+    def run(self, items: Iterable, write: Callable[[Iterable], None]) -> None:
+        """
+        Calls write with an iterable of items in the writer thread while the
+        calling thread produces them, and re-raises whatever write raised.
+        """
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        errors = []
+
+        def consume() -> None:
+            wait_before = self.stats.writer_wait_seconds
+            start = time.perf_counter()
+            try:
+                write(self._iter_queue())
+            except BaseException as error:
+                errors.append(error)
+            finally:
+                elapsed = time.perf_counter() - start
+                waited = self.stats.writer_wait_seconds - wait_before
+                self.stats.write_seconds += elapsed - waited
+
+        writer = threading.Thread(target=consume, name="report-writer")
+        start = time.perf_counter()
+        writer.start()
+        try:
+            for item in items:
+                self.stats.queue_depths.append(self._queue.qsize())
+                if not self._put(item, writer):
+                    break
+        finally:
+            self._put(_DONE, writer)
+            writer.join()
+            self.stats.wall_seconds += time.perf_counter() - start
+            self._queue = None
+
+        if errors:
+            raise errors[0]
+
+    def get_summary(self) -> str:
+        return "\n".join(
+            [self.stats.get_summary(self.threads), self.pool.get_summary()]
+        )
+
+    def close(self) -> None:
+        self.pool.close()
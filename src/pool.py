@@ -0,0 +1,130 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.database import connect_read_only
+
+DEFAULT_POOL_SIZE = 4
+
+
+class PoolStats:
+    """
+    How long threads waited for a connection of a ConnectionPool and how
+    long they held one. utilization is the share of the pool's
+    connection-seconds, since it was created, that were in use.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.start = time.perf_counter()
+        self.acquisitions = 0
+        self.connections_opened = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.in_use = 0
+        self.max_in_use = 0
+        self._lock = threading.Lock()
+
+    def record_acquire(self, waited: float) -> None:
+        with self._lock:
+            self.acquisitions += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def record_release(self, held: float) -> None:
+        with self._lock:
+            self.in_use -= 1
+            self.busy_seconds += held
+
+    @property
+    def utilization(self) -> float:
+        elapsed = time.perf_counter() - self.start
+        return self.busy_seconds / (self.size * elapsed) if elapsed > 0 else 0.0
+
+    def get_summary(self) -> str:
+        average_wait = self.wait_seconds / self.acquisitions if self.acquisitions else 0
+        return "\n".join(
+            [
+                f"Conexiones: {self.connections_opened} abiertas de {self.size}, "
+                f"máximo {self.max_in_use} en uso, utilización {self.utilization:.0%}",
+                f"  esperas: {self.wait_seconds:.2f} s en {self.acquisitions} préstamos "
+                f"(promedio {average_wait * 1000:.2f} ms, máximo "
+                f"{self.max_wait_seconds * 1000:.1f} ms)",
+            ]
+        )
+
+
+class ConnectionPool:
+    """
+    Up to size read-only connections to survey.db (see connect_read_only),
+    opened as they are first needed and lent to one thread at a time:
+
+        with pool.connection() as conn:
+            ...
+
+    A thread asking for a connection while all of them are lent waits for
+    the next one returned. close() closes every connection it opened, so
+    all of them must have been returned by then.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, db_path: Path | None = None):
+        self.size = size
+        self.db_path = db_path
+        self.stats = PoolStats(size)
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The connection pool is closed.")
+            if len(self._connections) < self.size:
+                # Lent to whichever thread asks next, hence check_same_thread.
+                conn = connect_read_only(self.db_path, check_same_thread=False)
+                self._connections.append(conn)
+                self.stats.connections_opened += 1
+                return conn
+
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        start = time.perf_counter()
+        conn = self._acquire()
+        acquired = time.perf_counter()
+        self.stats.record_acquire(acquired - start)
+        try:
+            yield conn
+        finally:
+            self.stats.record_release(time.perf_counter() - acquired)
+            self._idle.put(conn)
+
+    def get_summary(self) -> str:
+        return self.stats.get_summary()
+
+    def close(self) -> None:
+        with self._lock:
+            lent = len(self._connections) - self._idle.qsize()
+            if lent:
+                raise RuntimeError(
+                    f"{lent} connections of the pool are still lent out."
+                )
+            self._closed = True
+            while not self._idle.empty():
+                self._idle.get_nowait()
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import pandas as pd
+
+from src.paths import OUTPUT_DIR
+
+PROFILE_JSON_FILENAME = "profile.json"
+PROFILE_CSV_FILENAME = "profile.csv"
+DEFAULT_TOP = 20
+
+KEYS = ["section", "question_id", "disaggregation"]
+
+
+class Profiler:
+    """
+    Timings recorded by the instrumented stages while --profile is on. Each
+    record is tagged with the section, question and disaggregation it was
+    measured for: given explicitly, or taken from the innermost context()
+    of the thread that recorded it.
+    """
+
+    def __init__(self):
+        self.records: list[dict] = []
+        self.start = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _get_context(self) -> dict:
+        return getattr(self._local, "context", {})
+
+    @contextmanager
+    def context(self, **keys):
+        previous = self._get_context()
+        self._local.context = {**previous, **keys}
+        try:
+            yield
+        finally:
+            self._local.context = previous
+
+    def record(self, stage: str, seconds: float, rows: int | None = None, **keys):
+        record = {key: None for key in KEYS}
+        record.update(self._get_context())
+        record.update(keys)
+        record.update(stage=stage, seconds=seconds, rows=rows)
+        with self._lock:
+            self.records.append(record)
+
+    @contextmanager
+    def time(self, stage: str, **keys):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, **keys)
+
+    def get_records(self, sections: dict[str, str] | None = None) -> pd.DataFrame:
+        """Records as a DataFrame, filling the section from question_id."""
+        df = pd.DataFrame(self.records, columns=KEYS + ["stage", "seconds", "rows"])
+        if sections:
+            df["section"] = df["section"].fillna(df["question_id"].map(sections))
+        return df
+
+
+_profiler: Profiler | None = None
+
+
+def enable_profiling() -> Profiler:
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def get_profiler() -> Profiler | None:
+    return _profiler
+
+
+def profile_stage(stage: str, **keys):
+    """Times the block as stage when profiling is on; otherwise does nothing."""
+    if _profiler is None:
+        return nullcontext()
+    return _profiler.time(stage, **keys)
+
+
+def profile_context(**keys):
+    if _profiler is None:
+        return nullcontext()
+    return _profiler.context(**keys)
+
+
+def record_stage(stage: str, seconds: float, rows: int | None = None, **keys):
+    if _profiler is not None:
+        _profiler.record(stage, seconds, rows, **keys)
+
+
+def _sum_rows(rows: pd.Series):
+    # Only the sql stage counts rows.
+    return rows.sum(min_count=1)
+
+
+def _aggregate(df: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    aggregated = df.groupby(keys, dropna=False).agg(
+        seconds=("seconds", "sum"),
+        calls=("seconds", "size"),
+        rows=("rows", _sum_rows),
+    )
+    aggregated["rows"] = aggregated["rows"].astype("Int64")
+    return aggregated
+
+
+def _to_json(df: pd.DataFrame, orient: str):
+    df = df.round(6).astype(object)
+    return df.where(df.notna(), None).to_dict(orient=orient)
+
+
+def _get_stage_totals(df: pd.DataFrame, key: str) -> dict:
+    totals = df.dropna(subset=[key]).pivot_table(
+        index=key, columns="stage", values="seconds", aggfunc="sum", fill_value=0
+    )
+    totals["total"] = totals.sum(axis=1)
+    return _to_json(totals.sort_values("total", ascending=False), "index")
+
+
+def get_slowest(df: pd.DataFrame, top: int = DEFAULT_TOP) -> pd.DataFrame:
+    """The top (question, disaggregation) pairs by time, one column per stage."""
+    df = df.dropna(subset=["question_id", "disaggregation"])
+    keys = ["section", "question_id", "disaggregation"]
+    slowest = df.pivot_table(
+        index=keys,
+        columns="stage",
+        values="seconds",
+        aggfunc="sum",
+        fill_value=0,
+        dropna=False,
+    )
+    slowest = slowest.loc[slowest.sum(axis=1) > 0]
+    slowest["total"] = slowest.sum(axis=1)
+    slowest["rows"] = (
+        df.groupby(keys, dropna=False)["rows"].agg(_sum_rows).astype("Int64")
+    )
+    return slowest.sort_values("total", ascending=False).head(top).reset_index()
+
+
+def write_profile_report(
+    df: pd.DataFrame,
+    wall_seconds: float,
+    top: int = DEFAULT_TOP,
+    output_dir: Path = OUTPUT_DIR,
+) -> tuple[Path, Path]:
+    """
+    Writes profile.json (totals per stage, per disaggregation and per
+    section, plus the slowest tables) and profile.csv (seconds and rows per
+    section, question, disaggregation and stage).
+    """
+    report = {
+        "wall_seconds": round(wall_seconds, 6),
+        "stages": _to_json(_aggregate(df, ["stage"]), "index"),
+        "by_disaggregation": _get_stage_totals(df, "disaggregation"),
+        "by_section": _get_stage_totals(df, "section"),
+        "slowest": _to_json(get_slowest(df, top), "records"),
+    }
+
+    json_path = output_dir / PROFILE_JSON_FILENAME
+    with open(json_path, "w") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False, default=str)
+
+    csv_path = output_dir / PROFILE_CSV_FILENAME
+    _aggregate(df, KEYS + ["stage"]).reset_index().to_csv(csv_path, index=False)
+
+    return json_path, csv_path
@@ -1,1332 +1,629 @@
-from src.metadata import (
-    AMM_ID,
-    ID_TO_CITY_NAME,
-    PERIFERIA_ID,
-    AGE_BINS,
-    AGE_LABELS,
-)
+from src.metadata import AGE_LABELS
+from src.queries.respondent_dim import RESPONDENT_DIM_ATTRIBUTES
 
 
-def _get_weight_clause(initial_only: bool) -> str:
-    return "r.factor_cvnl" if initial_only else "1"
-
-
-def _get_initial_filter(initial_only: bool) -> str:
-    return "AND r.is_initial_respondent = 1" if initial_only else ""
-
-
-def get_trabajo_remunerado_query(initial_only: bool = True) -> str:
-    """Get paid work data (tipo_trabajo values 1, 4, 6) for male respondents."""
-
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            oa.option_label    AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id
-
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'tipo_trabajo'
-
-        LEFT JOIN options oa
-        ON ra.question_id = oa.question_id
-        AND ra.value       = oa.option_id
-        AND ra.value IN (1, 4, 6)
+# initial_only=True weights by factor_cvnl and keeps the initial respondents,
+# initial_only=False counts every respondent, and initial_only=None computes
+# both in the same scan: `valor` is the weighted sum over the initial
+# respondents, `valor_sin_factor` the unweighted count and `n_iniciales` the
+# number of initial respondents in the group.
+#
+# Answers are returned as the raw option_id and the value as text (which, like
+# the labels, tells 1 from 1.0); AnswerDomain.label_answers turns them into
+# id_respuesta and Respuesta with the options loaded once, instead of every
+# query joining options.
+#
+# Each disaggregation is a Disaggregation spec in DISAGGREGATIONS_MAP, and
+# get_disaggregation_query compiles it into its SQL and parameters.
 
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
-
-        WHERE a.question_id = :question_id
-        {initial_filter}
-
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
-    """
-
-    return query
+ANSWER_COLUMNS = {"option_id": "a.option_id", "value": "CAST(a.value AS TEXT)"}
 
+# Group of the entire-state row of the geography disaggregations.
+GEOGRAPHY_STATE = "Nuevo León"
 
-def get_trabajo_remunerado_by_sex_query(
-    sex_id: int = 0, initial_only: bool = True
-) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            oa.option_label    AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id
-
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'tipo_trabajo'
-
-        LEFT JOIN options oa
-        ON ra.question_id = oa.question_id
-        AND ra.value       = oa.option_id
-        AND ra.value IN (1, 4, 6)
-
-        LEFT JOIN respondent_attributes rs
-        ON a.respondent_id = rs.respondent_id
-        AND rs.attribute    = 'sexo'
-
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
-
-        WHERE a.question_id = :question_id
-        AND rs.value = {sex_id}
-        {initial_filter}
-
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
-    """
-    return query
-
-
-def get_tipo_trabajo_query(initial_only: bool = True) -> str:
-    """Categorize respondents by trabajo remunerado (1,4,6) vs trabajo no remunerado (5)."""
-
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            CASE
-                WHEN ra.value IN (1, 4, 6) THEN 'Trabajo remunerado'
-                WHEN ra.value = 5 THEN 'Trabajo no remunerado'
-                ELSE 'Otro'
-            END AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id
-
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'tipo_trabajo'
-
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
-
-        WHERE a.question_id = :question_id
-        {initial_filter}
-
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            grupo
-    """
-    return query
 
+def _get_weight_clause(initial_only: bool | None) -> str:
+    return "r.factor_cvnl" if initial_only else "1"
 
-def get_tipo_trabajo_by_sex_query(sex_id: int = 0, initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            CASE
-                WHEN ra.value IN (1, 4, 6) THEN 'Trabajo remunerado'
-                WHEN ra.value = 5 THEN 'Trabajo no remunerado'
-                ELSE 'Otro'
-            END AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'tipo_trabajo'
-        LEFT JOIN respondent_attributes rs
-        ON a.respondent_id = rs.respondent_id
-        AND rs.attribute    = 'sexo'
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
-        WHERE a.question_id = :question_id
-        AND rs.value = {sex_id}
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            grupo
-    """
-
-    return query
-
-
-def get_afiliacion_servicio_salud_query(initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            oa.option_label    AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id
-
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'afiliacion_servicio_salud'
-
-        LEFT JOIN options oa
-        ON ra.question_id = oa.question_id
-        AND ra.value       = oa.option_id
-
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
 
-        WHERE a.question_id = :question_id
-        {initial_filter}
+def _get_initial_filter(initial_only: bool | None) -> str:
+    return "AND r.is_initial_respondent = 1" if initial_only else ""
 
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
-    """
-    return query
 
+def _get_value_columns(initial_only: bool | None) -> str:
+    if initial_only is None:
+        return """SUM(CASE WHEN r.is_initial_respondent = 1 THEN r.factor_cvnl END) AS valor,
+            COUNT(*) AS valor_sin_factor,
+            COUNT(CASE WHEN r.is_initial_respondent = 1 THEN 1 END) AS n_iniciales"""
 
-def get_nivel_max_estudios_query(initial_only: bool = True) -> str:
     weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            oa.option_label    AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id 
-
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'nivel_max_estudios'
-
-        LEFT JOIN options oa
-        ON ra.question_id = oa.question_id
-        AND ra.value       = oa.option_id
+    return f"SUM({weight}) AS valor"
 
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
 
-        WHERE a.question_id = :question_id
-        {initial_filter}
-
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
+def _get_partial_value_columns(initial_only: bool | None, mean: bool) -> str:
     """
-    return query
-
-
-def get_servicio_salud_donde_se_atendio_query(initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            oa.option_label    AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id
-
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'servicio_salud_donde_se_atendio'
-
-        LEFT JOIN options oa
-        ON ra.question_id = oa.question_id
-        AND ra.value       = oa.option_id
-
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
-
-        WHERE a.question_id = :question_id
-        {initial_filter}
-
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
+    Per-group sums that `_get_rollup_value_columns` adds up again, so any
+    coarser level can be derived without rescanning the answers.
     """
-    return query
+    if not mean:
+        return _get_value_columns(initial_only)
 
+    if initial_only is None:
+        return """SUM(CASE WHEN r.is_initial_respondent = 1 THEN CAST(a.value AS NUMERIC) * r.factor_cvnl END) AS numerador,
+            SUM(CASE WHEN r.is_initial_respondent = 1 THEN r.factor_cvnl END) AS denominador,
+            SUM(CAST(a.value AS NUMERIC) * 1) AS numerador_sin_factor,
+            SUM(1) AS denominador_sin_factor,
+            COUNT(CASE WHEN r.is_initial_respondent = 1 THEN 1 END) AS n_iniciales"""
 
-def get_tipo_servicio_salud_donde_se_atendio_query(initial_only: bool = True) -> str:
     weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
+    return f"""SUM(CAST(a.value AS NUMERIC) * {weight}) AS numerador,
+            SUM({weight}) AS denominador"""
 
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            CASE
-                WHEN ra.value IN (2, 3, 7, 8, 9, 10, 12, 13) THEN 'Servicios Privados'
-                WHEN ra.value IN (1, 4, 5, 6, 11) THEN 'Servicios Publicos'
-            END AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id
 
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'servicio_salud_donde_se_atendio'
+def _get_rollup_value_columns(initial_only: bool | None, mean: bool) -> str:
+    if mean:
+        columns = "SUM(b.numerador) / SUM(b.denominador) AS valor"
+        if initial_only is None:
+            columns += """,
+            SUM(b.numerador_sin_factor) / SUM(b.denominador_sin_factor) AS valor_sin_factor"""
+    else:
+        columns = "SUM(b.valor) AS valor"
+        if initial_only is None:
+            columns += """,
+            SUM(b.valor_sin_factor) AS valor_sin_factor"""
 
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
+    if initial_only is None:
+        columns += """,
+            SUM(b.n_iniciales) AS n_iniciales"""
+    return columns
 
-        WHERE a.question_id = :question_id
-        {initial_filter}
 
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            grupo
+def _get_question_filter(batched: bool) -> str:
     """
-    return query
-
-
-def get_tipo_escuela_query(initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            oa.option_label    AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id
-
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'tipo_escuela'
-
-        LEFT JOIN options oa
-        ON ra.question_id = oa.question_id
-        AND ra.value       = oa.option_id
-
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
-
-        WHERE a.question_id = :question_id
-        {initial_filter}
-
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
+    Batched queries cover every question in the JSON array bound to
+    :question_ids and return question_id as an extra group key.
     """
-    return query
+    if batched:
+        return "a.question_id IN (SELECT value FROM json_each(:question_ids))"
+    return "a.question_id = :question_id"
 
 
-def get_nivel_actual_estudios_query(initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
+def _get_question_column(batched: bool, alias: str = "a") -> str:
+    return f"{alias}.question_id AS question_id," if batched else ""
 
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            oa.option_label    AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id
-
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'nivel_actual_estudios'
-
-        LEFT JOIN options oa
-        ON ra.question_id = oa.question_id
-        AND ra.value       = oa.option_id
 
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
+def _get_question_group(batched: bool, alias: str = "a") -> str:
+    return f"{alias}.question_id," if batched else ""
 
-        WHERE a.question_id = :question_id
-        {initial_filter}
 
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
-    """
-    return query
-
-
-def get_nivel_actual_estudios_by_tipo_escuela_query(
-    school_type_id: int, initial_only: bool = True
+def _get_geography_rollup_query(
+    answer_columns: dict[str, str],
+    filters: str,
+    initial_only: bool | None = True,
+    batched: bool = False,
+    mean: bool = False,
 ) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            oa.option_label    AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id
-
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'nivel_actual_estudios'
-
-        LEFT JOIN respondent_attributes rt
-        ON a.respondent_id = rt.respondent_id
-        AND rt.attribute    = 'tipo_escuela'
-
-        LEFT JOIN options oa
-        ON ra.question_id = oa.question_id
-        AND ra.value       = oa.option_id
-        AND rt.value = {school_type_id}
-
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
-        WHERE a.question_id = :question_id
-        {initial_filter}
-
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
     """
-
-    return query
-
-
-def get_sexo_query(initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value)        AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT))     AS Respuesta,
-            oa.option_label    AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o
-        ON a.question_id = o.question_id
-        AND a.option_id   = o.option_id
-
-        LEFT JOIN respondent_attributes ra
-        ON a.respondent_id = ra.respondent_id
-        AND ra.attribute    = 'sexo'
-
-        LEFT JOIN options oa
-        ON ra.question_id = oa.question_id
-        AND ra.value       = oa.option_id
-
-        JOIN responses r
-        ON a.respondent_id = r.respondent_id
-
-        WHERE a.question_id = :question_id
-        {initial_filter}
-
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
+    Groups the answers once by (answer, AMM municipality, region) and rolls
+    that result up into the AMM municipality rows, the AMM / Periferia /
+    Resto NL rows and the Nuevo León row. answer_columns maps each answer
+    column of the result to its expression.
     """
-    return query
-
-
-def get_municipio_query(initial_only: bool = True) -> str:
-    """
-    Should take into account AMM_ID and PERIFERIA_ID constants.
-    The ids are mapped to their names using ID_TO_CITY_NAME.
-    The final groups should be
-    All municipalities in AMM_ID as their names, a group "AMM", a group "Periferia", a group "Resto NL", and a group "Nuevo León".
-    It should use the city_id from the responses table.
-    """
-    weight = _get_weight_clause(initial_only)
+    partial_columns = _get_partial_value_columns(initial_only, mean)
+    rollup_columns = _get_rollup_value_columns(initial_only, mean)
     initial_filter = _get_initial_filter(initial_only)
-
-    amm_list = ", ".join(map(str, AMM_ID))
-    periferia_list = ", ".join(map(str, PERIFERIA_ID))
-    amm_plus_perif = ", ".join(map(str, AMM_ID + PERIFERIA_ID))
-
-    # Subquery 1: specific city rows (only for AMM municipalities)
-    city_case = ""
-    for city_id in AMM_ID:
-        city_name = ID_TO_CITY_NAME[city_id]
-        city_case += f"WHEN r.city_id = {city_id} THEN '{city_name}'\n            "
+    question_filter = _get_question_filter(batched)
+    question_column = _get_question_column(batched)
+    question_group = _get_question_group(batched)
+    base_question_column = _get_question_column(batched, alias="b")
+    base_question_group = _get_question_group(batched, alias="b")
+
+    answer_select = "".join(
+        f"{expression} AS {column},\n                "
+        for column, expression in answer_columns.items()
+    )
+    answer_group = "".join(
+        f"{expression},\n                " for expression in answer_columns.values()
+    )
+    base_answer_keys = ",\n            ".join(f"b.{column}" for column in answer_columns)
+    base_answer_columns = f"{base_answer_keys},\n            "
 
     query = f"""
+        WITH base AS (
+            SELECT
+                {question_column}
+                {answer_select}r.municipio_amm AS municipio,
+                r.region AS region,
+                {partial_columns}
+            FROM answers a
+            JOIN respondent_dim r ON a.respondent_id = r.respondent_id
+            WHERE {question_filter}
+                AND r.city_id IS NOT NULL
+                {filters}
+            {initial_filter}
+            GROUP BY
+                {question_group}
+                {answer_group}r.municipio_amm,
+                r.region
+        )
+
         -- City-level rows (only for AMM municipalities)
         SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            CASE
-            {city_case}
-            END AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o ON a.question_id = o.question_id AND a.option_id = o.option_id
-                JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                    AND r.city_id IN ({amm_list})
-        {initial_filter}
+            {base_question_column}
+            {base_answer_columns}b.municipio AS grupo,
+            {rollup_columns}
+        FROM base b
+        WHERE b.municipio IS NOT NULL
         GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            grupo
+            {base_question_group}
+            {base_answer_columns}b.municipio
 
         UNION ALL
 
         -- Regional rows: AMM / Periferia / Resto NL
         SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            CASE
-                WHEN r.city_id IN ({amm_list}) THEN 'AMM'
-                WHEN r.city_id IN ({periferia_list}) THEN 'Periferia'
-                WHEN r.city_id NOT IN ({amm_plus_perif}) THEN 'Resto NL'
-            END AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o ON a.question_id = o.question_id AND a.option_id = o.option_id
-                JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                    AND r.city_id IS NOT NULL
-        {initial_filter}
+            {base_question_column}
+            {base_answer_columns}b.region AS grupo,
+            {rollup_columns}
+        FROM base b
         GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            grupo
+            {base_question_group}
+            {base_answer_columns}b.region
 
         UNION ALL
 
         -- Entire state row: Nuevo León (any non-null municipio)
         SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            'Nuevo León' AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o ON a.question_id = o.question_id AND a.option_id = o.option_id
-                JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                    AND r.city_id IS NOT NULL
-        {initial_filter}
+            {base_question_column}
+            {base_answer_columns}'{GEOGRAPHY_STATE}' AS grupo,
+            {rollup_columns}
+        FROM base b
         GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT))
+            {base_question_group}
+            {base_answer_keys}
     """
-
     return query
 
 
-def get_municipio_by_sex_query(sex_id: int = 0, initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    amm_list = ", ".join(map(str, AMM_ID))
-    periferia_list = ", ".join(map(str, PERIFERIA_ID))
-    amm_plus_perif = ", ".join(map(str, AMM_ID + PERIFERIA_ID))
-
-    city_case = ""
-    for city_id in AMM_ID:
-        city_name = ID_TO_CITY_NAME[city_id]
-        city_case += f"WHEN r.city_id = {city_id} THEN '{city_name}'\n            "
-
-    query = f"""
-        -- City-level rows (only for AMM municipalities)
-        SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            CASE
-            {city_case}
-            END AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o ON a.question_id = o.question_id AND a.option_id = o.option_id
-            LEFT JOIN respondent_attributes rs ON a.respondent_id = rs.respondent_id AND rs.attribute = 'sexo'
-            JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                        AND r.city_id IN ({amm_list})
-                    AND rs.value = {sex_id}
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            grupo
-        UNION ALL
-        -- Regional rows: AMM / Periferia / Resto NL
-        SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            CASE
-                WHEN r.city_id IN ({amm_list}) THEN 'AMM'
-                WHEN r.city_id IN ({periferia_list}) THEN 'Periferia'
-                WHEN r.city_id NOT IN ({amm_plus_perif}) THEN 'Resto NL'
-            END AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o ON a.question_id = o.question_id AND a.option_id = o.option_id
-            LEFT JOIN respondent_attributes rs ON a.respondent_id = rs.respondent_id AND rs.attribute = 'sexo'
-            JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                        AND r.city_id IS NOT NULL
-                    AND rs.value = {sex_id}
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            grupo
-        UNION ALL
-        -- Entire state row: Nuevo León (any non-null municipio)
-        SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            'Nuevo León' AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o ON a.question_id = o.question_id AND a.option_id = o.option_id
-            LEFT JOIN respondent_attributes rs ON a.respondent_id = rs.respondent_id AND rs.attribute = 'sexo'
-            JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                        AND r.city_id IS NOT NULL
-                    AND rs.value = {sex_id}
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT))
-    """
-    return query
-
+def _get_placeholders(name: str, values: list) -> tuple[str, dict]:
+    params = {f"{name}_{i}": value for i, value in enumerate(values)}
+    return ", ".join(f":{key}" for key in params), params
 
-def get_edad_query(initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
 
-    age_cases = ""
-    start_index = 0 if not initial_only else 3
-    for i in range(start_index, len(AGE_BINS) - 1):
-        lower = AGE_BINS[i] + (0 if i == 0 else 1)
-        upper = AGE_BINS[i + 1]
-        label = AGE_LABELS[i]
-        age_cases += (
-            f"WHEN ra.value BETWEEN {lower} AND {upper} THEN '{label}'\n            "
+def _get_case(column: str, cases: dict[str, list], default: str | None = None) -> str:
+    whens = "".join(
+        f"\n                WHEN {column} IN ({', '.join(map(str, values))}) THEN '{label}'"
+        for label, values in cases.items()
+    )
+    otherwise = f"\n                ELSE '{default}'" if default is not None else ""
+    return f"CASE{whens}{otherwise}\n            END"
+
+
+class Disaggregation:
+    """
+    Declarative description of a disaggregation, compiled by get_query.
+
+    The SQL only depends on the shape of the spec: which columns group and
+    filter the answers, and how many values each filter has. The values are
+    bound as parameters, so disaggregations of the same shape (the income of
+    every city, the men and women variants) share one statement in the
+    sqlite3 statement cache, and a new one needs no new SQL.
+
+    group: respondent attribute whose label becomes grupo (None for a single
+        'Total' group). Attributes outside respondent_dim are joined from
+        respondent_attributes and returned as grupo_question_id and
+        grupo_option_id, for AnswerDomain to label.
+    group_label: respondent_dim column with the labels, <group>_label by
+        default.
+    group_cases: {label: values of group} used instead of its labels, with
+        group_default for the rest.
+    group_when: (column, values); the other respondents go to a NULL group.
+    weighted_excluded_groups: groups left out of the weighted tables.
+    filters: {respondent_dim column: values}, or None to require any value.
+    geography: groups by AMM municipality, region and Nuevo León (see
+        _get_geography_rollup_query) instead of group.
+    answer, answer_cases: a respondent attribute (its values and labels, or
+        labels of sets of its values) replaces the answers as the rows.
+    mean: averages the answer values instead of counting respondents (only
+        with geography).
+    """
+
+    def __init__(
+        self,
+        group: str | None = None,
+        group_label: str | None = None,
+        group_cases: dict[str, list] | None = None,
+        group_default: str | None = None,
+        group_when: tuple[str, list] | None = None,
+        weighted_excluded_groups: list[str] | None = None,
+        filters: dict[str, list | None] | None = None,
+        geography: bool = False,
+        answer: str | None = None,
+        answer_cases: dict[str, list] | None = None,
+        mean: bool = False,
+    ):
+        self.group = group
+        self.group_label = group_label or f"{group}_label"
+        self.group_cases = group_cases
+        self.group_default = group_default
+        self.group_when = group_when
+        self.weighted_excluded_groups = weighted_excluded_groups
+        self.filters = filters or {}
+        self.geography = geography
+        self.answer = answer
+        self.answer_cases = answer_cases
+        self.mean = mean
+
+        self.params = {}
+        self._filters = self._compile_filters()
+        if group_when is not None:
+            self._group_when = self._add_placeholders("group_when", group_when[1])
+        if weighted_excluded_groups:
+            self._excluded_groups = self._add_placeholders(
+                "excluded_group", weighted_excluded_groups
+            )
+        self._queries: dict[tuple[bool | None, bool], str] = {}
+
+    def _add_placeholders(self, name: str, values: list) -> str:
+        placeholders, params = _get_placeholders(name, values)
+        self.params.update(params)
+        return placeholders
+
+    def _compile_filters(self) -> str:
+        filters = []
+        for column, values in self.filters.items():
+            if values is None:
+                filters.append(f"AND r.{column} IS NOT NULL")
+            else:
+                placeholders = self._add_placeholders(f"filter_{column}", values)
+                filters.append(f"AND r.{column} IN ({placeholders})")
+        return "\n                ".join(filters)
+
+    @property
+    def is_multivalued(self) -> bool:
+        return self.group is not None and self.group not in RESPONDENT_DIM_ATTRIBUTES
+
+    def get_columns(self) -> set[str]:
+        """The respondent_dim columns the query reads from r."""
+        columns = set(self.filters)
+        if self.group is not None and not self.is_multivalued:
+            columns.add(self.group if self.group_cases else self.group_label)
+        if self.group_when is not None:
+            columns.add(self.group_when[0])
+        if self.geography:
+            columns |= {"city_id", "municipio_amm", "region"}
+        if self.answer is not None:
+            columns |= {self.answer, f"{self.answer}_label"}
+        return columns
+
+    def _get_answer_columns(self) -> dict[str, str]:
+        if self.answer_cases is not None:
+            case = _get_case(f"r.{self.answer}", self.answer_cases)
+            return {"id_respuesta": case, "Respuesta": case}
+        if self.answer is not None:
+            return {
+                "id_respuesta": f"r.{self.answer}",
+                "Respuesta": f"r.{self.answer}_label",
+            }
+        return ANSWER_COLUMNS
+
+    def _get_group(self, initial_only: bool | None) -> tuple[str, str]:
+        """The grupo columns of the SELECT and their GROUP BY keys."""
+        if self.group is None:
+            return "'Total' AS grupo,", ""
+
+        if self.is_multivalued and self.group_cases is None:
+            return (
+                """ra.question_id AS grupo_question_id,
+            ra.value AS grupo_option_id,""",
+                """,
+            ra.question_id,
+            ra.value""",
+            )
+
+        alias = "ra.value" if self.is_multivalued else f"r.{self.group}"
+        if self.group_cases is not None:
+            group = _get_case(alias, self.group_cases, self.group_default)
+        else:
+            group = f"r.{self.group_label}"
+
+        if self.group_when is not None:
+            column = self.group_when[0]
+            group = f"CASE WHEN r.{column} IN ({self._group_when}) THEN {group} END"
+
+        if self.weighted_excluded_groups and initial_only is not False:
+            excluded = self._excluded_groups
+            weighted = f"CASE WHEN {group} NOT IN ({excluded}) THEN {group} END"
+            if initial_only is None:
+                # The weighted table leaves the groups out while the
+                # unweighted one keeps all of them.
+                return (
+                    f"{weighted} AS grupo,\n            {group} AS grupo_sin_factor,",
+                    f",\n            {group}",
+                )
+            group = weighted
+
+        return f"{group} AS grupo,", f",\n            {group}"
+
+    def _get_attribute_join(self, alias: str = "a") -> str:
+        if not self.is_multivalued:
+            return ""
+        return f"""LEFT JOIN respondent_attributes ra
+        ON {alias}.respondent_id = ra.respondent_id
+        AND ra.attribute = '{self.group}'
+        """
+
+    def _compile(self, initial_only: bool | None, batched: bool) -> str:
+        answer_columns = self._get_answer_columns()
+        if self.geography:
+            return _get_geography_rollup_query(
+                answer_columns=answer_columns,
+                filters=self._filters,
+                initial_only=initial_only,
+                batched=batched,
+                mean=self.mean,
+            )
+
+        group_columns, group_keys = self._get_group(initial_only)
+        value_columns = _get_value_columns(initial_only)
+        initial_filter = _get_initial_filter(initial_only)
+        question_filter = _get_question_filter(batched)
+        question_column = _get_question_column(batched)
+        question_group = _get_question_group(batched)
+        answer_select = "".join(
+            f"{expression} AS {column},\n            "
+            for column, expression in answer_columns.items()
         )
+        answer_group = ",\n            ".join(answer_columns.values())
+
+        query = f"""
+        SELECT
+            {question_column}
+            {answer_select}{group_columns}
+            {value_columns}
+        FROM answers a
+        {self._get_attribute_join()}JOIN respondent_dim r ON a.respondent_id = r.respondent_id
+        WHERE {question_filter}
+                {self._filters}
+        {initial_filter}
+        GROUP BY
+            {question_group}
+            {answer_group}{group_keys}
+    """
+        return query
+
+    def get_respondent_query(self) -> tuple[str, dict]:
+        """
+        The respondents the query keeps, after its filters, with what it
+        takes from each of them: the grupo columns (grupo_sin_factor too
+        when the weighted tables leave groups out), the answer columns when
+        an attribute replaces the answers, and municipio and region for
+        geography. One row per respondent, or per respondent_attributes
+        value of a multivalued group (NULL when there is none), as the
+        LEFT JOIN yields them. RespondentMatrix joins these rows to the
+        answers in memory.
+        """
+        columns = ["r.respondent_id AS respondent_id,"]
+        if self.answer is not None:
+            columns += [
+                f"{expression} AS {column},"
+                for column, expression in self._get_answer_columns().items()
+            ]
+        if self.geography:
+            columns += ["r.municipio_amm AS municipio,", "r.region AS region,"]
+            filters = f"AND r.city_id IS NOT NULL\n                {self._filters}"
+        else:
+            columns.append(self._get_group(None)[0])
+            filters = self._filters
+        select = "\n            ".join(columns).rstrip(",")
+
+        query = f"""
+        SELECT
+            {select}
+        FROM respondent_dim r
+        {self._get_attribute_join(alias="r")}WHERE 1
+                {filters}
+    """
+        return query, self.params
+
+    def get_query(
+        self, initial_only: bool | None = True, batched: bool = False
+    ) -> tuple[str, dict]:
+        """The query and the parameters of its values, without the questions."""
+        key = (initial_only, batched)
+        if key not in self._queries:
+            self._queries[key] = self._compile(initial_only, batched)
+        return self._queries[key], self.params
+
+
+TRABAJO_REMUNERADO = [1, 4, 6]
+
+TIPO_TRABAJO_CASES = {
+    "Trabajo remunerado": TRABAJO_REMUNERADO,
+    "Trabajo no remunerado": [5],
+}
 
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            CASE
-            {age_cases}
-            END AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o ON a.question_id = o.question_id AND a.option_id = o.option_id
-        LEFT JOIN respondent_attributes ra ON a.respondent_id = ra.respondent_id AND ra.attribute = 'edad_anos'
-        JOIN responses r ON a.respondent_id = r.respondent_id
-        WHERE a.question_id = :question_id
-          AND ra.value IS NOT NULL
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            grupo
-    """
-    return query
-
-
-def get_totales_query(initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            'Total' AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o ON a.question_id = o.question_id AND a.option_id = o.option_id
-        JOIN responses r ON a.respondent_id = r.respondent_id
-        WHERE a.question_id = :question_id
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT))
-    """
-    return query
-
-
-def get_ingreso_query(initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            oa.option_label AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o 
-        ON a.question_id = o.question_id 
-        AND a.option_id = o.option_id
-
-        LEFT JOIN respondent_attributes ra 
-        ON a.respondent_id = ra.respondent_id 
-        AND ra.attribute = 'ingreso'
-
-        LEFT JOIN options oa 
-        ON ra.question_id = oa.question_id 
-        AND ra.value = oa.option_id
-        
-        JOIN responses r ON a.respondent_id = r.respondent_id
-        WHERE a.question_id = :question_id
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
-    """
-    return query
-
-
-def get_tipo_consulta_query(initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            oa.option_label AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o 
-        ON a.question_id = o.question_id 
-        AND a.option_id = o.option_id
-
-        LEFT JOIN respondent_attributes ra 
-        ON a.respondent_id = ra.respondent_id 
-        AND ra.attribute = 'tipo_consulta'
-
-        LEFT JOIN options oa 
-        ON ra.question_id = oa.question_id 
-        AND ra.value = oa.option_id
-        
-        JOIN responses r ON a.respondent_id = r.respondent_id
-        WHERE a.question_id = :question_id
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
-    """
-    return query
-
-
-def get_municipio_by_promedio_modo_transporte_query(initial_only: bool = True) -> str:
-    """
-    The table should look like:
-    id_respuesta | Respuesta | City1 | City2 | ... | AMM | Resto NL | Nuevo León
-    1            | Camina    |  avg  |  avg  | ... | avg |   avg    |   avg
-    2            | Auto      |  avg  |  avg  | ... | avg |   avg    |   avg
-    3            | Camion    |  avg  |  avg  | ... | avg |   avg    |   avg
-    The averages should be calculated using the weight clause.
-    Lets say we have the following data:
-    Respondent | Modo Transporte | Municipio | Tiempo de Viaje | Weight
-        1      |      Camina     |    City1  |       30       |   1.5
-        2      |      Camina     |    City1  |       40       |   0.5
-        3      |      Auto       |    City2  |       20       |   2.0
-    The average time for Camina in City1 would be:
-    (30*1.5 + 40*0.5) / (1.5 + 0.5) = 32.5
-    """
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    amm_list = ", ".join(map(str, AMM_ID))
-    periferia_list = ", ".join(map(str, PERIFERIA_ID))
-    amm_plus_perif = ", ".join(map(str, AMM_ID + PERIFERIA_ID))
-
-    city_case = ""
-    for city_id in AMM_ID:
-        city_name = ID_TO_CITY_NAME[city_id]
-        city_case += f"WHEN r.city_id = {city_id} THEN '{city_name}'\n            "
-
-    query = f"""
-        SELECT
-            ra_modo.value AS id_respuesta,
-            oa.option_label AS Respuesta,
-            CASE
-            {city_case}
-            END AS grupo,
-            SUM(CAST(a.value AS NUMERIC) * {weight}) / SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN respondent_attributes ra_modo
-            ON a.respondent_id = ra_modo.respondent_id
-            AND ra_modo.attribute = 'modo_transporte'
-        LEFT JOIN options oa
-            ON ra_modo.question_id = oa.question_id
-            AND ra_modo.value = oa.option_id
-        JOIN responses r
-            ON a.respondent_id = r.respondent_id
-        WHERE a.question_id = :question_id
-          AND r.city_id IS NOT NULL
-          AND ra_modo.value IS NOT NULL
-          AND r.city_id IN ({amm_list})
-        {initial_filter}
-        GROUP BY
-            ra_modo.value,
-            oa.option_label,
-            grupo
-
-        UNION ALL
-
-        SELECT
-            ra_modo.value AS id_respuesta,
-            oa.option_label AS Respuesta,
-            CASE
-                WHEN r.city_id IN ({amm_list}) THEN 'AMM'
-                WHEN r.city_id IN ({periferia_list}) THEN 'Periferia'
-                WHEN r.city_id NOT IN ({amm_plus_perif}) THEN 'Resto NL'
-            END AS grupo,
-            SUM(CAST(a.value AS NUMERIC) * {weight}) / SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN respondent_attributes ra_modo
-            ON a.respondent_id = ra_modo.respondent_id
-            AND ra_modo.attribute = 'modo_transporte'
-        LEFT JOIN options oa
-            ON ra_modo.question_id = oa.question_id
-            AND ra_modo.value = oa.option_id
-        JOIN responses r
-            ON a.respondent_id = r.respondent_id
-        WHERE a.question_id = :question_id
-          AND r.city_id IS NOT NULL
-          AND ra_modo.value IS NOT NULL
-        {initial_filter}
-        GROUP BY
-            ra_modo.value,
-            oa.option_label,
-            grupo
-
-        UNION ALL
-
-        SELECT
-            ra_modo.value AS id_respuesta,
-            oa.option_label AS Respuesta,
-            'Nuevo León' AS grupo,
-            SUM(CAST(a.value AS NUMERIC) * {weight}) / SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN respondent_attributes ra_modo
-            ON a.respondent_id = ra_modo.respondent_id
-            AND ra_modo.attribute = 'modo_transporte'
-        LEFT JOIN options oa
-            ON ra_modo.question_id = oa.question_id
-            AND ra_modo.value = oa.option_id
-        JOIN responses r
-            ON a.respondent_id = r.respondent_id
-        WHERE a.question_id = :question_id
-          AND r.city_id IS NOT NULL
-          AND ra_modo.value IS NOT NULL
-        {initial_filter}
-        GROUP BY
-            ra_modo.value,
-            oa.option_label
-    """
-
-    return query
-
-
-def get_ingreso_by_municipio_query(city_id: int, initial_only: bool = True) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
+TIPO_SERVICIO_SALUD_CASES = {
+    "Servicios Privados": [2, 3, 7, 8, 9, 10, 12, 13],
+    "Servicios Publicos": [1, 4, 5, 6, 11],
+}
 
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            oa.option_label AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o 
-        ON a.question_id = o.question_id 
-        AND a.option_id = o.option_id
-
-        LEFT JOIN respondent_attributes ra 
-        ON a.respondent_id = ra.respondent_id 
-        AND ra.attribute = 'ingreso'
-
-        LEFT JOIN respondent_attributes rm 
-        ON a.respondent_id = rm.respondent_id 
-        AND rm.attribute = 'municipio'
-
-        LEFT JOIN options oa 
-        ON ra.question_id = oa.question_id 
-        AND ra.value = oa.option_id
-        
-        JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                    AND r.city_id = {city_id}
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
-    """
-    return query
+PARTICION_MODAL_CASES = {
+    "Medios motorizados no colectivos": [3, 4, 5, 9],
+    "Medios no motorizados": [1, 6, 7],
+    "Transporte publico colectivo": [2, 8, 10],
+    "Transporte privado colectivo": [11, 12, 13],
+    "Otros": [14, 15],
+    "No Sabe": [8888],
+    "No Contesta": [9999],
+}
 
+SEX_IDS = {"hombres": 0, "mujeres": 1}
+
+INGRESO_CITY_IDS = {
+    "apodaca": 6,
+    "guadalupe": 26,
+    "juarez": 31,
+    "monterrey": 39,
+    "san_nicolas": 46,
+    "san_pedro": 19,
+    "santiago": 49,
+    "cadereyta": 9,
+    "santa_catarina": 48,
+    "garcia": 18,
+    "escobedo": 21,
+}
 
-def get_ingreso_by_region(region_id: int, initial_only: bool = True) -> str:
-    """
-    1: AMM
-    2: Periferia
-    3: Resto NL
-    """
+INGRESO_REGIONS = {"amm": "AMM", "periferia": "Periferia", "resto_nl": "Resto NL"}
 
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
 
-    if region_id == 1:
-        region_condition = f"r.city_id IN ({', '.join(map(str, AMM_ID))})"
-    elif region_id == 2:
-        region_condition = f"r.city_id IN ({', '.join(map(str, PERIFERIA_ID))})"
-    elif region_id == 3:
-        region_condition = (
-            f"r.city_id NOT IN ({', '.join(map(str, AMM_ID + PERIFERIA_ID))})"
+DISAGGREGATIONS_MAP = {
+    "trabajo_remunerado": Disaggregation(
+        group="tipo_trabajo", group_when=("tipo_trabajo", TRABAJO_REMUNERADO)
+    ),
+    **{
+        f"trabajo_remunerado_por_{sex}": Disaggregation(
+            group="tipo_trabajo",
+            group_when=("tipo_trabajo", TRABAJO_REMUNERADO),
+            filters={"sexo": [sex_id]},
         )
-    else:
-        raise ValueError("Invalid region_id. Must be 1, 2, 3, or 4.")
-
-    query = f"""
-        SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            oa.option_label AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o 
-        ON a.question_id = o.question_id 
-        AND a.option_id = o.option_id
-
-        LEFT JOIN respondent_attributes ra 
-        ON a.respondent_id = ra.respondent_id 
-        AND ra.attribute = 'ingreso'
-
-        
-
-        LEFT JOIN options oa 
-        ON ra.question_id = oa.question_id 
-        AND ra.value = oa.option_id
-        
-        JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                    AND {region_condition}
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            oa.option_label
-    """
-    return query
-
-
-def get_particion_modal_agregada_por_region_query(initial_only: bool = True) -> str:
-    medios_motorizados_no_colectivos = [3, 4, 5, 9]
-    medios_no_motorizados = [1, 6, 7]
-    transporte_publico_colectivo = [2, 8, 10]
-    transporte_privado_colectivo = [11, 12, 13]
-    otros = [14, 15]
+        for sex, sex_id in SEX_IDS.items()
+    },
+    "tipo_trabajo": Disaggregation(
+        group="tipo_trabajo", group_cases=TIPO_TRABAJO_CASES, group_default="Otro"
+    ),
+    **{
+        f"tipo_trabajo_por_{sex}": Disaggregation(
+            group="tipo_trabajo",
+            group_cases=TIPO_TRABAJO_CASES,
+            group_default="Otro",
+            filters={"sexo": [sex_id]},
+        )
+        for sex, sex_id in SEX_IDS.items()
+    },
+    "afiliacion_servicio_salud": Disaggregation(group="afiliacion_servicio_salud"),
+    "nivel_max_estudios": Disaggregation(group="nivel_max_estudios"),
+    "servicio_salud_donde_se_atendio": Disaggregation(
+        group="servicio_salud_donde_se_atendio"
+    ),
+    "tipo_servicio_salud_donde_se_atendio": Disaggregation(
+        group="servicio_salud_donde_se_atendio",
+        group_cases=TIPO_SERVICIO_SALUD_CASES,
+    ),
+    "tipo_escuela": Disaggregation(group="tipo_escuela"),
+    "nivel_actual_estudios": Disaggregation(group="nivel_actual_estudios"),
+    "nivel_actual_estudios_por_escuela_privada": Disaggregation(
+        group="nivel_actual_estudios", group_when=("tipo_escuela", [2])
+    ),
+    "nivel_actual_estudios_por_escuela_publica": Disaggregation(
+        group="nivel_actual_estudios", group_when=("tipo_escuela", [1])
+    ),
+    "sexo": Disaggregation(group="sexo"),
+    # AMM municipalities by name, then AMM, Periferia, Resto NL and Nuevo León.
+    "municipio": Disaggregation(geography=True),
+    **{
+        f"municipio_por_{sex}": Disaggregation(
+            geography=True, filters={"sexo": [sex_id]}
+        )
+        for sex, sex_id in SEX_IDS.items()
+    },
+    # Weighted tables leave out the bands under 18 years old.
+    "edad": Disaggregation(
+        group="edad_anos",
+        group_label="grupo_edad",
+        weighted_excluded_groups=AGE_LABELS[:3],
+        filters={"edad_anos": None},
+    ),
+    "totales": Disaggregation(),
+    "ingreso": Disaggregation(group="ingreso"),
+    "tipo_consulta": Disaggregation(group="tipo_consulta"),
+    # Weighted average of the answers (e.g. travel time) per transport mode
+    # and municipality: (30 * 1.5 + 40 * 0.5) / (1.5 + 0.5) = 32.5 for two
+    # respondents walking 30 and 40 minutes with factors 1.5 and 0.5.
+    "promedio_modo_transporte_y_municipio": Disaggregation(
+        geography=True,
+        answer="modo_transporte",
+        filters={"modo_transporte": None},
+        mean=True,
+    ),
+    **{
+        f"ingreso_por_{city}": Disaggregation(
+            group="ingreso", filters={"city_id": [city_id]}
+        )
+        for city, city_id in INGRESO_CITY_IDS.items()
+    },
+    **{
+        f"ingreso_por_region_{region}": Disaggregation(
+            group="ingreso", filters={"region": [label]}
+        )
+        for region, label in INGRESO_REGIONS.items()
+    },
+    "particion_modal_agregada_por_municipio": Disaggregation(
+        geography=True,
+        answer="modo_transporte",
+        answer_cases=PARTICION_MODAL_CASES,
+        filters={"modo_transporte": None},
+    ),
+    "trabajo_remunerado_por_municipio": Disaggregation(
+        geography=True, filters={"tipo_trabajo": TRABAJO_REMUNERADO}
+    ),
+    "nivel_actual_estudios_primaria_por_municipio": Disaggregation(
+        geography=True, filters={"nivel_actual_estudios": [2]}
+    ),
+    "nivel_actual_estudios_secundaria_por_municipio": Disaggregation(
+        geography=True, filters={"nivel_actual_estudios": [3]}
+    ),
+    "nivel_actual_estudios_media_superior_por_municipio": Disaggregation(
+        geography=True, filters={"nivel_actual_estudios": [4, 5]}
+    ),
+}
 
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-    amm_list = ", ".join(map(str, AMM_ID))
-    periferia_list = ", ".join(map(str, PERIFERIA_ID))
-    amm_plus_perif = ", ".join(map(str, AMM_ID + PERIFERIA_ID))
-
-    city_case = ""
-    for city_id in AMM_ID:
-        city_name = ID_TO_CITY_NAME[city_id]
-        city_case += f"WHEN r.city_id = {city_id} THEN '{city_name}'\n            "
-
-    mode_case = f"""CASE
-                WHEN ra.value IN ({', '.join(map(str, medios_motorizados_no_colectivos))}) THEN 'Medios motorizados no colectivos'
-                WHEN ra.value IN ({', '.join(map(str, medios_no_motorizados))}) THEN 'Medios no motorizados'
-                WHEN ra.value IN ({', '.join(map(str, transporte_publico_colectivo))}) THEN 'Transporte publico colectivo'
-                WHEN ra.value IN ({', '.join(map(str, transporte_privado_colectivo))}) THEN 'Transporte privado colectivo'
-                WHEN ra.value IN ({', '.join(map(str, otros))}) THEN 'Otros'
-                WHEN ra.value IN (8888) THEN 'No Sabe'
-                WHEN ra.value IN (9999) THEN 'No Contesta'
-            END"""
 
-    query = f"""
-        -- City-level rows (only for AMM municipalities)
-        SELECT
-            {mode_case} AS id_respuesta,
-            {mode_case} AS Respuesta,
-            CASE
-            {city_case}
-            END AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN respondent_attributes ra 
-        ON a.respondent_id = ra.respondent_id 
-        AND ra.attribute = 'modo_transporte'
-        JOIN responses r ON a.respondent_id = r.respondent_id
-        WHERE a.question_id = :question_id
-          AND ra.value IS NOT NULL
-             AND r.city_id IN ({amm_list})
-        {initial_filter}
-        GROUP BY
-            id_respuesta,
-            Respuesta,
-            grupo
+def get_disaggregation_query(
+    disaggregation: str, initial_only: bool | None = True, batched: bool = False
+) -> tuple[str, dict]:
+    spec = DISAGGREGATIONS_MAP.get(disaggregation)
+    if spec is None:
+        raise ValueError(f"Disaggregation '{disaggregation}' is not supported.")
+    return spec.get_query(initial_only, batched)
 
-        UNION ALL
 
-        -- Regional rows: AMM / Periferia / Resto NL
-        SELECT
-            {mode_case} AS id_respuesta,
-            {mode_case} AS Respuesta,
-            CASE
-                    WHEN r.city_id IN ({amm_list}) THEN 'AMM'
-                    WHEN r.city_id IN ({periferia_list}) THEN 'Periferia'
-                    WHEN r.city_id NOT IN ({amm_plus_perif}) THEN 'Resto NL'
-            END AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN respondent_attributes ra 
-        ON a.respondent_id = ra.respondent_id 
-        AND ra.attribute = 'modo_transporte'
-        JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                    AND ra.value IS NOT NULL
-                    AND r.city_id IS NOT NULL
-        {initial_filter}
-        GROUP BY
-            id_respuesta,
-            Respuesta,
-            grupo
+# respondent_dim columns the answers of a question cube (src/cube.py) are
+# counted by, all at once; every disaggregation that only reads these
+# columns is a slice of it.
+QUESTION_CUBE_COLUMNS = [
+    "sexo",
+    "sexo_label",
+    "tipo_trabajo",
+    "tipo_trabajo_label",
+    "nivel_actual_estudios",
+    "nivel_actual_estudios_label",
+    "city_id",
+    "municipio_amm",
+    "region",
+    "ingreso",
+    "ingreso_label",
+]
 
-        UNION ALL
 
-        -- Entire state row: Nuevo León
+def get_cube_respondents_query() -> str:
+    columns = ",\n            ".join(f"r.{column}" for column in QUESTION_CUBE_COLUMNS)
+    return f"""
         SELECT
-            {mode_case} AS id_respuesta,
-            {mode_case} AS Respuesta,
-            'Nuevo León' AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN respondent_attributes ra 
-        ON a.respondent_id = ra.respondent_id 
-        AND ra.attribute = 'modo_transporte'
-        JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                    AND ra.value IS NOT NULL
-                    AND r.city_id IS NOT NULL
-        {initial_filter}
-        GROUP BY
-            id_respuesta,
-            Respuesta
+            r.respondent_id,
+            r.is_initial_respondent = 1 AS is_initial,
+            r.factor_cvnl,
+            {columns}
+        FROM respondent_dim r
     """
-    return query
 
 
-def get_municipio_by_trabajo_remunerado(initial_only: bool = True) -> str:
-    """
-    Should return a table with the following columns:
-    id_respuesta | Respuesta | City1 | City2 | ... | AMM | Resto NL | Nuevo León
-    It should be filtered by the "trabajo_remunerado" question.
-    The values should be the respondents that answered 1, 4 or 6 to the "trabajo_remunerado"
-    in the attributes table.
-    """
-    return _get_municipio_by_attribute_values_query(
-        attribute="tipo_trabajo",
-        attribute_values=[1, 4, 6],
-        initial_only=initial_only,
-    )
-
-
-def _get_municipio_by_attribute_values_query(
-    attribute: str, attribute_values: list[int], initial_only: bool = True
-) -> str:
-    weight = _get_weight_clause(initial_only)
-    initial_filter = _get_initial_filter(initial_only)
-
-    amm_list = ", ".join(map(str, AMM_ID))
-    periferia_list = ", ".join(map(str, PERIFERIA_ID))
-    amm_plus_perif = ", ".join(map(str, AMM_ID + PERIFERIA_ID))
-    filter_values = ", ".join(map(str, attribute_values))
-
-    city_case = ""
-    for city_id in AMM_ID:
-        city_name = ID_TO_CITY_NAME[city_id]
-        city_case += f"WHEN r.city_id = {city_id} THEN '{city_name}'\n            "
-
-    query = f"""
-        -- City-level rows (only for AMM municipalities)
+def get_cube_answers_query() -> str:
+    return f"""
         SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            CASE
-            {city_case}
-            END AS grupo,
-            SUM({weight}) AS valor
+            {ANSWER_COLUMNS["option_id"]} AS option_id,
+            {ANSWER_COLUMNS["value"]} AS value,
+            a.respondent_id
         FROM answers a
-        LEFT JOIN options o ON a.question_id = o.question_id AND a.option_id = o.option_id
-            LEFT JOIN respondent_attributes rf ON a.respondent_id = rf.respondent_id AND rf.attribute = '{attribute}'
-            JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                    AND r.city_id IN ({amm_list})
-                    AND rf.value IN ({filter_values})
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            grupo
-
-        UNION ALL
-
-        -- Regional rows: AMM / Periferia / Resto NL
-        SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            CASE
-                WHEN r.city_id IN ({amm_list}) THEN 'AMM'
-                WHEN r.city_id IN ({periferia_list}) THEN 'Periferia'
-                WHEN r.city_id NOT IN ({amm_plus_perif}) THEN 'Resto NL'
-            END AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o ON a.question_id = o.question_id AND a.option_id = o.option_id
-            LEFT JOIN respondent_attributes rf ON a.respondent_id = rf.respondent_id AND rf.attribute = '{attribute}'
-            JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                    AND r.city_id IS NOT NULL
-                    AND rf.value IN ({filter_values})
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT)),
-            grupo
-
-        UNION ALL
-
-        -- Entire state row: Nuevo León (any non-null municipio)
-        SELECT
-            COALESCE(o.option_id, a.value) AS id_respuesta,
-            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta,
-            'Nuevo León' AS grupo,
-            SUM({weight}) AS valor
-        FROM answers a
-        LEFT JOIN options o ON a.question_id = o.question_id AND a.option_id = o.option_id
-            LEFT JOIN respondent_attributes rf ON a.respondent_id = rf.respondent_id AND rf.attribute = '{attribute}'
-            JOIN responses r ON a.respondent_id = r.respondent_id
-                WHERE a.question_id = :question_id
-                    AND r.city_id IS NOT NULL
-                    AND rf.value IN ({filter_values})
-        {initial_filter}
-        GROUP BY
-            COALESCE(o.option_id, a.value),
-            COALESCE(o.option_label, CAST(a.value AS TEXT))
-    """
-    return query
-
-
-def get_municipio_by_nivel_actual_estudios_primaria(initial_only: bool = True) -> str:
-    """
-    Similar to get_municipio_by_sex but filtered by "nivel_actual_estudios" attribute.
-    Should return a table with the following columns:
-    id_respuesta | Respuesta | City1 | City2 | ... | AMM | Resto NL | Nuevo León
-    The values should be the respondents that answered 2 (Primaria) to the "nivel_actual_estudios" attribute.
-    """
-
-    return _get_municipio_by_attribute_values_query(
-        attribute="nivel_actual_estudios",
-        attribute_values=[2],
-        initial_only=initial_only,
-    )
-
-
-def get_municipio_by_nivel_actual_estudios_secundaria(initial_only: bool = True) -> str:
-    """
-    Similar to get_municipio_by_nivel_actual_estudios_primaria but filtered by respondents that answered 3 (Secundaria) to the "nivel_actual_estudios" attribute.
-    """
-    return _get_municipio_by_attribute_values_query(
-        attribute="nivel_actual_estudios",
-        attribute_values=[3],
-        initial_only=initial_only,
-    )
-
-
-def get_municipio_by_nivel_actual_estudios_media_superior(
-    initial_only: bool = True,
-) -> str:
-    """
-    Similar to get_municipio_by_nivel_actual_estudios_primaria but filtered by respondents that answered 4 or 5 (Media Superior) to the "nivel_actual_estudios" attribute.
+        WHERE a.question_id = :question_id
     """
-    return _get_municipio_by_attribute_values_query(
-        attribute="nivel_actual_estudios",
-        attribute_values=[4, 5],
-        initial_only=initial_only,
-    )
-
-
-DISAGGREGATIONS_MAP = {
-    "trabajo_remunerado": lambda initial_only: get_trabajo_remunerado_query(
-        initial_only
-    ),
-    "trabajo_remunerado_por_hombres": lambda initial_only: get_trabajo_remunerado_by_sex_query(
-        0, initial_only
-    ),
-    "trabajo_remunerado_por_mujeres": lambda initial_only: get_trabajo_remunerado_by_sex_query(
-        1, initial_only
-    ),
-    "tipo_trabajo": lambda initial_only: get_tipo_trabajo_query(initial_only),
-    "tipo_trabajo_por_hombres": lambda initial_only: get_tipo_trabajo_by_sex_query(
-        0, initial_only
-    ),
-    "tipo_trabajo_por_mujeres": lambda initial_only: get_tipo_trabajo_by_sex_query(
-        1, initial_only
-    ),
-    "afiliacion_servicio_salud": lambda initial_only: get_afiliacion_servicio_salud_query(
-        initial_only
-    ),
-    "nivel_max_estudios": lambda initial_only: get_nivel_max_estudios_query(
-        initial_only
-    ),
-    "servicio_salud_donde_se_atendio": lambda initial_only: get_servicio_salud_donde_se_atendio_query(
-        initial_only
-    ),
-    "tipo_servicio_salud_donde_se_atendio": lambda initial_only: get_tipo_servicio_salud_donde_se_atendio_query(
-        initial_only
-    ),
-    "tipo_escuela": lambda initial_only: get_tipo_escuela_query(initial_only),
-    "nivel_actual_estudios": lambda initial_only: get_nivel_actual_estudios_query(
-        initial_only
-    ),
-    "nivel_actual_estudios_por_escuela_privada": lambda initial_only: get_nivel_actual_estudios_by_tipo_escuela_query(
-        2, initial_only
-    ),
-    "nivel_actual_estudios_por_escuela_publica": lambda initial_only: get_nivel_actual_estudios_by_tipo_escuela_query(
-        1, initial_only
-    ),
-    "sexo": lambda initial_only: get_sexo_query(initial_only),
-    "municipio": lambda initial_only: get_municipio_query(initial_only),
-    "municipio_por_hombres": lambda initial_only: get_municipio_by_sex_query(
-        0, initial_only
-    ),
-    "municipio_por_mujeres": lambda initial_only: get_municipio_by_sex_query(
-        1, initial_only
-    ),
-    "edad": lambda initial_only: get_edad_query(initial_only),
-    "totales": lambda initial_only: get_totales_query(initial_only),
-    "ingreso": lambda initial_only: get_ingreso_query(initial_only),
-    "tipo_consulta": lambda initial_only: get_tipo_consulta_query(initial_only),
-    "promedio_modo_transporte_y_municipio": lambda initial_only: get_municipio_by_promedio_modo_transporte_query(
-        initial_only
-    ),
-    "ingreso_por_apodaca": lambda initial_only: get_ingreso_by_municipio_query(
-        6, initial_only
-    ),
-    "ingreso_por_guadalupe": lambda initial_only: get_ingreso_by_municipio_query(
-        26, initial_only
-    ),
-    "ingreso_por_juarez": lambda initial_only: get_ingreso_by_municipio_query(
-        31, initial_only
-    ),
-    "ingreso_por_monterrey": lambda initial_only: get_ingreso_by_municipio_query(
-        39, initial_only
-    ),
-    "ingreso_por_san_nicolas": lambda initial_only: get_ingreso_by_municipio_query(
-        46, initial_only
-    ),
-    "ingreso_por_san_pedro": lambda initial_only: get_ingreso_by_municipio_query(
-        19, initial_only
-    ),
-    "ingreso_por_santiago": lambda initial_only: get_ingreso_by_municipio_query(
-        49, initial_only
-    ),
-    "ingreso_por_cadereyta": lambda initial_only: get_ingreso_by_municipio_query(
-        9, initial_only
-    ),
-    "ingreso_por_santa_catarina": lambda initial_only: get_ingreso_by_municipio_query(
-        48, initial_only
-    ),
-    "ingreso_por_garcia": lambda initial_only: get_ingreso_by_municipio_query(
-        18, initial_only
-    ),
-    "ingreso_por_escobedo": lambda initial_only: get_ingreso_by_municipio_query(
-        21, initial_only
-    ),
-    "ingreso_por_region_amm": lambda initial_only: get_ingreso_by_region(
-        1, initial_only
-    ),
-    "ingreso_por_region_periferia": lambda initial_only: get_ingreso_by_region(
-        2, initial_only
-    ),
-    "ingreso_por_region_resto_nl": lambda initial_only: get_ingreso_by_region(
-        3, initial_only
-    ),
-    "particion_modal_agregada_por_municipio": lambda initial_only: get_particion_modal_agregada_por_region_query(
-        initial_only
-    ),
-    "trabajo_remunerado_por_municipio": lambda initial_only: get_municipio_by_trabajo_remunerado(
-        initial_only
-    ),
-    "nivel_actual_estudios_primaria_por_municipio": lambda initial_only: get_municipio_by_nivel_actual_estudios_primaria(
-        initial_only
-    ),
-    "nivel_actual_estudios_secundaria_por_municipio": lambda initial_only: get_municipio_by_nivel_actual_estudios_secundaria(
-        initial_only
-    ),
-    "nivel_actual_estudios_media_superior_por_municipio": lambda initial_only: get_municipio_by_nivel_actual_estudios_media_superior(
-        initial_only
-    ),
-}
@@ -21,3 +21,33 @@ def get_questions_by_section_query(section: str) -> str:
         ORDER BY id;
     """
     return query
+
+
+def get_answer_domain_query() -> str:
+    """
+    Every distinct raw answer with the id and label the reports show for it.
+    """
+    query = """
+        SELECT DISTINCT
+            a.question_id,
+            a.option_id,
+            CAST(a.value AS TEXT) AS value,
+            COALESCE(o.option_id, a.value) AS id_respuesta,
+            COALESCE(o.option_label, CAST(a.value AS TEXT)) AS Respuesta
+        FROM answers a
+        LEFT JOIN options o
+        ON a.question_id = o.question_id
+        AND a.option_id = o.option_id;
+    """
+    return query
+
+
+def get_options_query() -> str:
+    query = """
+        SELECT
+            question_id,
+            option_id,
+            option_label
+        FROM options;
+    """
+    return query
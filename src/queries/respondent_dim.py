@@ -0,0 +1,169 @@
+from src.metadata import (
+    AMM_ID,
+    ID_TO_CITY_NAME,
+    PERIFERIA_ID,
+    AGE_BINS,
+    AGE_LABELS,
+)
+
+
+# Attributes with at most one value per respondent. Each one becomes a
+# column of respondent_dim plus a `<attribute>_label` column with its option
+# label; multi-valued attributes (servicio_salud_donde_se_atendio) stay in
+# respondent_attributes.
+RESPONDENT_DIM_ATTRIBUTES = [
+    "sexo",
+    "edad_anos",
+    "ingreso",
+    "tipo_trabajo",
+    "nivel_actual_estudios",
+    "nivel_max_estudios",
+    "tipo_escuela",
+    "afiliacion_servicio_salud",
+    "tipo_consulta",
+    "modo_transporte",
+    "municipio",
+]
+
+
+def get_age_cases(column: str) -> str:
+    age_cases = ""
+    for i in range(len(AGE_BINS) - 1):
+        lower = AGE_BINS[i] + (0 if i == 0 else 1)
+        upper = AGE_BINS[i + 1]
+        label = AGE_LABELS[i]
+        age_cases += (
+            f"WHEN {column} BETWEEN {lower} AND {upper} THEN '{label}'\n            "
+        )
+    return age_cases
+
+
+def _get_attribute_list() -> str:
+    return ", ".join(f"'{attribute}'" for attribute in RESPONDENT_DIM_ATTRIBUTES)
+
+
+def get_multivalued_attribute_query() -> str:
+    """Each respondent_dim attribute with respondents that have several values."""
+    return f"""
+        SELECT attribute, COUNT(*) AS respondents
+        FROM (
+            SELECT attribute, respondent_id
+            FROM respondent_attributes
+            WHERE attribute IN ({_get_attribute_list()})
+            GROUP BY respondent_id, attribute
+            HAVING COUNT(*) > 1
+        )
+        GROUP BY attribute
+        ORDER BY attribute
+    """
+
+
+def get_create_respondent_dim_query(
+    schema: str, response_types: dict[str, str], value_type: str, label_type: str
+) -> str:
+    """
+    The source columns keep their declared types so that comparisons against
+    respondent_dim apply the same affinity as against the EAV tables.
+    """
+    attribute_columns = ""
+    for attribute in RESPONDENT_DIM_ATTRIBUTES:
+        attribute_columns += (
+            f",\n            {attribute} {value_type}"
+            f",\n            {attribute}_label {label_type}"
+        )
+
+    return f"""
+        CREATE TABLE {schema}.respondent_dim (
+            respondent_id INTEGER PRIMARY KEY,
+            city_id {response_types.get("city_id", "")},
+            factor_cvnl {response_types.get("factor_cvnl", "")},
+            is_initial_respondent {response_types.get("is_initial_respondent", "")},
+            municipio_amm TEXT,
+            region TEXT,
+            grupo_edad TEXT{attribute_columns}
+        )
+    """
+
+
+def get_insert_respondent_dim_query(schema: str) -> str:
+    amm_list = ", ".join(map(str, AMM_ID))
+    periferia_list = ", ".join(map(str, PERIFERIA_ID))
+    amm_plus_perif = ", ".join(map(str, AMM_ID + PERIFERIA_ID))
+
+    city_case = ""
+    for city_id in AMM_ID:
+        city_name = ID_TO_CITY_NAME[city_id]
+        city_case += f"WHEN r.city_id = {city_id} THEN '{city_name}'\n            "
+
+    attribute_columns = ""
+    pivot_columns = ""
+    for attribute in RESPONDENT_DIM_ATTRIBUTES:
+        attribute_columns += f",\n            p.{attribute},\n            p.{attribute}_label"
+        pivot_columns += f"""
+                MAX(CASE WHEN ra.attribute = '{attribute}' THEN ra.value END) AS {attribute},
+                MAX(CASE WHEN ra.attribute = '{attribute}' THEN oa.option_label END) AS {attribute}_label,"""
+
+    return f"""
+        INSERT INTO {schema}.respondent_dim
+        SELECT
+            r.respondent_id,
+            r.city_id,
+            r.factor_cvnl,
+            r.is_initial_respondent,
+            CASE
+            {city_case}
+            END AS municipio_amm,
+            CASE
+                WHEN r.city_id IN ({amm_list}) THEN 'AMM'
+                WHEN r.city_id IN ({periferia_list}) THEN 'Periferia'
+                WHEN r.city_id NOT IN ({amm_plus_perif}) THEN 'Resto NL'
+            END AS region,
+            NULL AS grupo_edad{attribute_columns}
+        FROM responses r
+        LEFT JOIN (
+            SELECT{pivot_columns}
+                ra.respondent_id
+            FROM respondent_attributes ra
+            LEFT JOIN options oa
+            ON ra.question_id = oa.question_id
+            AND ra.value = oa.option_id
+            WHERE ra.attribute IN ({_get_attribute_list()})
+            GROUP BY ra.respondent_id
+        ) p ON r.respondent_id = p.respondent_id
+    """
+
+
+def get_update_age_group_query(schema: str) -> str:
+    # Runs after the insert so the BETWEEN comparisons use the declared type
+    # of edad_anos, as they did against respondent_attributes.value.
+    return f"""
+        UPDATE {schema}.respondent_dim
+        SET grupo_edad = CASE
+            {get_age_cases("edad_anos")}
+        END
+    """
+
+
+def get_build_inputs() -> dict:
+    """
+    Everything respondent_dim is derived from besides survey.db: the
+    src/metadata.py constants behind municipio_amm, region and grupo_edad,
+    the attributes it pivots and the SQL that builds it.
+    """
+    return {
+        "metadata": {
+            "AMM_ID": AMM_ID,
+            "PERIFERIA_ID": PERIFERIA_ID,
+            "ID_TO_CITY_NAME": ID_TO_CITY_NAME,
+            "AGE_BINS": AGE_BINS,
+            "AGE_LABELS": AGE_LABELS,
+        },
+        "attributes": RESPONDENT_DIM_ATTRIBUTES,
+        "sql": [
+            get_multivalued_attribute_query(),
+            # The column types come from survey.db, covered by its fingerprint.
+            get_create_respondent_dim_query("dim", {}, "", ""),
+            get_insert_respondent_dim_query("dim"),
+            get_update_age_group_query("dim"),
+        ],
+    }
@@ -1,8 +1,16 @@
+import json
+import time
+
+import numpy as np
 import pandas as pd
 
+from src.database import get_database_fingerprint
 from src.metadata import DESIRED_ORDERS
-from src.queries.provisional import DISAGGREGATIONS_MAP
+from src.profiling import profile_stage, record_stage
+from src.queries.provisional import get_disaggregation_query
 from src.queries.questions import (
+    get_answer_domain_query,
+    get_options_query,
     get_question_sections_query,
     get_questions_by_section_query,
 )
@@ -22,6 +30,201 @@ def get_questions_by_section(conn, section: str) -> pd.DataFrame:
     return df
 
 
+def _get_option_keys(option_ids: pd.Series) -> list[int | None]:
+    # read_sql_query returns option ids as float when some are NULL.
+    return [
+        None if pd.isna(option_id) else int(option_id) for option_id in option_ids
+    ]
+
+
+def to_column(values: list, infer_dtype: bool = True) -> pd.Series:
+    # Same dtype read_sql_query infers for the column.
+    column = pd.Series(values, dtype=object)
+    return column.infer_objects() if infer_dtype else column
+
+
+class AnswerDomain:
+    """
+    Report id and label of every raw answer (question_id, option_id and the
+    value as text), and the label of every option, read once per database.
+    The disaggregation queries return raw answers and label_answers
+    decorates them in pandas, with the same COALESCE the queries used to
+    apply joining options.
+    """
+
+    def __init__(self, conn):
+        self.answers = {
+            (question_id, option_id, value): (answer_id, label)
+            for question_id, option_id, value, answer_id, label in conn.execute(
+                get_answer_domain_query()
+            )
+        }
+        self.options = {
+            (question_id, option_id): label
+            for question_id, option_id, label in conn.execute(get_options_query())
+        }
+
+    def label_answers(
+        self,
+        df_long: pd.DataFrame,
+        question_id: str | None = None,
+        infer_dtypes: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Replaces option_id and value by id_respuesta and Respuesta, and
+        grupo_question_id and grupo_option_id, when present, by the option
+        label as grupo. question_id is needed unless df_long has the column.
+        Without infer_dtypes the new columns are left as object.
+        """
+        if "option_id" not in df_long.columns:
+            return df_long
+
+        if "question_id" in df_long.columns:
+            question_ids = df_long["question_id"].tolist()
+        else:
+            question_ids = [question_id] * len(df_long)
+
+        keys = zip(
+            question_ids,
+            _get_option_keys(df_long["option_id"]),
+            df_long["value"].tolist(),
+        )
+        answers = [self.answers.get(key, (None, None)) for key in keys]
+
+        columns = {}
+        for column in df_long.columns:
+            if column == "option_id":
+                answer_ids, labels = zip(*answers) if answers else ((), ())
+                columns["id_respuesta"] = to_column(list(answer_ids), infer_dtypes)
+                columns["Respuesta"] = to_column(list(labels), infer_dtypes)
+            elif column == "grupo_question_id":
+                keys = zip(
+                    df_long["grupo_question_id"].tolist(),
+                    _get_option_keys(df_long["grupo_option_id"]),
+                )
+                columns["grupo"] = to_column(
+                    [self.options.get(key) for key in keys], infer_dtypes
+                )
+            elif column not in ("value", "grupo_option_id"):
+                columns[column] = df_long[column].reset_index(drop=True)
+
+        return pd.DataFrame(columns)
+
+
+_ANSWER_DOMAINS: dict[str, AnswerDomain] = {}
+
+
+def get_answer_domain(conn) -> AnswerDomain:
+    fingerprint = get_database_fingerprint(conn)
+    if fingerprint not in _ANSWER_DOMAINS:
+        _ANSWER_DOMAINS[fingerprint] = AnswerDomain(conn)
+    return _ANSWER_DOMAINS[fingerprint]
+
+
+def get_desired_order(disaggregation: str) -> list[str] | None:
+    if "municipio" in disaggregation:
+        return DESIRED_ORDERS.get("municipio")
+    if disaggregation == "nivel_max_estudios" or disaggregation.startswith("nivel_actual_estudios"):
+        return DESIRED_ORDERS.get("estudios")
+    if disaggregation == "ingreso":
+        return DESIRED_ORDERS.get("ingreso")
+    if disaggregation == "edad":
+        return DESIRED_ORDERS.get("edad")
+    if disaggregation == "tipo_escuela":
+        return DESIRED_ORDERS.get("tipo_escuela")
+    if disaggregation == "sexo":
+        return DESIRED_ORDERS.get("sexo")
+    if disaggregation.startswith("tipo_trabajo"):
+        return DESIRED_ORDERS.get("tipo_trabajo")
+    return None
+
+
+def _get_group_codes(groups: np.ndarray, disaggregation: str) -> tuple[np.ndarray, list]:
+    """
+    Column of each row and the ordered group columns. Missing groups, and
+    groups outside the disaggregation's DESIRED_ORDERS entry, get -1.
+    """
+    desired_order = get_desired_order(disaggregation)
+
+    if not desired_order:
+        codes, group_cols = pd.factorize(groups, sort=True)
+        return codes, list(group_cols)
+
+    codes, uniques = pd.factorize(groups)
+    positions = {group: i for i, group in enumerate(desired_order)}
+    unique_positions = np.array([positions.get(group, -1) for group in uniques] + [-1])
+    codes = unique_positions[codes]
+
+    present = np.unique(codes[codes >= 0])
+    remap = np.full(len(desired_order) + 1, -1)
+    remap[present] = np.arange(len(present))
+
+    return remap[codes], [desired_order[code] for code in present]
+
+
+def pivot_disaggregation_report(
+    df_long: pd.DataFrame,
+    disaggregation: str,
+) -> pd.DataFrame:
+    """
+    One row per (id_respuesta, Respuesta), sorted, and one column per group
+    in DESIRED_ORDERS order, summing valor into a preallocated matrix. Same
+    table as pivot_table(aggfunc="sum", fill_value=0) with its group columns
+    ordered and filtered as _get_group_codes does.
+    """
+    if df_long.empty:
+        return df_long
+
+    answer_ids = df_long["id_respuesta"]
+    if answer_ids.dtype == object:
+        # Batched answers are labelled without inferring dtypes; the ids of
+        # one question take the dtype a query of that question returns.
+        answer_ids = answer_ids.infer_objects()
+    id_codes, ids = pd.factorize(answer_ids.to_numpy(), sort=True)
+    label_codes, labels = pd.factorize(df_long["Respuesta"].to_numpy(), sort=True)
+    col_codes, group_cols = _get_group_codes(df_long["grupo"].to_numpy(), disaggregation)
+
+    # pivot_table leaves out rows with a missing key (code -1), but keeps the
+    # answer rows whose only groups are not shown.
+    valid = (id_codes >= 0) & (label_codes >= 0) & (df_long["grupo"].notna().to_numpy())
+    pairs, row_codes = np.unique(
+        id_codes[valid] * len(labels) + label_codes[valid], return_inverse=True
+    )
+
+    values = df_long["valor"].to_numpy()[valid]
+    col_codes = col_codes[valid]
+    in_columns = col_codes >= 0
+    cells = row_codes[in_columns] * len(group_cols) + col_codes[in_columns]
+    matrix = np.bincount(
+        cells,
+        weights=np.nan_to_num(values[in_columns]),
+        minlength=len(pairs) * len(group_cols),
+    )
+    matrix = matrix.reshape(len(pairs), len(group_cols)).astype(values.dtype)
+
+    columns = {
+        "id_respuesta": ids[pairs // len(labels)],
+        "Respuesta": labels[pairs % len(labels)],
+    }
+    for j, group in enumerate(group_cols):
+        columns[group] = matrix[:, j]
+
+    return pd.DataFrame(columns)
+
+
+def _read_labeled_answers(
+    conn, sql: str, params: dict, keys: dict, infer_dtypes: bool = True
+) -> pd.DataFrame:
+    """Runs a disaggregation query and labels its answers, timed as "sql"."""
+    start = time.perf_counter()
+    df_long = pd.read_sql_query(sql, conn, params=params)
+    df_long = get_answer_domain(conn).label_answers(
+        df_long, params.get("question_id"), infer_dtypes
+    )
+    record_stage("sql", time.perf_counter() - start, len(df_long), **keys)
+    return df_long
+
+
 def build_disaggregation_report(
     conn,
     question_id: str,
@@ -29,50 +232,148 @@ def build_disaggregation_report(
     initial_only: bool = True,
 ) -> pd.DataFrame:
 
-    sql_function = DISAGGREGATIONS_MAP.get(disaggregation)
+    sql, params = get_disaggregation_query(disaggregation, initial_only)
 
-    if not sql_function:
-        raise ValueError(f"Disaggregation '{disaggregation}' is not supported.")
+    keys = {"question_id": question_id, "disaggregation": disaggregation}
+    params = {**params, "question_id": question_id}
+    df_long = _read_labeled_answers(conn, sql, params, keys)
 
-    sql = sql_function(initial_only)
+    with profile_stage("pivot", **keys):
+        return pivot_disaggregation_report(df_long, disaggregation)
 
-    params = {"question_id": question_id}
-    df_long = pd.read_sql_query(sql, conn, params=params)
 
-    if df_long.empty:
-        return df_long
+def build_disaggregation_report_pair(
+    conn,
+    question_id: str,
+    disaggregation: str,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Weighted (initial_only=True) and unweighted (initial_only=False) tables
+    of a question from a single query.
 
-    df_pivot = df_long.pivot_table(
-        index=["id_respuesta", "Respuesta"],
-        columns="grupo",
-        values="valor",
-        aggfunc="sum",
-        fill_value=0,
-    ).reset_index()
+    As for build_disaggregation_reports, the labels are left as object
+    columns so that each table infers its id dtype from its own answers,
+    and a table without rows has the object columns of a query that
+    returned none.
+    """
+    sql, params = get_disaggregation_query(disaggregation, None)
 
+    keys = {"question_id": question_id, "disaggregation": disaggregation}
+    params = {**params, "question_id": question_id}
+    df_long = _read_labeled_answers(conn, sql, params, keys, infer_dtypes=False)
+
+    pivot_start = time.perf_counter()
     fixed_cols = ["id_respuesta", "Respuesta"]
-    group_cols = [c for c in df_pivot.columns if c not in fixed_cols]
+    sin_factor_group = (
+        "grupo_sin_factor" if "grupo_sin_factor" in df_long.columns else "grupo"
+    )
 
-    desired_order = None
+    df_weighted = df_long.loc[
+        df_long["n_iniciales"] > 0, fixed_cols + ["grupo", "valor"]
+    ].reset_index(drop=True)
+    df_unweighted = df_long[fixed_cols + [sin_factor_group, "valor_sin_factor"]]
+    df_unweighted.columns = fixed_cols + ["grupo", "valor"]
 
-    if "municipio" in disaggregation:
-        desired_order = DESIRED_ORDERS.get("municipio")
-    elif disaggregation == "nivel_max_estudios" or disaggregation.startswith("nivel_actual_estudios"):
-        desired_order = DESIRED_ORDERS.get("estudios")
-    elif disaggregation == "ingreso":
-        desired_order = DESIRED_ORDERS.get("ingreso")
-    elif disaggregation == "edad":
-        desired_order = DESIRED_ORDERS.get("edad")
-    elif disaggregation == "tipo_escuela":
-        desired_order = DESIRED_ORDERS.get("tipo_escuela")
-    elif disaggregation == "sexo":
-        desired_order = DESIRED_ORDERS.get("sexo")
-    elif disaggregation.startswith("tipo_trabajo"):
-        desired_order = DESIRED_ORDERS.get("tipo_trabajo")
-    
-    if desired_order:
-        group_cols = [col for col in desired_order if col in group_cols]
-
-    df_pivot = df_pivot[fixed_cols + group_cols]
-
-    return df_pivot
+    reports = tuple(
+        pivot_disaggregation_report(df, disaggregation)
+        if not df.empty
+        else df.astype(object)
+        for df in (df_weighted, df_unweighted)
+    )
+    record_stage("pivot", time.perf_counter() - pivot_start, **keys)
+    return reports
+
+
+def build_disaggregation_reports(
+    conn,
+    question_ids: list[str],
+    disaggregation: str,
+    initial_only: bool = True,
+) -> dict[str, pd.DataFrame]:
+    """
+    Same tables as build_disaggregation_report for several questions, running
+    the disaggregation query once and splitting the result by question_id.
+
+    The labels are left as object columns, so that pivoting infers each
+    question's id dtype from its own answers: one question with a float or
+    missing id would otherwise turn every other question's ids into floats.
+    """
+    sql, params = get_disaggregation_query(disaggregation, initial_only, batched=True)
+
+    params = {**params, "question_ids": json.dumps(list(question_ids))}
+    df_batch = _read_labeled_answers(
+        conn, sql, params, {"disaggregation": disaggregation}, infer_dtypes=False
+    )
+
+    reports = {}
+    for question_id, df_long in df_batch.groupby("question_id", sort=False):
+        df_long = df_long.drop(columns="question_id").reset_index(drop=True)
+        with profile_stage(
+            "pivot", question_id=question_id, disaggregation=disaggregation
+        ):
+            reports[question_id] = pivot_disaggregation_report(
+                df_long, disaggregation
+            )
+
+    empty = df_batch.drop(columns="question_id").iloc[0:0].infer_objects()
+    for question_id in question_ids:
+        if question_id not in reports:
+            reports[question_id] = empty.copy()
+
+    return reports
+
+
+def sum_by_code(
+    values: np.ndarray, codes: np.ndarray, present: np.ndarray, n_groups: int
+) -> np.ndarray:
+    """Sum per group like SQL's SUM: NULL for the groups with no value."""
+    values = values.astype(float)
+    missing = np.isnan(values)
+    sums = np.bincount(codes, weights=np.where(missing, 0, values), minlength=n_groups)
+    counts = np.bincount(codes[~missing], minlength=n_groups)
+    # bincount of no codes is integer even with weights.
+    sums = sums[present].astype(float)
+    sums[counts[present] == 0] = np.nan
+    return sums
+
+
+class BatchedReports:
+    """
+    Serves build_disaggregation_report from batched queries.
+
+    `requests` maps (disaggregation, initial_only) to the questions that will
+    ask for it; the first request of a pair runs one query for all of them.
+    """
+
+    def __init__(self, conn, requests: dict[tuple[str, bool], list[str]]):
+        self.conn = conn
+        self.requests = requests
+        self.reports: dict[tuple[str, bool], dict[str, pd.DataFrame]] = {}
+
+    def build_disaggregation_report(
+        self,
+        question_id: str,
+        disaggregation: str,
+        initial_only: bool = True,
+    ) -> pd.DataFrame:
+        key = (disaggregation, initial_only)
+        question_ids = self.requests.get(key, [])
+
+        if question_id not in question_ids:
+            return build_disaggregation_report(
+                self.conn, question_id, disaggregation, initial_only
+            )
+
+        if key not in self.reports:
+            self.reports[key] = build_disaggregation_reports(
+                self.conn, question_ids, disaggregation, initial_only
+            )
+
+        reports = self.reports[key]
+        if question_id not in reports:
+            # Already served once; the batch entry is released after use.
+            return build_disaggregation_report(
+                self.conn, question_id, disaggregation, initial_only
+            )
+
+        return reports.pop(question_id)
@@ -0,0 +1,22 @@
+import pytest
+
+from benchmarks.synthetic_db import generate_database
+from src.database import get_connection
+
+# Small enough to build in a fraction of a second, large enough for every
+# disaggregation group to have answers.
+N_RESPONDENTS = 2000
+
+
+@pytest.fixture(scope="session")
+def survey_db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("db") / "survey.db"
+    generate_database(path, N_RESPONDENTS)
+    return path
+
+
+@pytest.fixture(scope="session")
+def conn(survey_db):
+    conn = get_connection(db_path=survey_db)
+    yield conn
+    conn.close()
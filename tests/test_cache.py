@@ -0,0 +1,92 @@
+import sqlite3
+
+import pandas as pd
+
+from src import metadata
+from src.builder import get_disaggregation_requests
+from src.cache import CachedReports, ReportCache
+from src.repository import build_disaggregation_report
+
+
+class CountingEngine:
+    def __init__(self, conn):
+        self.conn = conn
+        self.calls = 0
+
+    def build_disaggregation_report(self, question_id, disaggregation, initial_only):
+        self.calls += 1
+        return build_disaggregation_report(
+            self.conn, question_id, disaggregation, initial_only
+        )
+
+
+def test_tables_are_cached_per_engine(conn, tmp_path):
+    (disaggregation, initial_only), question_ids = next(
+        iter(get_disaggregation_requests().items())
+    )
+    request = (question_ids[0], disaggregation, initial_only)
+    cache = ReportCache(tmp_path / "report_cache.db")
+    try:
+        engines = {}
+        for engine_name in ["sql", "matriz", "sql"]:
+            engine = engines.setdefault(engine_name, CountingEngine(conn))
+            cached = CachedReports(conn, cache, engine, engine_name=engine_name)
+            pd.testing.assert_frame_equal(
+                cached.build_disaggregation_report(*request),
+                build_disaggregation_report(conn, *request),
+            )
+    finally:
+        cache.close()
+
+    # Computed once per engine, the second sql run read it from the cache.
+    assert {name: engine.calls for name, engine in engines.items()} == {
+        "sql": 1,
+        "matriz": 1,
+    }
+
+
+def _get_sizes(path) -> dict[str, tuple[int, int]]:
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT key, size, last_used FROM report_cache")
+        return {key: (size, last_used) for key, size, last_used in rows}
+
+
+def test_hits_are_written_on_close_and_evict_the_least_recent(tmp_path):
+    path = tmp_path / "report_cache.db"
+    tables = {
+        "a": pd.DataFrame({"valor": range(10)}),
+        "b": pd.DataFrame({"valor": range(20)}),
+        # Same blob size as b.
+        "c": pd.DataFrame({"valor": range(20)}),
+    }
+
+    cache = ReportCache(path)
+    cache.put("a", tables["a"])
+    cache.put("b", tables["b"])
+    pd.testing.assert_frame_equal(cache.get("a"), tables["a"])
+    stored = _get_sizes(path)
+    assert stored["a"][1] < stored["b"][1]
+    cache.close()
+    assert _get_sizes(path)["a"][1] > stored["b"][1]
+
+    # Room for every entry but b, the least recently used one.
+    cache = ReportCache(path, max_bytes=sum(size for size, _ in stored.values()))
+    try:
+        cache.put("c", tables["c"])
+        assert set(_get_sizes(path)) == {"a", "c"}
+        assert cache.total_bytes == sum(size for size, _ in _get_sizes(path).values())
+    finally:
+        cache.close()
+
+
+def test_keys_change_with_the_metadata(conn, tmp_path, monkeypatch):
+    request = ("cp1", "sexo", True)
+    cache = ReportCache(tmp_path / "report_cache.db")
+    try:
+        key = CachedReports(conn, cache).get_key(*request)
+        assert CachedReports(conn, cache).get_key(*request) == key
+
+        monkeypatch.setattr(metadata, "AMM_ID", metadata.AMM_ID[:-1])
+        assert CachedReports(conn, cache).get_key(*request) != key
+    finally:
+        cache.close()
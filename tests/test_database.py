@@ -0,0 +1,138 @@
+import shutil
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from src.builder import get_disaggregation_requests
+from src.queries import respondent_dim
+from src.database import (
+    INDEX_STATEMENTS,
+    copy_to_memory,
+    find_full_scans,
+    get_connection,
+    get_database_fingerprint,
+    get_respondent_dim_path,
+    prepare_database,
+)
+from src.repository import build_disaggregation_report
+
+
+def _get_schemas(conn) -> list[str]:
+    return [name for _, name, _ in conn.execute("PRAGMA database_list")]
+
+
+def test_connection_without_respondent_dim_does_not_build_it(survey_db, tmp_path):
+    db_path = tmp_path / "survey.db"
+    shutil.copy(survey_db, db_path)
+
+    conn = get_connection(db_path=db_path, respondent_dim=False)
+    try:
+        assert "dim" not in _get_schemas(conn)
+    finally:
+        conn.close()
+    assert not get_respondent_dim_path(db_path).exists()
+
+
+def _get_age_groups(conn) -> set:
+    rows = conn.execute("SELECT DISTINCT grupo_edad FROM respondent_dim")
+    return {grupo_edad for (grupo_edad,) in rows}
+
+
+def test_respondent_dim_is_rebuilt_when_its_build_changes(
+    survey_db, tmp_path, monkeypatch
+):
+    db_path = tmp_path / "survey.db"
+    shutil.copy(survey_db, db_path)
+
+    conn = get_connection(db_path=db_path)
+    age_groups = _get_age_groups(conn)
+    conn.close()
+    oldest = respondent_dim.AGE_LABELS[-1]
+    assert oldest in age_groups
+
+    # Same survey.db, another label for the oldest age group.
+    labels = respondent_dim.AGE_LABELS[:-1] + ["Adultos mayores"]
+    monkeypatch.setattr(respondent_dim, "AGE_LABELS", labels)
+    conn = get_connection(db_path=db_path)
+    try:
+        assert _get_age_groups(conn) == age_groups - {oldest} | {"Adultos mayores"}
+    finally:
+        conn.close()
+
+
+def test_multivalued_attribute_is_a_warning(survey_db, tmp_path):
+    db_path = tmp_path / "survey.db"
+    shutil.copy(survey_db, db_path)
+    with sqlite3.connect(db_path) as source:
+        respondent_id, question_id, value = source.execute(
+            "SELECT respondent_id, question_id, value FROM respondent_attributes "
+            "WHERE attribute = 'sexo' LIMIT 1"
+        ).fetchone()
+        source.execute(
+            "INSERT INTO respondent_attributes VALUES (?, 'sexo', ?, ?)",
+            (respondent_id, question_id, f"{value} (duplicado)"),
+        )
+    source.close()
+
+    with pytest.warns(UserWarning, match="'sexo'"):
+        conn = get_connection(db_path=db_path)
+    try:
+        assert "dim" in _get_schemas(conn)
+        (n_respondents,) = conn.execute(
+            "SELECT COUNT(*) FROM respondent_dim WHERE respondent_id = ?",
+            (respondent_id,),
+        ).fetchone()
+        assert n_respondents == 1
+    finally:
+        conn.close()
+
+
+def test_prepared_database_has_no_full_scans(survey_db, tmp_path):
+    db_path = tmp_path / "survey.db"
+    shutil.copy(survey_db, db_path)
+
+    conn = get_connection(db_path=db_path)
+    try:
+        assert find_full_scans(conn)
+        prepare_database(conn)
+        indexes = {
+            name
+            for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            )
+        }
+        assert len(indexes) == len(INDEX_STATEMENTS)
+        assert find_full_scans(conn) == []
+    finally:
+        conn.close()
+
+
+def test_in_memory_copy_serves_the_same_reports(conn):
+    memory_conn = copy_to_memory(conn)
+    try:
+        assert "dim" in _get_schemas(memory_conn)
+        for query in [
+            "SELECT type, name, sql FROM dim.sqlite_master ORDER BY name",
+            "SELECT * FROM respondent_dim ORDER BY respondent_id",
+        ]:
+            assert (
+                memory_conn.execute(query).fetchall() == conn.execute(query).fetchall()
+            )
+        assert get_database_fingerprint(memory_conn) == get_database_fingerprint(conn)
+        with pytest.raises(sqlite3.OperationalError):
+            memory_conn.execute("DELETE FROM answers")
+
+        (disaggregation, initial_only), question_ids = next(
+            iter(get_disaggregation_requests().items())
+        )
+        pd.testing.assert_frame_equal(
+            build_disaggregation_report(
+                memory_conn, question_ids[0], disaggregation, initial_only
+            ),
+            build_disaggregation_report(
+                conn, question_ids[0], disaggregation, initial_only
+            ),
+        )
+    finally:
+        memory_conn.close()
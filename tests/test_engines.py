@@ -0,0 +1,120 @@
+"""
+Every engine must return the same frames as build_disaggregation_report,
+one query per question, down to the dtypes: the tables, the cache keys and
+the Parquet ids are all derived from them.
+"""
+
+import pandas as pd
+import pytest
+
+from src.builder import get_disaggregation_requests
+from src.cube import QuestionCubes
+from src.matrix import RespondentMatrix
+from src.queries.provisional import DISAGGREGATIONS_MAP, Disaggregation
+from src.repository import (
+    build_disaggregation_report,
+    build_disaggregation_report_pair,
+    build_disaggregation_reports,
+)
+
+
+@pytest.fixture(scope="module")
+def expected_reports(conn) -> dict[tuple[str, str, bool], pd.DataFrame]:
+    return {
+        (question_id, disaggregation, initial_only): build_disaggregation_report(
+            conn, question_id, disaggregation, initial_only
+        )
+        for (disaggregation, initial_only), question_ids in (
+            get_disaggregation_requests().items()
+        )
+        for question_id in question_ids
+    }
+
+
+def _get_mismatches(expected_reports, get_reports) -> list[str]:
+    mismatches = []
+    for (disaggregation, initial_only), question_ids in (
+        get_disaggregation_requests().items()
+    ):
+        reports = get_reports(question_ids, disaggregation, initial_only)
+        for question_id in question_ids:
+            expected = expected_reports[(question_id, disaggregation, initial_only)]
+            try:
+                pd.testing.assert_frame_equal(reports[question_id], expected)
+            except AssertionError as error:
+                first_line = str(error).splitlines()[0]
+                mismatches.append(
+                    f"{question_id} {disaggregation} {initial_only}: {first_line}"
+                )
+    return mismatches
+
+
+def test_batched_reports_match_per_question_reports(conn, expected_reports):
+    def get_reports(question_ids, disaggregation, initial_only):
+        return build_disaggregation_reports(
+            conn, question_ids, disaggregation, initial_only
+        )
+
+    assert _get_mismatches(expected_reports, get_reports) == []
+
+
+def test_report_pairs_match_per_question_reports(conn, expected_reports):
+    def get_reports(question_ids, disaggregation, initial_only):
+        return {
+            question_id: build_disaggregation_report_pair(
+                conn, question_id, disaggregation
+            )[0 if initial_only else 1]
+            for question_id in question_ids
+        }
+
+    assert _get_mismatches(expected_reports, get_reports) == []
+
+
+def test_respondent_matrix_matches_per_question_reports(conn, expected_reports):
+    matrix = RespondentMatrix.from_connection(conn)
+
+    def get_reports(question_ids, disaggregation, initial_only):
+        return {
+            question_id: matrix.build_disaggregation_report(
+                question_id, disaggregation, initial_only
+            )
+            for question_id in question_ids
+        }
+
+    assert _get_mismatches(expected_reports, get_reports) == []
+
+
+def test_question_cubes_match_per_question_reports(conn, expected_reports):
+    cubes = QuestionCubes(conn)
+
+    def get_reports(question_ids, disaggregation, initial_only):
+        return {
+            question_id: cubes.build_disaggregation_report(
+                question_id, disaggregation, initial_only
+            )
+            for question_id in question_ids
+        }
+
+    assert _get_mismatches(expected_reports, get_reports) == []
+    # Each question's cube was built once and sliced for its other tables.
+    assert cubes.cache.hits > cubes.cache.misses > 0
+
+
+def test_respondent_matrix_serves_new_specs(conn, monkeypatch):
+    # Every engine reads the specs, so a new entry needs no engine changes.
+    spec = Disaggregation(
+        group="tipo_escuela", filters={"sexo": [1], "region": ["AMM"]}
+    )
+    monkeypatch.setitem(DISAGGREGATIONS_MAP, "tipo_escuela_por_mujeres_amm", spec)
+    matrix = RespondentMatrix.from_connection(conn)
+
+    question_id = next(iter(get_disaggregation_requests().values()))[0]
+    for initial_only in (True, False):
+        pd.testing.assert_frame_equal(
+            matrix.build_disaggregation_report(
+                question_id, "tipo_escuela_por_mujeres_amm", initial_only
+            ),
+            build_disaggregation_report(
+                conn, question_id, "tipo_escuela_por_mujeres_amm", initial_only
+            ),
+        )
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.utils.exceptions import IllegalCharacterError
+
+from src import excel
+from src.excel import (
+    BufferedExcelWriter,
+    ExcelContext,
+    RowWriter,
+    StreamingExcelWriter,
+    build_report_tables,
+    open_excel_writer,
+    write_table_to_excel,
+    write_text_to_excel,
+)
+
+SHEET_NAME = "salud"
+
+
+def _get_tables() -> tuple[pd.DataFrame, pd.DataFrame]:
+    report = pd.DataFrame(
+        {
+            "id_respuesta": [1, 2, 9999],
+            "Respuesta": ["Sí", "  No ", "No sabe"],
+            "Hombre": [10.5, 0.0, np.nan],
+            "Mujer": [3.0, 7.25, 1.0],
+        }
+    )
+    return build_report_tables(report, weighted_average=True)
+
+
+def _write_report(path, buffered: bool) -> None:
+    df, relative_df = _get_tables()
+    writer = open_excel_writer(path, buffered=buffered)
+    with writer:
+        ctx = ExcelContext(writer, SHEET_NAME)
+        write_text_to_excel(ctx, "Nota de la pregunta", is_hdr=True)
+        write_text_to_excel(ctx, "cp1 - ¿Pregunta?", is_hdr=True)
+        write_text_to_excel(ctx, "Sexo")
+        write_table_to_excel(ctx, df)
+        write_table_to_excel(ctx, relative_df, is_rel=True)
+
+
+def _get_cells(path) -> dict:
+    ws = load_workbook(path)[SHEET_NAME]
+    return {
+        cell.coordinate: (
+            cell.value,
+            cell.font.b,
+            cell.font.color.rgb if cell.font.color is not None else None,
+            cell.alignment.horizontal,
+            tuple(
+                getattr(getattr(cell.border, side), "style", None)
+                for side in ("left", "right", "top", "bottom")
+            ),
+            cell.number_format,
+        )
+        for row in ws.iter_rows()
+        for cell in row
+        if cell.value is not None or cell.has_style
+    }
+
+
+def test_buffered_writer_matches_excel_writer(tmp_path):
+    buffered_path = tmp_path / "buffered.xlsx"
+    reference_path = tmp_path / "reference.xlsx"
+    _write_report(buffered_path, buffered=True)
+    _write_report(reference_path, buffered=False)
+
+    cells = _get_cells(buffered_path)
+    assert cells == _get_cells(reference_path)
+    assert cells["A1"][:3] == ("Nota de la pregunta", True, "007E33C3")
+    assert cells["A5"][:2] == ("Sexo", True)
+    assert cells["C8"][0] == 10.5
+    assert cells["C8"][-1] == "0"
+    assert cells["C8"][4] == (None, None, None, None)
+    assert "0.0%" in {cell[-1] for cell in cells.values()}
+
+
+def test_falls_back_to_excel_writer(tmp_path, monkeypatch):
+    assert isinstance(open_excel_writer(tmp_path / "a.xlsx"), BufferedExcelWriter)
+    assert isinstance(
+        open_excel_writer(tmp_path / "b.xlsx", streaming=True), StreamingExcelWriter
+    )
+
+    monkeypatch.setattr(excel, "can_assemble_sheets", lambda: False)
+    assert isinstance(open_excel_writer(tmp_path / "c.xlsx"), pd.ExcelWriter)
+    _write_report(tmp_path / "d.xlsx", buffered=True)
+    _write_report(tmp_path / "reference.xlsx", buffered=False)
+    assert _get_cells(tmp_path / "d.xlsx") == _get_cells(tmp_path / "reference.xlsx")
+
+
+def test_row_writer_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        RowWriter(tmp_path / "a.xlsx", Workbook())
+
+
+@pytest.mark.parametrize("buffered", [True, False])
+def test_written_values_reload(tmp_path, buffered):
+    path = tmp_path / "report.xlsx"
+    _write_report(path, buffered)
+    ws = load_workbook(path)[SHEET_NAME]
+    header = [cell.value for cell in ws[7]]
+    assert header == ["id_respuesta", "Respuesta", "Hombre", "Mujer", "Total"]
+    assert ws["B9"].value == "  No "
+
+
+# Every kind of cell _get_cell_xml writes.
+EDGE_VALUES = ["=1+1", "#N/A", "", " a ", "x" * 40000, True, 3, 0.1, 12345678901234567]
+
+
+def test_assembled_sheet_xml_matches_openpyxl(tmp_path):
+    path = tmp_path / "buffered.xlsx"
+    with BufferedExcelWriter(path) as writer:
+        styles = [StyleArray()] * len(EDGE_VALUES)
+        writer.append_row(SHEET_NAME, 2, EDGE_VALUES, styles)
+        writer.append_row(SHEET_NAME, 4, EDGE_VALUES[:2], styles)
+
+    reference_path = tmp_path / "reference.xlsx"
+    book = Workbook()
+    book.active.title = SHEET_NAME
+    book.active.append([])
+    book.active.append(EDGE_VALUES)
+    book.active.append([])
+    book.active.append(EDGE_VALUES[:2])
+    book.save(reference_path)
+
+    def get_cells(path):
+        ws = load_workbook(path)[SHEET_NAME]
+        return ws.dimensions, [
+            [(cell.value, cell.data_type) for cell in row] for row in ws.iter_rows()
+        ]
+
+    assert get_cells(path) == get_cells(reference_path)
+
+    with BufferedExcelWriter(tmp_path / "illegal.xlsx") as writer:
+        with pytest.raises(IllegalCharacterError):
+            writer.append_row(SHEET_NAME, 1, ["a\x01"], [StyleArray()])
@@ -0,0 +1,54 @@
+from src.builder import (
+    get_manifest_entry,
+    get_section_fingerprint,
+    is_section_up_to_date,
+    read_manifest,
+    write_manifest,
+)
+from src.repository import get_question_sections
+
+OPTIONS = {"escritor": "openpyxl", "parquet": True, "sin_factor_combinado": False}
+
+
+def _write_files(output_dir, entry: dict) -> None:
+    for path in entry["files"]:
+        path = output_dir / path
+        if path.suffix == ".xlsx":
+            path.write_bytes(b"")
+        else:
+            path.mkdir(parents=True)
+
+
+def test_section_rebuilds_on_changed_options_or_missing_files(conn, tmp_path):
+    section = get_question_sections(conn)[0]
+    parquet_dir = tmp_path / "tabulados_parquet"
+    entry = get_manifest_entry(conn, section, OPTIONS, parquet_dir, tmp_path)
+    assert entry["files"][0] == f"{section}.xlsx"
+    assert entry["files"][-1] == f"tabulados_parquet/seccion={section}"
+
+    _write_files(tmp_path, entry)
+    write_manifest({section: entry}, tmp_path)
+    manifest = read_manifest(tmp_path)
+    assert is_section_up_to_date(section, entry, manifest, tmp_path)
+
+    for option, value in [
+        ("escritor", "flujo"),
+        ("parquet", False),
+        ("sin_factor_combinado", True),
+    ]:
+        changed = get_manifest_entry(
+            conn, section, {**OPTIONS, option: value}, parquet_dir, tmp_path
+        )
+        assert not is_section_up_to_date(section, changed, manifest, tmp_path)
+
+    (parquet_dir / f"seccion={section}").rmdir()
+    assert not is_section_up_to_date(section, entry, manifest, tmp_path)
+
+
+def test_fingerprint_only_entries_are_stale(conn, tmp_path):
+    section = get_question_sections(conn)[0]
+    entry = get_manifest_entry(conn, section, OPTIONS, output_dir=tmp_path)
+    _write_files(tmp_path, entry)
+
+    manifest = {section: get_section_fingerprint(conn, section)}
+    assert not is_section_up_to_date(section, entry, manifest, tmp_path)
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from src.parquet import _get_table_columns
+
+
+def test_ids_are_written_without_decimals_or_nan():
+    df = pd.DataFrame(
+        {
+            "id_respuesta": pd.Series([1.0, 2.5, np.nan, "Total"], dtype=object),
+            "Respuesta": ["Sí", "Media", "No sabe", "Total"],
+            "Hombre": [1.0, 2.0, 3.0, 6.0],
+        }
+    )
+    columns = _get_table_columns(df, weighted=True, relative=False)
+    assert columns["id_respuesta"].tolist() == ["1", "2.5", None, "Total"]
+
+    float_ids = df.iloc[:3].astype({"id_respuesta": float})
+    columns = _get_table_columns(float_ids, weighted=True, relative=False)
+    assert columns["id_respuesta"].tolist() == ["1", "2.5", None]
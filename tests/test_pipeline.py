@@ -0,0 +1,62 @@
+import pandas as pd
+
+from src.builder import (
+    SECTION_REPORT_DESC,
+    _build_table_sets_in_order,
+    _iter_questions,
+    build_section_report,
+)
+from src.pipeline import ReportPipeline
+from src.repository import get_question_sections
+
+N_QUESTIONS = 6
+
+
+def _assert_table_sets_equal(actual: tuple | None, expected: tuple | None) -> None:
+    if expected is None:
+        assert actual is None
+        return
+
+    notes, title, tables = actual
+    assert (notes, title) == expected[:2]
+    assert len(tables) == len(expected[2])
+    for table, expected_table in zip(tables, expected[2]):
+        assert table[:2] == expected_table[:2]
+        pd.testing.assert_frame_equal(table[2], expected_table[2])
+        pd.testing.assert_frame_equal(table[3], expected_table[3])
+
+
+def test_pipeline_builds_the_same_tables_in_order(conn, survey_db):
+    section = get_question_sections(conn)[0]
+    questions = list(_iter_questions(conn, [section], SECTION_REPORT_DESC))
+    questions = questions[:N_QUESTIONS]
+
+    pipeline = ReportPipeline(threads=2, combined_sin_factor=True, db_path=survey_db)
+    try:
+        actual = list(pipeline.build_table_sets(questions))
+    finally:
+        pipeline.close()
+    expected = list(
+        _build_table_sets_in_order(conn, questions, combined_sin_factor=True)
+    )
+
+    assert [item[1]["id"] for item in actual] == [item[1]["id"] for item in expected]
+    for item, expected_item in zip(actual, expected):
+        _assert_table_sets_equal(item[2], expected_item[2])
+        _assert_table_sets_equal(item[3], expected_item[3])
+    assert pipeline.pool.stats.connections_opened <= 2
+    assert pipeline.pool.stats.in_use == 0
+
+
+def test_pipeline_writes_the_section_report(conn, survey_db, tmp_path):
+    section = get_question_sections(conn)[0]
+
+    pipeline = ReportPipeline(threads=2, db_path=survey_db)
+    try:
+        build_section_report(conn, section, pipeline=pipeline, output_dir=tmp_path)
+    finally:
+        pipeline.close()
+
+    assert (tmp_path / f"{section}.xlsx").exists()
+    assert pipeline.stats.wall_seconds > 0
+    assert pipeline.stats.queue_depths
@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+from src.pool import ConnectionPool
+
+
+def _count_answers(conn) -> int:
+    return conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+def test_pool_lends_at_most_size_connections(conn, survey_db):
+    expected = _count_answers(conn)
+    pool = ConnectionPool(2, survey_db)
+    counts = []
+
+    def query() -> None:
+        for _ in range(5):
+            with pool.connection() as pooled:
+                counts.append(_count_answers(pooled))
+
+    threads = [threading.Thread(target=query) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+
+    assert counts == [expected] * 20
+    assert pool.stats.acquisitions == 20
+    assert pool.stats.connections_opened <= 2
+    assert pool.stats.max_in_use <= 2
+    assert pool.stats.in_use == 0
+
+
+def test_pool_does_not_close_lent_connections(conn, survey_db):
+    pool = ConnectionPool(2, survey_db)
+    with pool.connection() as pooled:
+        with pytest.raises(RuntimeError, match="still lent"):
+            pool.close()
+        assert _count_answers(pooled) == _count_answers(conn)
+    pool.close()
+
+    with pytest.raises(RuntimeError, match="closed"):
+        with pool.connection():
+            pass
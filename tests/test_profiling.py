@@ -0,0 +1,41 @@
+import json
+
+from src import profiling
+from src.builder import get_disaggregation_requests
+from src.repository import build_disaggregation_report
+
+
+def test_profiler_tags_records_and_writes_the_report(conn, tmp_path, monkeypatch):
+    # enable_profiling sets the module's profiler; restore it afterwards.
+    monkeypatch.setattr(profiling, "_profiler", None)
+    profiler = profiling.enable_profiling()
+
+    (disaggregation, initial_only), question_ids = next(
+        iter(get_disaggregation_requests().items())
+    )
+    question_id = question_ids[0]
+    with profiling.profile_context(section="seccion", question_id=question_id):
+        build_disaggregation_report(conn, question_id, disaggregation, initial_only)
+        with profiling.profile_stage("save"):
+            pass
+    profiling.record_stage("memory_load", 0.5)
+
+    df = profiler.get_records()
+    assert set(df["stage"]) >= {"sql", "save", "memory_load"}
+    sql = df.loc[df["stage"] == "sql"].iloc[0]
+    assert (sql["section"], sql["question_id"], sql["disaggregation"]) == (
+        "seccion",
+        question_id,
+        disaggregation,
+    )
+    assert sql["rows"] > 0
+    # Records outside every context keep no keys.
+    assert df.loc[df["stage"] == "memory_load", "question_id"].isna().all()
+
+    json_path, csv_path = profiling.write_profile_report(df, 1.0, output_dir=tmp_path)
+    report = json.loads(json_path.read_text())
+    assert report["wall_seconds"] == 1.0
+    assert report["stages"]["memory_load"]["calls"] == 1
+    assert list(report["by_section"]) == ["seccion"]
+    assert report["slowest"][0]["question_id"] == question_id
+    assert csv_path.exists()